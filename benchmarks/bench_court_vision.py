@@ -0,0 +1,213 @@
+"""
+Benchmark of the court-vision trajectory processing on a synthetic 300-point match.
+
+Compares the previous per-point/per-stroke pivot implementation (save_trajectory_data_one_rally ->
+process_point_trajectory, copied below) against the columnar process_match_trajectories(), and the previous row-wise
+process_point_score() against process_match_scores(), checking both give the same output.
+
+Run from the repository root with:
+    python -m benchmarks.bench_court_vision
+"""
+import argparse
+import time
+import warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_court_vision_match
+from infotennis.processing.processing_courtvision import process_points_data, process_match_trajectories, \
+    process_match_scores, process_court_vision, dict_traj_keys, cols_ordered
+
+
+def best_of(func, repeats: int):
+    """Returns the output of func() and its best wall time (in seconds) over a number of repeats."""
+    times = []
+    for _ in range(repeats):
+        st = time.perf_counter()
+        out = func()
+        times.append(time.perf_counter() - st)
+    return out, min(times)
+
+
+def save_trajectory_data_one_rally_reference(one_point_sequence):
+    """The previous long-format trajectory data of a point (save_trajectory_data_one_rally() in processing_courtvision)."""
+    df_ball_trajectory = pd.DataFrame(one_point_sequence['trajectory_data']).rename(columns=dict_traj_keys)
+    # If trajectory data is missing, just return a DF with dummy -999 values for x,y,z
+    if df_ball_trajectory.empty:
+        df_ball_trajectory = pd.DataFrame(columns=["x", "y", "z", "position", "stroke_idx", "point_id", "set_n", "game", "point", "serve"])
+        df_ball_trajectory.loc[0] = [-999, -999, -999, "hit", 1, one_point_sequence['point_id'], one_point_sequence['set_n'], \
+                                    one_point_sequence['game'], one_point_sequence['point'], one_point_sequence['serve']]
+        return df_ball_trajectory
+    #######################################################################
+    #                     Match situation information                     #
+    #######################################################################
+    # --> Get indices where ball is hit 
+    hit_indices = df_ball_trajectory.index[df_ball_trajectory['position'] == 'hit'].tolist()
+    hit_indices.append(df_ball_trajectory.shape[0])
+
+    # Get lengths of rally index (expect 4 or 5)
+    # In the usual case, we expect this sequence: Hit --> Peak --> Net --> Bounce
+    # But what if it's a half volley? (Hit --> Peak --> Net)
+    # But what if it's a hit on the rise?  Hit --> Peak --> Net --> Bounce --> Peak
+    # *** Ball trajectory also includes erroneous balls (mishits)...so we sometimes get strike_index = 1 + rally_index
+    hit_indices_diff_len = [x - hit_indices[i - 1] for i, x in enumerate(hit_indices)][1:]
+
+    rally_length = len(hit_indices_diff_len)
+
+    rally_index_list = []
+    for rally_ind in range(1, rally_length + 1):
+        rally_index_list.append(np.repeat( rally_ind, repeats=hit_indices_diff_len[rally_ind-1]))
+    
+    # Combine a list of numpy arrays into a single array
+    df_ball_trajectory['stroke_idx'] = np.concatenate( rally_index_list, axis=0 )
+    
+    ##################################################
+    #          Match situation information           #
+    ##################################################
+    df_ball_trajectory['point_id'] = one_point_sequence['point_id']
+    df_ball_trajectory['set_n'] = one_point_sequence['set_n']
+    df_ball_trajectory['game'] = one_point_sequence['game'] 
+    df_ball_trajectory['point'] = one_point_sequence['point']
+    df_ball_trajectory['serve'] = one_point_sequence['serve']
+    
+    return df_ball_trajectory
+
+
+def process_stroke_trajectory_reference(df_stroke_trajectory: pd.DataFrame):
+    """The previous wide trajectory data of a stroke (process_stroke_trajectory() in processing_courtvision)."""
+    idx_peaks = df_stroke_trajectory.index[df_stroke_trajectory.loc[:,"position"] == "peak"]
+    if len(idx_peaks) > 0:
+        df_stroke_trajectory.loc[idx_peaks[0], "position"] = 'peak_pre' #Trajectory peak pre-bounce (can be before or after crossing the net)
+    if len(idx_peaks) > 1:
+        df_stroke_trajectory.loc[idx_peaks[1], "position"] = 'peak_post' #Trajectory peak post-bounce
+
+    df_stroke_trajectory_wide = df_stroke_trajectory.pivot_table(index=['stroke_idx', 'point_id', 'set_n', 'game', 'point', 'serve'], columns='position', values=['x', 'y', 'z'], aggfunc='first')
+    # Flatten the multi-index columns
+    df_stroke_trajectory_wide.columns = [f'{col}_{pos}' for col, pos in df_stroke_trajectory_wide.columns]
+
+    # Reset the index
+    df_stroke_trajectory_wide.reset_index(inplace=True)
+    # Insert missing columns
+    for col in cols_ordered:
+    #    insert_missing_traj_col(df_stroke_wide, col)
+        if col not in df_stroke_trajectory_wide.columns:
+            df_stroke_trajectory_wide[col] = -999
+
+    df_stroke_trajectory_wide = df_stroke_trajectory_wide[list(df_stroke_trajectory_wide.columns[:6]) + cols_ordered]
+
+    return df_stroke_trajectory_wide
+
+
+def process_point_trajectory_reference(df_ball_trajectory: pd.DataFrame):
+    """The previous wide trajectory data of a point (process_point_trajectory() in processing_courtvision)."""
+    pt_len = df_ball_trajectory.stroke_idx.max()
+    df_point_trajectory_wide = pd.concat([process_stroke_trajectory_reference(df_ball_trajectory[df_ball_trajectory.stroke_idx==i]) for i in np.arange(1,pt_len+1)])
+    return df_point_trajectory_wide
+
+
+def process_point_score_reference(df_point_sorted: pd.DataFrame, setend_point_ids: list, tourn_id: str):
+    """The previous match score of a point (process_point_score() in processing_courtvision)."""
+    set_n = df_point_sorted.set_n
+
+    # Compute how many sets each player has won at the current point
+    p1_sets_w = 0
+    p2_sets_w = 0
+    if set_n != 1:
+        for s in range(set_n-1, 0, -1):
+            try:
+                if df_point_sorted[f'p1_set{s}_score'] > df_point_sorted[f'p2_set{s}_score']:
+                    p1_sets_w += 1
+                elif df_point_sorted[f'p1_set{s}_score'] < df_point_sorted[f'p2_set{s}_score']:    
+                    p2_sets_w += 1
+            except: # Just none if there are missing data and the set_scores are NoneType, interrupting the >/< comparison
+                p1_sets_w = -999
+                p2_sets_w = -999
+                continue
+    
+    p1_set_score = df_point_sorted[f'p1_set{set_n}_score']
+    p2_set_score = df_point_sorted[f'p2_set{set_n}_score']
+
+    if p1_set_score is None:
+        p1_set_score = -999
+    if p2_set_score is None:
+        p2_set_score = -999
+
+    # For some reason the supposedly tb_score cols don't represent anything useful (by eye)
+    # if df_point_sorted[f'p1_set{set_n}_tb_score'] == "0" and df_point_sorted[f'p2_set{set_n}_tb_score'] == "0":
+    #     p1_game_score = df_point_sorted['p1_game_score']
+    #     p2_game_score = df_point_sorted['p2_game_score']
+    #     is_tiebreak = 0
+    # else:
+    #     p1_game_score = df_point_sorted['p1_set1_tb_score']
+    #     p2_game_score = df_point_sorted['p2_set1_tb_score']
+    #     is_tiebreak = 1
+    p1_game_score = df_point_sorted['p1_game_score']
+    p2_game_score = df_point_sorted['p2_game_score']
+
+    # Tiebreak determination
+    if tourn_id == '7696': # Tiebreak at 3-3 only for Nextgen Finals
+        score_tb = '3' # Set score both players must have for there to be a TB
+        score_tbW = '4'
+    else:
+        score_tb = '6'
+        score_tbW = '7'
+
+    if (df_point_sorted[f'p1_set{set_n}_score'] == score_tbW and df_point_sorted[f'p2_set{set_n}_score'] == score_tb) or \
+        (df_point_sorted[f'p1_set{set_n}_score'] == score_tb and df_point_sorted[f'p2_set{set_n}_score'] == score_tbW):
+        is_tiebreak = 1
+    elif df_point_sorted[f'p1_set{set_n}_score'] == score_tb and df_point_sorted[f'p2_set{set_n}_score'] == score_tb:
+        if p1_game_score != "GAME" and p2_game_score != "GAME": # If there is a "GAME", it's from the last point that just precedes the TB
+            is_tiebreak = 1
+        else:
+            is_tiebreak = 0
+    else:
+        is_tiebreak = 0
+
+    # Add an additional set to sets_w if the point is the last point of the match 
+    if df_point_sorted.point_id in setend_point_ids:
+        if p1_game_score == "GAME":
+            p1_sets_w += 1
+        else:
+            p2_sets_w += 1
+
+    df_point_score_processed = {"p1_sets_w": p1_sets_w, "p2_sets_w": p2_sets_w, "p1_set_score": int(p1_set_score), "p2_set_score": int(p2_set_score), \
+            "p1_game_score": p1_game_score, "p2_game_score": p2_game_score, "is_tiebreak": is_tiebreak}
+    
+    return df_point_score_processed
+
+
+def main(n_points=300, repeats=3, seed=2):
+    raw_data = make_court_vision_match(n_points, seed)
+    df_points_sorted, t_points = best_of(lambda: process_points_data(2023, "404", "ms001", "Final", raw_data), repeats)
+
+    df_legacy, t_legacy = best_of(lambda: pd.concat([process_point_trajectory_reference(save_trajectory_data_one_rally_reference(df_points_sorted.iloc[i]))
+                                                     for i in range(len(df_points_sorted))]), repeats)
+    df_new, t_new = best_of(lambda: process_match_trajectories(df_points_sorted), repeats)
+    pd.testing.assert_frame_equal(df_legacy.reset_index(drop=True), df_new, check_dtype=False)
+
+    setend_point_ids = df_points_sorted.groupby("set_n").last().point_id.tolist()
+    df_score_legacy, t_score_legacy = best_of(lambda: pd.DataFrame([process_point_score_reference(df_points_sorted.iloc[i], setend_point_ids, "404")
+                                                                    for i in range(len(df_points_sorted))]), repeats)
+    df_score_new, t_score_new = best_of(lambda: process_match_scores(df_points_sorted), repeats)
+    pd.testing.assert_frame_equal(df_score_legacy, df_score_new, check_dtype=False)
+
+    _, t_total = best_of(lambda: process_court_vision(2023, "404", "ms001", "Final", raw_data), repeats)
+
+    print(f"Synthetic match: {len(df_points_sorted)} points, {len(df_new)} strokes.")
+    print(f"process_points_data:              {t_points*1000:9.1f} ms")
+    print(f"Trajectories (per-point pivots):  {t_legacy*1000:9.1f} ms")
+    print(f"Trajectories (columnar):          {t_new*1000:9.1f} ms  ({t_legacy/t_new:.0f}x faster)")
+    print(f"Match scores (row-wise):          {t_score_legacy*1000:9.1f} ms")
+    print(f"Match scores (vectorised):        {t_score_new*1000:9.1f} ms  ({t_score_legacy/t_score_new:.0f}x faster)")
+    print(f"process_court_vision (total):     {t_total*1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--points", type=int, default=300, help="(Maximum) number of points in the synthetic match.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats (best is reported).")
+    parser.add_argument("--seed", type=int, default=2, help="Seed of the synthetic match (the default plays 5 sets).")
+    args = parser.parse_args()
+    main(args.points, args.repeats, args.seed)
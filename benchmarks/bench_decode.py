@@ -0,0 +1,69 @@
+"""
+Benchmark of the decryption of the ATP infosys payloads on synthetic encrypted court-vision payloads.
+
+Compares the previous decode() (key derived and cipher built per payload, padding stripped with str.replace on the
+decoded string) against infotennis.scrapers.decoding.decode() (cached cipher per lastModified, PKCS7 unpadding of the
+bytes) and decode_batch() with a pool of worker processes, checking they give the same output.
+
+Run from the repository root with:
+    python -m benchmarks.bench_decode [--payloads 500 --points 2 --workers 4]
+"""
+import argparse
+import base64
+import json
+import os
+
+import cryptography.hazmat.backends
+import cryptography.hazmat.primitives.ciphers
+
+from benchmarks.bench_court_vision import best_of
+from benchmarks.synthetic import encrypt_payload, make_court_vision_match
+from infotennis.scrapers.decoding import decode, decode_batch, formatDate, get_cipher
+
+
+def decode_reference(data):
+    """The previous implementation of decode()."""
+    e = formatDate(data['lastModified'])
+    n = e.encode()
+    r = e.upper().encode()
+    cipher = cryptography.hazmat.primitives.ciphers.Cipher(
+        cryptography.hazmat.primitives.ciphers.algorithms.AES(n),
+        cryptography.hazmat.primitives.ciphers.modes.CBC(r),
+        backend=cryptography.hazmat.backends.default_backend()
+    )
+    decryptor = cipher.decryptor()
+    i = decryptor.update(base64.b64decode(data['response'])) + decryptor.finalize()
+    return json.loads(i.decode("utf-8").replace(i.decode("utf-8")[-1],""))
+
+
+def main(n_payloads=500, n_points=2, n_workers=4, n_versions=10, repeats=3):
+    # Payloads of n_points (small, about the size of key-stats) and of full matches (large, 1/10 as many), with 
+    # n_versions distinct lastModified values
+    payloads = {size: [encrypt_payload(make_court_vision_match(points, seed=i % 5), 1700000000000 + (i % n_versions)*60000)
+                       for i in range(n)]
+                for size, points, n in [("small", n_points, n_payloads), ("large", 300, max(1, n_payloads//10))]}
+
+    for size, payloads_size in payloads.items():
+        n_payloads = len(payloads_size)
+        n_bytes = sum(len(data["response"]) for data in payloads_size)/n_payloads
+        out_ref, t_ref = best_of(lambda: [decode_reference(data) for data in payloads_size], repeats)
+        get_cipher.cache_clear()
+        out_new, t_new = best_of(lambda: [decode(data) for data in payloads_size], repeats)
+        out_batch, t_batch = best_of(lambda: decode_batch(payloads_size, n_workers=n_workers), repeats)
+        assert out_ref == out_new == out_batch
+
+        print(f"{n_payloads} {size} payloads ({n_bytes/1024:.1f} KiB each, {n_versions} lastModified values):")
+        print(f"  decode (previous):               {t_ref/n_payloads*1e6:9.1f} us/payload")
+        print(f"  decode (cached cipher, unpad):   {t_new/n_payloads*1e6:9.1f} us/payload  ({t_ref/t_new:.1f}x faster)")
+        print(f"  decode_batch ({n_workers} workers):         {t_batch/n_payloads*1e6:9.1f} us/payload  ({t_ref/t_batch:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--payloads", type=int, default=500, help="No. of small payloads (1/10 as many large payloads).")
+    parser.add_argument("--points", type=int, default=2, help="No. of points in the small payloads.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="No. of worker processes of decode_batch.")
+    parser.add_argument("--versions", type=int, default=10, help="No. of distinct lastModified values.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats (best is reported).")
+    args = parser.parse_args()
+    main(args.payloads, args.points, args.workers, args.versions, args.repeats)
@@ -0,0 +1,71 @@
+"""
+Benchmark of the scrapers' HttpClient against a local aiohttp stub server.
+
+The stub serves a small JSON body after a fixed latency and answers a fraction of the requests with a 503, so the
+throughput, the per-host rate limit (token bucket) and the retries of the client can be checked without hitting
+the real hosts.
+
+Run from the repository root with:
+    python -m benchmarks.bench_http_client [--requests 200 --rate 50 --latency 0.05 --error-rate 0.05]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+from infotennis.scrapers.http_client import HttpClient
+
+
+async def start_stub_server(latency: float, error_rate: float, seed: int = 0):
+    """Starts the stub server on a free local port and returns (runner, base URL, request counter)."""
+    rng = random.Random(seed)
+    counter = {"requests": 0, "errors": 0}
+
+    async def handle(request):
+        counter["requests"] += 1
+        await asyncio.sleep(latency)
+        if rng.random() < error_rate:
+            counter["errors"] += 1
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.json_response({"lastModified": 1700000000000, "response": request.match_info["match_id"]})
+
+    app = web.Application()
+    app.router.add_get("/data/{match_id}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", counter
+
+
+async def run(n_requests: int, rate: float, concurrency: int, latency: float, error_rate: float):
+    runner, base_url, counter = await start_stub_server(latency, error_rate)
+    host = base_url.split("//")[1]
+    settings = {"attempts": 5, "backoff_min": 0.01, "backoff_max": 0.1,
+                "hosts": {host: {"rate": rate, "burst": concurrency, "concurrency": concurrency}}}
+    try:
+        async with HttpClient(settings) as client:
+            st = time.perf_counter()
+            bodies = await asyncio.gather(*[client.get_text(f"{base_url}/data/MS{i:03d}") for i in range(n_requests)])
+            elapsed = time.perf_counter() - st
+    finally:
+        await runner.cleanup()
+
+    assert all(f'"MS{i:03d}"' in body for i, body in enumerate(bodies))
+    print(f"{n_requests} requests in {elapsed:.2f} s ({n_requests/elapsed:.1f} req/s, limit {rate} req/s, burst {concurrency}).")
+    print(f"Server: {counter['requests']} requests received, {counter['errors']} answered with 503.")
+    print(f"Client: {client.n_requests} requests sent, {client.n_retries} retried.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200, help="No. of requests")
+    parser.add_argument("--rate", type=float, default=50, help="Rate limit of the stub host (requests/second)")
+    parser.add_argument("--concurrency", type=int, default=15, help="Max. concurrent requests (and burst) of the stub host")
+    parser.add_argument("--latency", type=float, default=0.05, help="Response latency of the stub server (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of requests answered with a 503")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.rate, args.concurrency, args.latency, args.error_rate))
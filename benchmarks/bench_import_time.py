@@ -0,0 +1,96 @@
+"""
+Benchmark (and check) of the import time of the package's entry points, measured with python -X importtime.
+
+Each entry point is imported in a fresh interpreter (best of --repeats runs) and its cumulative import time is reported,
+with the heaviest packages it imports. The check fails (exit code 1) if an entry point imports one of the packages it
+should only import lazily, when they are used (see lazy_packages). With --baseline-dir, the entry points are also
+timed in another checkout of the repository (e.g. git worktree add ../infotennis-base <rev>) for comparison.
+
+Run from the repository root with:
+    python -m benchmarks.bench_import_time [--repeats 5 --baseline-dir ../infotennis-base]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Packages that each entry point must not import (they are imported when used, if at all)
+lazy_packages = {
+    "infotennis.scrapers.decoding": ["numpy", "pandas", "aiohttp", "yaml"],
+    "infotennis.scrapers.http_client": ["aiohttp", "yaml", "pandas"],
+    "infotennis.scrapers.scrape_match_data": ["aiohttp", "yaml", "pandas", "numpy", "bs4"],
+    "infotennis.scrapers.scraping_functions_atp": ["bs4", "aiohttp", "yaml"],
+    "infotennis.processing.processing_batch": ["aiohttp", "yaml", "bs4"],
+    "infotennis.routines.migrate_raw_data": ["pandas", "numpy", "yaml"],
+    "infotennis.routines.streaming_pipeline": ["aiohttp", "yaml", "bs4"],
+    "infotennis.routines.update_routines": ["aiohttp", "yaml", "bs4", "pymysql", "dotenv"],
+}
+
+
+def import_time(module, root, repeats=5):
+    """
+    Returns the cumulative import time (s) of a module in a fresh interpreter (best of repeats), and the cumulative
+    import time of each top-level package imported with it, or (None, error message) if the import fails.
+    """
+    env = {**os.environ, "PYTHONPATH": root}
+    best, packages = None, {}
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=root, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().split("\n")[-1]
+        times = {}
+        for line in proc.stderr.split("\n"):
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            depth = len(name) - len(name.lstrip())
+            name = name.strip()
+            if depth == 1 and name != module:
+                # End of the imports of the interpreter's startup (e.g. site), the module's imports follow
+                times = {}
+                continue
+            # The top-level (least indented) entry of each package
+            package = name.split(".")[0]
+            if package not in times or depth < times[package][1]:
+                times[package] = (int(cumulative)/1e6, depth)
+        # Cumulative time of the module itself (its last line)
+        total = next(int(line.split("|")[1])/1e6 for line in proc.stderr.split("\n")[::-1] if line.rstrip().endswith(f"| {module}"))
+        if best is None or total < best:
+            best, packages = total, {package: t for package, (t, _) in times.items()}
+    return best, packages
+
+
+def main(repeats=5, baseline_dir=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    failed = []
+    for module, lazy in lazy_packages.items():
+        t, packages = import_time(module, root, repeats)
+        if t is None:
+            print(f"{module}: import failed ({packages})")
+            failed.append(module)
+            continue
+        line = f"{module:45s} {t*1e3:7.1f} ms"
+        if baseline_dir is not None:
+            t_base, _ = import_time(module, os.path.abspath(baseline_dir), repeats)
+            line += f"  (baseline: {'import failed' if t_base is None else f'{t_base*1e3:.1f} ms, {t_base/t:.1f}x'})"
+        print(line)
+        heaviest = sorted((p for p in packages if p not in ("infotennis", "site") and not p.startswith("_")),
+                          key=packages.get, reverse=True)[:5]
+        print("    heaviest imports: " + ", ".join(f"{p} {packages[p]*1e3:.1f} ms" for p in heaviest))
+        imported = [p for p in lazy if p in packages]
+        if len(imported) > 0:
+            print(f"    imports {', '.join(imported)}, which should only be imported when used!")
+            failed.append(module)
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeats", type=int, default=5, help="Number of imports of each entry point (best is reported).")
+    parser.add_argument("--baseline-dir", default=None, help="Another checkout of the repository to compare with.")
+    args = parser.parse_args()
+    failed = main(args.repeats, args.baseline_dir)
+    sys.exit(1 if len(failed) > 0 else 0)
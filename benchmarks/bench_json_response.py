@@ -0,0 +1,62 @@
+"""
+Benchmark of the parsing of the JSON API responses on synthetic encrypted court-vision payloads.
+
+Compares the previous parsing (response text through BeautifulSoup's html.parser, then json.loads(str(soup))) against
+parsing the response bytes directly with json and with orjson (if installed), reporting the latency and the peak
+memory allocated per payload, and checking they give the same output.
+
+Run from the repository root with:
+    python -m benchmarks.bench_json_response [--payloads 20 --repeats 3]
+"""
+import argparse
+import json
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from benchmarks.bench_court_vision import best_of
+from benchmarks.synthetic import encrypt_payload, make_court_vision_match
+from infotennis.scrapers import responses
+
+
+def parse_soup(body):
+    """The previous parsing of the responses."""
+    return json.loads(str(BeautifulSoup(body.decode("utf-8"), 'html.parser')))
+
+
+def peak_memory(func, body):
+    """Returns the peak memory (in bytes) allocated by func(body)."""
+    tracemalloc.start()
+    func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(n_payloads=20, repeats=3):
+    parsers = {"BeautifulSoup + json.loads(str)": parse_soup, "json.loads(bytes)": json.loads}
+    if responses.orjson is not None:
+        parsers["orjson.loads(bytes)"] = responses.orjson.loads
+    else:
+        print("orjson isn't installed (pip install orjson), skipping it.")
+
+    for size, n_points in [("small", 2), ("large", 300)]:
+        bodies = [json.dumps(encrypt_payload(make_court_vision_match(n_points, seed=i))).encode("utf-8") for i in range(n_payloads)]
+        n_bytes = sum(len(body) for body in bodies)/len(bodies)
+        print(f"{n_payloads} {size} responses ({n_bytes/1024:.1f} KiB each):")
+        out_ref, t_ref = None, None
+        for name, parser in parsers.items():
+            out, t = best_of(lambda: [parser(body) for body in bodies], repeats)
+            peak = max(peak_memory(parser, body) for body in bodies[:3])
+            if out_ref is None:
+                out_ref, t_ref = out, t
+            assert out == out_ref
+            print(f"  {name:32s} {t/n_payloads*1e6:9.1f} us/payload ({t_ref/t:5.1f}x), peak memory {peak/1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--payloads", type=int, default=20, help="No. of payloads of each size.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats (best is reported).")
+    args = parser.parse_args()
+    main(args.payloads, args.repeats)
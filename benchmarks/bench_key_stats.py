@@ -0,0 +1,195 @@
+"""
+Benchmark of the key-stats processing on synthetic matches (see synthetic.make_key_stats_match()), e.g. a season.
+
+Compares the previous per-set processing (process_set_stats() building a dataframe of each set's stats and formatting it
+with per-cell apply() calls, column inserts and pd.to_numeric, for every set of every match) against
+process_key_stats_batch(), which reads all sets of a match in a single pass and then parses all ratio columns of all
+sets of all matches at once, checking they give the same output.
+The matches include Grand Slams (AO and RG, with each of their raw layouts), which have extra derived stats.
+
+Run from the repository root with:
+    python -m benchmarks.bench_key_stats [--matches 2600 --repeats 1]
+"""
+import argparse
+import warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_court_vision import best_of
+from benchmarks.synthetic import make_key_stats_match, make_rally_analysis_match
+from infotennis.processing.processing_batch import get_match_args, process_key_stats_batch
+from infotennis.processing.processing_keystats import slam_stats_columns, tourn_id_slams, columns_full, percen_list, \
+    num_cols_rnm
+from infotennis.schemas import apply_table_dtypes
+
+
+def get_unret_serves_reference(raw_data_r: dict, set_n=0):
+    """The previous count of unreturned serves of a set (get_unret_serves() in processing_keystats)."""
+    p1_unret_list = [ item['pointId'] for item in pd.json_normalize(raw_data_r['rallyData']).iloc[1].t2err ]
+    p2_unret_list = [ item['pointId'] for item in pd.json_normalize(raw_data_r['rallyData']).iloc[1].t1err ]
+    if set_n == 0:
+        return [len(p1_unret_list), len(p2_unret_list)]
+    p1_unret_list_s = [x for x in p1_unret_list if x[:2] == f"{set_n}_"]
+    p2_unret_list_s = [x for x in p2_unret_list if x[:2] == f"{set_n}_"]
+    return [len(p1_unret_list_s), len(p2_unret_list_s)]
+
+def reverse_ratio_reference(ratio_str: str):
+    ratio, percen = ratio_str.split(" ")
+    percen = percen.replace("(","").replace(")","").replace("%","")
+
+    ratio_r = f'{int(ratio.split("/")[-1]) - int(ratio.split("/")[0])}/{ratio.split("/")[-1]}'
+    if ratio_r == "0/0":
+        percen_r = "(0%)"
+    else:
+        percen_r = f'({100- int(percen)}%)'
+
+    return ratio_r + " " + percen_r
+
+def calc_percentage_reference(ratio_str: str):
+    if ratio_str is None:
+        return None
+    numer = int(str(ratio_str).split(' ')[0].split("/")[0])
+    denom = int(str(ratio_str).split(' ')[0].split("/")[1])
+
+    if denom == 0:
+        return 0
+    else:
+        return np.round(numer*100/denom,1)
+
+def process_set_stats_reference(year: int, tourn_id: str, match_id: str, round_n: str, 
+    player_ids: list, raw_data: dict, set_n=0, raw_data_rallies=None):
+    """The previous per-set processing (process_set_stats() in processing_keystats)."""
+    try:
+        df_sstats_raw = pd.DataFrame(raw_data['setStats'][f'set{set_n}'])
+        df_sstats_raw = df_sstats_raw.loc[:, ~df_sstats_raw.columns.str.startswith('tm')]
+        df_set_stats = df_sstats_raw.iloc[:,1:4].T
+    except KeyError:
+        return
+    if len(df_set_stats) == 0:
+        return 
+    df_set_stats.rename(columns=df_set_stats.iloc[0], inplace = True)
+    df_set_stats = df_set_stats.drop(df_set_stats.index[0])
+
+    df_set_stats.columns =  [x.lower().replace(" ","_") for x in df_set_stats.columns]
+
+    if tourn_id in tourn_id_slams: 
+        columns_slams = slam_stats_columns[tourn_id]
+
+        if len(df_set_stats.columns) != len(columns_slams):
+            if len(df_set_stats.columns) == len(columns_slams) - 3:
+                df_set_stats.columns = columns_slams[:-3]
+            elif len(df_set_stats.columns) == len(columns_slams) + 5:
+                df_set_stats = df_set_stats.iloc[:,:-5]
+                df_set_stats.columns = columns_slams
+            elif len(df_set_stats.columns) == len(columns_slams) + 5 - 3:
+                df_set_stats = df_set_stats.iloc[:,:-5]
+                df_set_stats.columns = columns_slams[:-3]
+                
+        else:
+            df_set_stats.columns =  columns_slams
+
+    if len(df_set_stats.columns) != len(columns_full):
+        df_set_stats = df_set_stats.reindex(columns=columns_full, fill_value="")
+
+    if tourn_id in tourn_id_slams: 
+        df_set_stats.total_points_won = df_set_stats.total_points_won.apply(lambda x: x + f"/{df_set_stats.total_points_won.astype(int).sum()}")
+        serve_won = df_set_stats["1st_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[0]).astype(int) + \
+        df_set_stats["2nd_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[0]).astype(int) 
+        serve_played = df_set_stats["1st_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[1]).astype(int) + \
+        df_set_stats["2nd_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[1]).astype(int) 
+        df_set_stats["service_points_won"] = serve_won.astype(str) +"/"+ serve_played.astype(str)
+        df_set_stats["1st_serve_return_points_won"] = [reverse_ratio_reference(df_set_stats["1st_serve_points_won"].iloc[1]), reverse_ratio_reference(df_set_stats["1st_serve_points_won"].iloc[0])]
+        df_set_stats["2nd_serve_return_points_won"] = [reverse_ratio_reference(df_set_stats["2nd_serve_points_won"].iloc[1]), reverse_ratio_reference(df_set_stats["2nd_serve_points_won"].iloc[0])]
+        df_set_stats["break_points_saved"] = [reverse_ratio_reference(df_set_stats["break_points_converted"].iloc[1]), reverse_ratio_reference(df_set_stats["break_points_converted"].iloc[0])]
+        ret_won = serve_played.iloc[::-1] - serve_won.iloc[::-1]
+        ret_played = serve_played.iloc[::-1]
+        df_set_stats["return_points_won"] = list(ret_won.astype(str) +"/"+ ret_played.astype(str))
+
+    for col in percen_list: 
+        col_idx = df_set_stats.columns.get_loc(col)
+        try:
+            df_set_stats.insert(col_idx+1, col+"_pct", df_set_stats[col].apply(lambda x: calc_percentage_reference(x)))
+        except (ValueError, IndexError):
+            df_set_stats.insert(col_idx+1, col+"_pct", df_set_stats[col].apply(lambda x: x))
+        df_set_stats[col] = df_set_stats[col].apply(lambda x: x.split(' ')[0])
+
+    BPfaced = df_set_stats["break_points_saved"].apply(lambda x: str(x).split('/')[-1].split(' (')[0])
+    df_set_stats.insert(df_set_stats.columns.get_loc("break_points_converted")+2, 'break_points_faced', BPfaced)
+
+    if raw_data_rallies is not None:
+        df_set_stats.insert(df_set_stats.columns.get_loc("aces")+1, 'serves_unreturned', get_unret_serves_reference(raw_data_rallies, set_n))
+    else:
+        df_set_stats.insert(df_set_stats.columns.get_loc("aces")+1, 'serves_unreturned', [-999, -999])
+
+    df_set_stats.insert(0, "year", [year]*2)
+    df_set_stats.insert(1, "tournament_id", [str(int(tourn_id))]*2)
+    df_set_stats.insert(2, "match_id", [match_id.lower()]*2)
+    df_set_stats.insert(3, "round", [round_n]*2)
+    df_set_stats.insert(4, "sets_completed", [raw_data['setsCompleted']]*2)
+    df_set_stats.insert(5, "set_n", [set_n]*2)
+    df_set_stats.insert(6, "player_id", player_ids)
+    df_set_stats.insert(7, "opponent_id", player_ids[::-1])
+
+    df_set_stats = df_set_stats.reset_index(drop=True)
+    df_set_stats = df_set_stats.apply(pd.to_numeric, errors='ignore')
+    df_set_stats["tournament_id"] = df_set_stats["tournament_id"].astype('Int64').astype(str)
+
+    df_set_stats = df_set_stats.rename(columns = num_cols_rnm)
+    return df_set_stats
+
+def process_key_stats_reference(year: int, tourn_id: str, match_id: str, round_n: str,
+    raw_data: dict, raw_data_rallies=None):
+    """The previous processing of a match (process_key_stats() in processing_keystats)."""
+    n_sets = raw_data['setsCompleted']
+    player_ids = list(pd.DataFrame(raw_data['players']).player1Id)
+    
+    df_stats_list = []
+    for n in range(n_sets+1):
+        df_set_stats = process_set_stats_reference(year, tourn_id, match_id, round_n, player_ids, raw_data, n, raw_data_rallies)
+        df_stats_list.append(df_set_stats)
+
+    df_stats = pd.concat(df_stats_list)
+
+    for col_spd in ["max_speed", "serve1_avg_speed", "serve2_avg_speed"]:
+        df_stats.loc[abs(df_stats[col_spd]) > 300, col_spd] = -999
+
+    return df_stats
+
+
+def make_season(n_matches: int, seed=0):
+    """
+    Returns (metadata, raw_data, raw_data_rallies) triples of n_matches synthetic matches, 1 in 8 at each of the AO and
+    RG. Half of the matches have rally-analysis data (for the unreturned serves), the others None.
+    """
+    rng = np.random.default_rng(seed)
+    matches = []
+    for i in range(n_matches):
+        tourn_id = "580" if i % 8 == 0 else "520" if i % 8 == 4 else "404"
+        n_sets = int(rng.integers(3, 6)) if tourn_id in tourn_id_slams else int(rng.integers(2, 4))
+        raw_data = make_key_stats_match(n_sets, seed=seed + i, tourn_id=tourn_id, slam_layout=int(rng.choice([14, 11, 19, 16])),
+                                        tm_columns=rng.random() < 0.5)
+        raw_data_rallies = make_rally_analysis_match(40*n_sets, seed=seed + i) if i % 2 == 0 else None
+        matches.append(({"year": 2024, "tournament_id": tourn_id, "match_id": f"ms{i % 1000:03d}", "round": "Final"},
+                        raw_data, raw_data_rallies))
+    return matches
+
+
+def main(n_matches=2600, repeats=1, seed=0):
+    matches = make_season(n_matches, seed)
+    df_ref, t_ref = best_of(lambda: apply_table_dtypes(pd.concat([process_key_stats_reference(*get_match_args(metadata), raw_data, raw_data_rallies)
+                                                                  for metadata, raw_data, raw_data_rallies in matches], ignore_index=True), "key_stats"), repeats)
+    df_new, t_new = best_of(lambda: process_key_stats_batch(matches), repeats)
+    pd.testing.assert_frame_equal(df_ref, df_new)
+    print(f"{n_matches} synthetic matches, {len(df_new)} key-stats rows:")
+    print(f"  Per-set processing (previous): {t_ref:7.2f} s")
+    print(f"  process_key_stats_batch:       {t_new:7.2f} s  ({t_ref/t_new:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--matches", type=int, default=2600, help="No. of matches (about an ATP season with qualifying).")
+    parser.add_argument("--repeats", type=int, default=1, help="Number of timed repeats (best is reported).")
+    args = parser.parse_args()
+    main(args.matches, args.repeats)
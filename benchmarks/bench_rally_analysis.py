@@ -0,0 +1,98 @@
+"""
+Benchmark of the rally-analysis processing on synthetic matches (see synthetic.make_rally_analysis_match()).
+
+Compares the previous processing (process_rallystat_col() running pd.json_normalize, the column renames and the DOUBLE
+FAULT fix-up for each of the 4 outcomes x 11 shot categories, with rallyData normalised again in the loop) against
+process_rally_analysis(), which walks rallyData once into flat lists, checking they give the same output (with the previous
+output in point order, since it sorted the games and points as strings).
+
+Run from the repository root with:
+    python -m benchmarks.bench_rally_analysis [--matches 100 --repeats 3]
+"""
+import argparse
+import warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_court_vision import best_of
+from benchmarks.synthetic import make_rally_analysis_match
+from infotennis.processing.processing_rallys import process_rally_analysis
+from infotennis.schemas import get_point_key
+
+
+def process_rallystat_col_reference(rally_df_r: pd.DataFrame, shot_num: int, outcome: str, player_id: str, opp_id: str):
+    """The previous processing of a category and outcome (process_rallystat_col() in processing_rallys)."""
+    rally_sub_df = pd.json_normalize(rally_df_r[outcome].iloc[shot_num-1])
+    if len(rally_sub_df) == 0:
+        return rally_sub_df
+    rally_sub_df.columns = rally_sub_df.columns.str.replace('(?<=[a-z])(?=[A-Z])', '_', regex=True)\
+        .str.replace('^t(1|2)', r'p\1_', regex=True).str.lower()
+    if "err" in outcome:
+        shot_outcome = "L"
+    elif "win" in outcome:
+        shot_outcome = "W"
+    if shot_num < 9:
+        shot_num = str(int(shot_num))
+    elif shot_num == 9:
+        shot_num = "9+_odd"
+    elif shot_num == 10:
+        shot_num = "10+_even"
+    else:
+        shot_num = "Unknown"
+    rally_sub_df.insert(0, "shot_number", [shot_num]*len(rally_sub_df))
+    rally_sub_df.insert(1, "outcome", [shot_outcome]*len(rally_sub_df))
+    rally_sub_df.insert(2, "player_id", [player_id]*len(rally_sub_df))
+    rally_sub_df.insert(3, "opponent_id", [opp_id]*len(rally_sub_df))
+    err_indexs = np.where((rally_sub_df.point_end_type == "DOUBLE FAULT") & (rally_sub_df.outcome == "W"))[0]
+    for ei in err_indexs:
+        rally_sub_df.loc[ei,["outcome", "player_id", "opponent_id"]] = ["L", opp_id, player_id]
+    return rally_sub_df
+
+
+def process_rally_analysis_reference(year: int, tourn_id: str, match_id: str, round_n: str, raw_data: dict):
+    """The previous processing of a match (process_rally_analysis() in processing_rallys)."""
+    player_ids = list(pd.DataFrame(raw_data['playerDetails']).player1Id)
+    list_rally_sub_df = []
+    for outcome in ["t1win", "t1err"]:
+        df_rallies_r = pd.json_normalize(raw_data['rallyData'])
+        list_rally_sub_df.append(pd.concat([process_rallystat_col_reference(df_rallies_r, i+1, outcome, player_ids[0], player_ids[1])
+                                            for i in range(len(df_rallies_r))]))
+    for outcome in ["t2win", "t2err"]:
+        list_rally_sub_df.append(pd.concat([process_rallystat_col_reference(df_rallies_r, i+1, outcome, player_ids[1], player_ids[0])
+                                            for i in range(len(df_rallies_r))]))
+    df_rallies = pd.concat(list_rally_sub_df).reset_index(drop=True)
+    idx_set = df_rallies.columns.get_loc('set')
+    df_rallies.insert(idx_set+1, "game", df_rallies.point_id.apply(lambda x: x.split("_")[1]))
+    df_rallies.insert(idx_set+2, "point", df_rallies.point_id.apply(lambda x: x.split("_")[2]))
+    df_rallies = df_rallies.sort_values(["set", "game", "point","serve"]).reset_index(drop=True)
+    df_rallies.insert(0, "year", [year]*len(df_rallies))
+    df_rallies.insert(1, "tournament_id", [str(int(tourn_id))]*len(df_rallies))
+    df_rallies.insert(2, "match_id", [match_id.lower()]*len(df_rallies))
+    df_rallies.insert(3, "round", [round_n]*len(df_rallies))
+    df_rallies.insert(4, "sets_completed", [raw_data['setsCompleted']]*len(df_rallies))
+    return df_rallies.rename(columns = {"set":"set_n"})
+
+
+def main(n_matches=100, repeats=3, seed=0):
+    matches = [make_rally_analysis_match(300, seed=seed + i) for i in range(n_matches)]
+    list_ref, t_ref = best_of(lambda: [process_rally_analysis_reference(2024, "580", f"ms{i:03d}", "Final", raw_data)
+                                       for i, raw_data in enumerate(matches)], repeats)
+    list_new, t_new = best_of(lambda: [process_rally_analysis(2024, "580", f"ms{i:03d}", "Final", raw_data)
+                                       for i, raw_data in enumerate(matches)], repeats)
+    for df_ref, df_new in zip(list_ref, list_new):
+        df_ref = df_ref.assign(point_key=get_point_key(df_ref.set_n, df_ref.game, df_ref.point, df_ref.serve))
+        df_ref = df_ref.sort_values("point_key", kind="stable").reset_index(drop=True)[df_new.columns]
+        pd.testing.assert_frame_equal(df_ref, df_new)
+    print(f"{n_matches} synthetic matches, {sum(len(df) for df in list_new)} points:")
+    print(f"  Per-category json_normalize (previous): {t_ref*1e3:8.1f} ms")
+    print(f"  Single walk over rallyData:             {t_new*1e3:8.1f} ms  ({t_ref/t_new:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--matches", type=int, default=100, help="No. of matches (of up to 300 points).")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats (best is reported).")
+    args = parser.parse_args()
+    main(args.matches, args.repeats)
@@ -0,0 +1,114 @@
+"""
+Benchmark of the parsing of the tournament results pages on synthetic pages (see synthetic.make_results_page()).
+
+Compares the previous parsing of scrape_ATP_tournament() (BeautifulSoup's html.parser, repeated find() calls per match
+and a 1-row DataFrame per match concatenated at the end) against infotennis.scrapers.results_page (lxml, single pass
+per match and a DataFrame built once from a list of dicts), checking they give the same output.
+
+Run from the repository root with:
+    python -m benchmarks.bench_results_page [--matches 127 --qualifying 48 --repeats 3]
+"""
+import argparse
+
+from bs4 import BeautifulSoup
+import pandas as pd
+
+from benchmarks.bench_court_vision import best_of
+from benchmarks.synthetic import make_results_page
+from infotennis.scrapers.results_page import move_bracketed_parts, parse_results_page, results_columns
+
+
+def parse_player_scores_reference(elem_player_match_score):
+    player_scores = []
+    for set_score in elem_player_match_score.find_all("div", class_="score-item"):
+        score_list = set_score.find_all("span")
+        if len(score_list) == 0:
+            continue
+        if len(score_list) == 1:
+            score = score_list[0].text
+        elif len(score_list) == 2:
+            score = f"{score_list[0].text}({score_list[1].text})"
+        player_scores.append(score)
+    return player_scores
+
+
+def parse_match_content_reference(elem_match):
+    """The previous parsing of a match (parse_match_content() in scraping_functions_atp)."""
+    round_ = elem_match.find("strong").text.split(" - ")[0].replace("-","")
+    round_ = " ".join([word.capitalize() for word in round_.split()])
+    url_atp = "https://www.atptour.com"
+    if elem_match.find("div", class_="match-cta") is None:
+        url = ""
+    else:
+        if elem_match.find("div", class_="match-cta").find("a", string=lambda text: text and ("Match Stats" in text or "Stats" in text)) is not None:
+            url = url_atp + elem_match.find("div", class_="match-cta").find("a", string=lambda text: text and ("Match Stats" in text or "Stats" in text))["href"]
+        else:
+            url = ""
+
+    elems_match_score = elem_match.find_all("div", class_="scores")
+    score_list = [f"{i}{j}" for i,j in zip(parse_player_scores_reference(elems_match_score[0]), parse_player_scores_reference(elems_match_score[1]))]
+    score = " ".join(move_bracketed_parts(score_list))
+
+    elem_players = elem_match.find_all("div", class_="name")
+    elem_pinfos = [e.find({"a", "p"}) for e in elem_players]
+    if len(elem_players) == 2:
+        player_1, player_2 = [" ".join(e.contents[0].text.split()) for e in elem_pinfos]
+        player_1_seed, player_2_seed = [e.find("span").text.strip("()") for e in elem_players]
+        player_1_id, player_2_id = [e["href"].split("/")[-2] if e.has_attr("href") else "" for e in elem_pinfos]
+        try:
+            player_1_flag, player_2_flag =  [e.find("use")["href"].split('/')[-1].split('#')[1].replace('flag-','') for e in elem_match.find_all("svg")]
+        except:
+            player_1_flag = player_2_flag = "-"
+    if len(elem_players) == 4:
+        player_1a, player_1b, player_2a, player_2b = [" ".join(e.contents[0].text.split()) for e in elem_pinfos]
+        player_1 = player_1a + ", " + player_1b
+        player_2 = player_2a + ", " + player_2b
+        player_1_seed, player_2_seed = [e.find("span").text.strip("()") for e in elem_players][::2]
+        player_1a_id, player_1b_id, player_2a_id, player_2b_id = [e["href"].split("/")[-2] if e.has_attr("href") else "-" for e in elem_pinfos]
+        player_1_id = player_1a_id + ", " + player_1b_id
+        player_2_id = player_2a_id + ", " + player_2b_id
+        player_1a_flag, player_1b_flag, player_2a_flag, player_2b_flag =  [e.find("use")["href"].split('/')[-1].split('#')[1].replace('flag-','') for e in elem_match.find_all("svg")]
+        player_1_flag = player_1a_flag + ", " + player_1b_flag
+        player_2_flag = player_2a_flag + ", " + player_2b_flag
+
+    return {"round": round_, "player1_name": player_1, "player1_id": player_1_id, "player1_seed": player_1_seed, "player1_nation": player_1_flag,
+            "player2_name": player_2, "player2_id": player_2_id, "player2_seed": player_2_seed, "player2_nation": player_2_flag, "score": score,
+            "url": url, "court_vision": 0}
+
+
+def parse_page_reference(html):
+    """The previous parsing of a results page in scrape_ATP_tournament()."""
+    pageSoup = BeautifulSoup(html, 'html.parser')
+    elem_days = pageSoup.find_all("div", class_="atp_accordion-item")
+    elem_matches = [e.find_all("div", class_="match") for e in elem_days]
+    list_df_matches = []
+    for elem_round in elem_matches:
+        for elem_match in elem_round:
+            list_df_matches.append(pd.DataFrame([parse_match_content_reference(elem_match)]))
+    return pd.concat(list_df_matches).reset_index(drop=True)
+
+
+def parse_page(html):
+    """The parsing of a results page in scrape_ATP_tournament()."""
+    return pd.DataFrame(parse_results_page(html), columns=results_columns)
+
+
+def main(n_matches=127, n_qualifying=48, repeats=3):
+    pages = {"singles": make_results_page(n_matches + n_qualifying, seed=0),
+             "doubles": make_results_page(n_matches//2, doubles=True, seed=1)}
+    for name, html in pages.items():
+        df_ref, t_ref = best_of(lambda: parse_page_reference(html), repeats)
+        df_new, t_new = best_of(lambda: parse_page(html), repeats)
+        pd.testing.assert_frame_equal(df_ref, df_new)
+        print(f"{name} page ({len(df_new)} matches, {len(html)/1024:.0f} KiB):")
+        print(f"  BeautifulSoup (previous): {t_ref*1e3:8.1f} ms")
+        print(f"  lxml single pass:         {t_new*1e3:8.1f} ms  ({t_ref/t_new:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--matches", type=int, default=127, help="No. of main draw singles matches (half as many doubles matches).")
+    parser.add_argument("--qualifying", type=int, default=48, help="No. of qualifying singles matches.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed repeats (best is reported).")
+    args = parser.parse_args()
+    main(args.matches, args.qualifying, args.repeats)
@@ -0,0 +1,417 @@
+"""
+Synthetic raw data generators for the benchmarks in this folder.
+
+The generated dicts mimic the structure of the raw (decoded) JSON returned by the ATP infosys API, so that they
+can be passed straight to the processing functions in infotennis.processing, or encrypted like the API's payloads
+with encrypt_payload().
+"""
+import base64
+import json
+
+import cryptography.hazmat.primitives.ciphers
+import cryptography.hazmat.primitives.padding
+import numpy as np
+
+from infotennis.scrapers.decoding import formatDate
+
+GAME_SCORES = ["0", "15", "30", "40"]
+
+
+def simulate_match_points(n_points: int, seed=0):
+    """
+    Simulates the point-by-point progression of a best-of-5 match (tiebreak at 6-6), in which the server wins
+    62% of points. The simulation stops after n_points or when the match is won, whichever comes first.
+
+    Args:
+        n_points (int): (Maximum) number of points to simulate.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        list: List of dicts (1 per point) with the point identifiers and the score after the point, i.e.
+        set_n, game, point, serve, set_scores ([[p1, p2], ...]), p1_game_score, p2_game_score, winner.
+    """
+    rng = np.random.default_rng(seed)
+    points = []
+    set_scores = [[0, 0]]
+    game_n, point_n, games_pts = 1, 1, [0, 0]
+    sets_w = [0, 0]
+    for _ in range(n_points):
+        if max(sets_w) == 3:
+            break
+        set_n = len(set_scores)
+        is_tb = set_scores[-1] == [6, 6]
+        serve = 2 if rng.random() < 0.35 else 1
+        server = (sum(set_scores[-1]) + set_n) % 2
+        winner = server if rng.random() < 0.62 else 1 - server
+        games_pts[winner] += 1
+        p_w, p_l = games_pts[winner], games_pts[1 - winner]
+        # Score after the point
+        if is_tb:
+            game_won = p_w >= 7 and p_w - p_l >= 2
+            scores = [str(games_pts[0]), str(games_pts[1])]
+        else:
+            game_won = p_w >= 4 and p_w - p_l >= 2
+            if p_w >= 3 and p_l >= 3:
+                scores = ["40", "40"] if p_w == p_l else (["AD", "40"] if p_w > p_l else ["40", "AD"])
+                if winner == 1:
+                    scores = scores[::-1]
+            else:
+                scores = [GAME_SCORES[min(games_pts[0], 3)], GAME_SCORES[min(games_pts[1], 3)]]
+        if game_won:
+            scores = ["0", "0"]
+            scores[winner] = "GAME"
+        points.append({"set_n": set_n, "game": game_n, "point": point_n, "serve": serve,
+                       "set_scores": [list(s) for s in set_scores], "p1_game_score": scores[0],
+                       "p2_game_score": scores[1], "winner": winner})
+        point_n += 1
+        if game_won:
+            set_scores[-1][winner] += 1
+            games_pts = [0, 0]
+            game_n += 1
+            point_n = 1
+            g_w, g_l = set_scores[-1][winner], set_scores[-1][1 - winner]
+            if (g_w >= 6 and g_w - g_l >= 2) or g_w == 7:
+                sets_w[winner] += 1
+                set_scores.append([0, 0])
+                game_n = 1
+    return points
+
+
+def _coord(rng, z=None):
+    return {"a70": float(rng.uniform(-12, 12)), "a71": float(rng.uniform(-5, 5)),
+            "a72": float(rng.uniform(0, 3)) if z is None else z}
+
+
+def _trajectory(rng, rally_length: int):
+    trajectory = []
+    for i in range(rally_length):
+        trajectory.append({**_coord(rng), "a73": "hit"})
+        if rng.random() < 0.7:
+            trajectory.append({**_coord(rng), "a73": "peak"})
+        trajectory.append({**_coord(rng), "a73": "net"})
+        trajectory.append({**_coord(rng, 0.0), "a73": "bounce"})
+        if rng.random() < 0.6:
+            trajectory.append({**_coord(rng), "a73": "peak"})
+        # Some odd cases seen in the raw data: 3 peaks and repeated bounces within one stroke
+        if rng.random() < 0.05:
+            trajectory.append({**_coord(rng), "a73": "peak"})
+        if rng.random() < 0.05:
+            trajectory.append({**_coord(rng, 0.0), "a73": "bounce"})
+    trajectory.append({**_coord(rng), "a73": "last"})
+    # Missing coordinate values
+    if rng.random() < 0.05:
+        trajectory[int(rng.integers(len(trajectory)))]["a72"] = None
+    return trajectory
+
+
+def make_court_vision_match(n_points=300, seed=0, player_ids=("P001", "P002")):
+    """
+    Creates a synthetic raw court-vision dict (as returned by decode()) for a match of up to n_points points.
+
+    Args:
+        n_points (int, optional): Maximum number of points in the match. Defaults to 300.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        player_ids (tuple, optional): IDs of player1 and player2. Defaults to ("P001", "P002").
+
+    Returns:
+        dict: Synthetic raw court-vision data.
+    """
+    rng = np.random.default_rng(seed)
+    points_data = {}
+    for p in simulate_match_points(n_points, seed):
+        point_id = f"{p['set_n']}_{p['game']}_{p['point']}_{p['serve']}"
+        rally_length = int(rng.integers(1, 15))
+        # A few points have no tracking data at all
+        trajectory = [] if rng.random() < 0.02 else _trajectory(rng, rally_length)
+        speed = rng.uniform(90, 220)
+        set_scores = p["set_scores"] + [[0, 0]] * (5 - len(p["set_scores"]))
+        match_score = {}
+        for i, player in enumerate([0, 1]):
+            for s in range(5):
+                match_score[f"a{122 + 10*i + s}"] = str(set_scores[s][player])
+            for s in range(5):
+                match_score[f"a{127 + 10*i + s}"] = "0"
+        match_score["a142"] = p["p1_game_score"]
+        match_score["a143"] = p["p2_game_score"]
+        server, receiver = (player_ids if p["game"] % 2 else player_ids[::-1])
+        points_data[point_id] = {
+            'a11': 'false', 'a89': float(rng.uniform(0, 5)), 'a12': trajectory, 'a90': 'NA', 'a91': 'Cross Court',
+            'a92': 'NA', 'a81': point_id, 'a13': server, 'a14': player_ids[p["winner"]], 'a15': receiver,
+            'a16': f'{speed:.2f} KPH', 'a17': 'NA', 'a18': 'NA', 'a93': rally_length, 'a94': rally_length,
+            'a19': 'NA', 'a20': f'{rng.uniform(1, 5):.2f} Feet', 'a21': f'{speed:.2f} KPH',
+            'a22': f'{rng.uniform(0.3, 1.5):.2f} Metre', 'a23': 'NA', 'a24': 'NA', 'a95': 'Winner', 'a25': 'NA',
+            'a96': 'Flat', 'a97': 'DeuceCourt' if p["point"] % 2 else 'AdCourt', 'a98': str(p["set_n"]),
+            'a99': str(p["set_n"]), 'a100': str(p["game"]), 'a101': str(p["point"]), 'a102': str(p["serve"]),
+            'a103': 'ForeHand', 'a104': False, 'a26': False, 'a105': False, 'a106': False,
+            'a27': {**_coord(rng), 'a74': False}, 'a28': {'a70': None, 'a71': None, 'a72': None, 'a74': False},
+            'a29': {**_coord(rng), 'a74': False}, 'a30': {**_coord(rng, 0.0), 'a74': False},
+            'a31': {**_coord(rng), 'a74': False}, 'a32': {**_coord(rng, 0.0), 'a74': False},
+            'a33': {**_coord(rng, 0.0), 'a74': False}, 'a34': {**_coord(rng, 0.0), 'a74': False},
+            'a35': match_score, 'a36': 0, 'a108': False, 'a109': 0, 'a86': 1, 'a107': 1}
+
+    last_point = list(points_data)[-1]
+    return {"courtVisionData": [{
+        'a75': True, 'a76': "Men's Singles", 'a77': None, 'a78': 1, 'a50': points_data,
+        'a79': {'a83': [{'a85': 'PLAYER ONE', 'a86': player_ids[0], 'a87': 'AAA', 'a88': '1'}],
+                'a84': [{'a85': 'PLAYER TWO', 'a86': player_ids[1], 'a87': 'BBB', 'a88': '2'}]},
+        'a49': [], 'a80': int(last_point.split("_")[0]), 'a81': last_point.rsplit("_", 1)[0], 'a82': 'C'}]}
+
+
+def encrypt_payload(raw_data, last_modified=1700000000000):
+    """
+    Encrypts raw data into a payload like the ones returned by the ATP infosys API, i.e. the inverse of decode().
+
+    Args:
+        raw_data (dict): The raw data to encrypt.
+        last_modified (int, optional): The payload's lastModified (ms timestamp) the key is derived from. Defaults to 1700000000000.
+
+    Returns:
+        dict: The payload {"lastModified": last_modified, "response": <base64 ciphertext>}.
+    """
+    key = formatDate(last_modified)
+    padder = cryptography.hazmat.primitives.padding.PKCS7(128).padder()
+    plaintext = padder.update(json.dumps(raw_data).encode("utf-8")) + padder.finalize()
+    encryptor = cryptography.hazmat.primitives.ciphers.Cipher(
+        cryptography.hazmat.primitives.ciphers.algorithms.AES(key.encode()),
+        cryptography.hazmat.primitives.ciphers.modes.CBC(key.upper().encode())).encryptor()
+    return {"lastModified": last_modified, "response": base64.b64encode(encryptor.update(plaintext) + encryptor.finalize()).decode()}
+
+
+# Categories of the raw rally-analysis data, by the shot ending the point
+RALLY_CATEGORIES = ["Serve", "Return", "3rd shot", "4th shot", "5th shot", "6th shot", "7th shot", "8th shot",
+                    "9+ odd shots", "10+ even shots", "UNCLASSIFIED"]
+
+
+def make_rally_analysis_match(n_points=300, seed=0, player_ids=("P001", "P002")):
+    """
+    Creates a synthetic raw rally-analysis dict (as returned by decode()) for a match of up to n_points points, with
+    each point in the category (shot ending it) and outcome (t1/t2 win/err) of its winner. Includes double faults
+    wrongly given as the opponent's wins, like in the ATP's data.
+
+    Args:
+        n_points (int, optional): Maximum number of points in the match. Defaults to 300.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        player_ids (tuple, optional): IDs of player1 and player2. Defaults to ("P001", "P002").
+
+    Returns:
+        dict: Synthetic raw rally-analysis data.
+    """
+    rng = np.random.default_rng(seed)
+    rally_data = [{"name": name, "t1err": [], "t1win": [], "t2err": [], "t2win": []} for name in RALLY_CATEGORIES]
+    points = simulate_match_points(n_points, seed)
+    for p in points:
+        category = int(rng.choice(len(RALLY_CATEGORIES), p=[0.2, 0.2, 0.12, 0.1, 0.09, 0.07, 0.06, 0.04, 0.05, 0.04, 0.03]))
+        server = (p["game"] + p["set_n"]) % 2
+        if category == 0 and rng.random() < 0.3:
+            point_end_type = "DOUBLE FAULT"
+            # Double faults are the server's errors, but some appear in the receiver's wins
+            outcome = f"t{2 - server}win" if rng.random() < 0.5 else f"t{server + 1}err"
+        else:
+            point_end_type = str(rng.choice(["WINNER", "FORCED ERROR", "UNFORCED ERROR", "UNCLASSIFIED", "ACE"]))
+            outcome = f"t{p['winner'] + 1}win" if rng.random() < 0.5 else f"t{2 - p['winner']}err"
+        rally_data[category][outcome].append({
+            'crucialPoint': bool(rng.random() < 0.1), 'score': f"{p['p1_game_score']}-{p['p2_game_score']}",
+            'hand': str(rng.choice(["NA", "F", "B"])), 'pointEndType': point_end_type,
+            'pointId': f"{p['set_n']}_{p['game']}_{p['point']}_{p['serve']}", 'serve': p['serve'],
+            'serveDir': None, 'courtSide': None, 'serveSpeed': int(rng.integers(0, 230)), 'set': p['set_n'],
+            'shotType': None, 't1BreakPoint': bool(rng.random() < 0.05), 't2BreakPoint': bool(rng.random() < 0.05),
+            't1NetPoint': bool(rng.random() < 0.1), 't2NetPoint': bool(rng.random() < 0.1),
+            'tieBreak': p['set_scores'][-1] == [6, 6], 'setPoint': bool(rng.random() < 0.02)})
+
+    n_sets = points[-1]["set_n"]
+    return {"setsCompleted": n_sets, "matchCompleted": True, "isDoubles": False, "maxSets": 5,
+            "playerDetails": [{"seed": str(i + 1), "player1Name": f"PLAYER {i + 1}", "player1Id": player_id,
+                               "player1Country": "AAA", "player2Name": None, "player2Id": None, "player2Country": None}
+                              for i, player_id in enumerate(player_ids)],
+            "pointsMissing": False, "rallyData": rally_data}
+
+
+# Raw key-stats rows of the ATP's matches and of the Grand Slams with Infosys API data, in their raw order (the Slams'
+# rows are named as in infotennis.processing.processing_keystats.slam_stats_columns)
+KEY_STATS_NAMES = ["Serve Rating", "Aces", "Double Faults", "1st Serve", "1st Serve Points Won", "2nd Serve Points Won",
+                   "Break Points Saved", "Service Games Played", "Return Rating", "1st Serve Return Points Won",
+                   "2nd Serve Return Points Won", "Break Points Converted", "Return Games Played", "Net Points Won",
+                   "Winners", "Unforced Errors", "Service Points Won", "Return Points Won", "Total Points Won",
+                   "Max Speed", "1st Serve Average Speed", "2nd Serve Average Speed"]
+SLAM_KEY_STATS_NAMES = {
+    "580": ["Aces", "Double Faults", "1st Serve", "1st Serve Points Won", "2nd Serve Points Won", "Break Points Converted",
+            "Net Points Won", "Return Points Won", "Winners", "Unforced Errors", "Total Points Won", "Max Speed",
+            "1st Serve Average Speed", "2nd Serve Average Speed"],
+    "520": ["Aces", "Double Faults", "1st Serve", "1st Serve Points Won", "2nd Serve Points Won", "Net Points Won",
+            "Break Points Converted", "Return Points Won", "Winners", "Unforced Errors", "Total Points Won", "Max Speed",
+            "1st Serve Average Speed", "2nd Serve Average Speed"],
+}
+
+
+def make_key_stats_match(n_sets=3, seed=0, tourn_id="404", player_ids=("P001", "P002"), slam_layout=14, tm_columns=False):
+    """
+    Creates a synthetic raw key-stats dict (as returned by decode()) for a match of n_sets sets, with the stats of
+    every set and the whole match (set0). Includes "0/0" ratios, nonsensical serve speeds and, outside of the Grand
+    Slams, matches missing some stats (e.g. no serve speeds).
+
+    Args:
+        n_sets (int, optional): Number of sets played. Defaults to 3.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        tourn_id (str, optional): Tournament ID, "520" or "580" for the Grand Slams' layout. Defaults to "404".
+        player_ids (tuple, optional): IDs of player1 and player2. Defaults to ("P001", "P002").
+        slam_layout (int, optional): No. of rows of the Grand Slams' stats (14, 11 without serve speeds, or 19 and 16
+            with 5 extra rows). Defaults to 14.
+        tm_columns (bool, optional): Whether to add the empty "tm" fields seen in the data from 2025. Defaults to False.
+
+    Returns:
+        dict: Synthetic raw key-stats data.
+    """
+    rng = np.random.default_rng(seed)
+
+    def ratio(numer, denom, pct=True):
+        pct_value = 0 if denom == 0 else round(numer*100/denom)
+        return f"{numer}/{denom} ({pct_value}%)" if pct else f"{numer}/{denom}"
+
+    def player_stats():
+        serve1_in, serve_total = int(rng.integers(10, 60)), int(rng.integers(60, 100))
+        serve1_won, serve2_won = int(rng.integers(0, serve1_in + 1)), int(rng.integers(0, serve_total - serve1_in + 1))
+        bp_faced = int(rng.integers(0, 6))
+        bp_chances = int(rng.integers(0, 6))
+        speeds = [int(rng.integers(180, 240)), int(rng.integers(170, 210)), int(rng.integers(130, 170))]
+        if rng.random() < 0.02:
+            speeds[0] = int(rng.integers(301, 999))
+        return {"Serve Rating": str(rng.integers(100, 350)), "Aces": str(rng.integers(0, 20)),
+                "Double Faults": str(rng.integers(0, 10)), "1st Serve": ratio(serve1_in, serve_total),
+                "1st Serve Points Won": ratio(serve1_won, serve1_in),
+                "2nd Serve Points Won": ratio(serve2_won, serve_total - serve1_in),
+                "Break Points Saved": ratio(int(rng.integers(0, bp_faced + 1)), bp_faced),
+                "Service Games Played": str(rng.integers(3, 20)), "Return Rating": str(rng.integers(20, 250)),
+                "1st Serve Return Points Won": ratio(int(rng.integers(0, 30)), 30),
+                "2nd Serve Return Points Won": ratio(int(rng.integers(0, 20)), 20),
+                "Break Points Converted": ratio(int(rng.integers(0, bp_chances + 1)), bp_chances),
+                "Return Games Played": str(rng.integers(3, 20)),
+                "Net Points Won": ratio(int(rng.integers(0, 10)), int(rng.integers(10, 20))),
+                "Winners": str(rng.integers(0, 60)), "Unforced Errors": str(rng.integers(0, 60)),
+                "Service Points Won": ratio(serve1_won + serve2_won, serve_total),
+                "Return Points Won": ratio(int(rng.integers(0, 50)), 80),
+                "Total Points Won": ratio(int(rng.integers(50, 120)), 200), "Max Speed": str(speeds[0]),
+                "1st Serve Average Speed": str(speeds[1]), "2nd Serve Average Speed": str(speeds[2])}
+
+    if tourn_id in SLAM_KEY_STATS_NAMES:
+        names = SLAM_KEY_STATS_NAMES[tourn_id][:{14: 14, 11: 11, 19: 14, 16: 11}[slam_layout]]
+        extra_names = [f"Extra Stat {i}" for i in range(slam_layout - len(names))]
+    else:
+        names = list(KEY_STATS_NAMES)
+        # Some matches e.g. qualifiers at 250s don't have certain collected stats
+        if rng.random() < 0.2:
+            names = names[:-3]
+        if rng.random() < 0.1:
+            names.remove("Net Points Won")
+        extra_names = []
+
+    set_stats = {}
+    for set_n in range(n_sets + 1):
+        stats = [player_stats(), player_stats()]
+        if tourn_id in SLAM_KEY_STATS_NAMES:
+            for player_stats_ in stats:
+                player_stats_["Total Points Won"] = player_stats_["Total Points Won"].split("/")[0]
+        rows = []
+        for order, name in enumerate(names + extra_names):
+            row = {"order": order, "name": name}
+            for i in range(2):
+                row[f"player{i+1}"] = stats[i].get(name, str(rng.integers(0, 10)))
+            for i in range(2):
+                row[f"player{i+1}Bar"] = float(rng.random())
+            row["influence"] = "neutral"
+            if tm_columns:
+                row["tm1"], row["tm2"] = "", ""
+            row["player1Points"], row["player2Points"] = None, None
+            rows.append(row)
+        set_stats[f"set{set_n}"] = rows
+    # The empty sets not played
+    for set_n in range(n_sets + 1, 6):
+        set_stats[f"set{set_n}"] = []
+
+    return {"courtId": 1, "matchCompleted": True, "isDoubles": False, "setsCompleted": n_sets,
+            "players": [{"seed": "1", "player1Name": "PLAYER ONE", "player1Id": player_ids[0], "player1Country": "AAA"},
+                        {"seed": "2", "player1Name": "PLAYER TWO", "player1Id": player_ids[1], "player1Country": "BBB"}],
+            "setStats": set_stats}
+
+
+def make_results_page(n_matches=127, doubles=False, seed=0, matches_per_day=16):
+    """
+    Generates the HTML of a tournament results page like the ATP's (e.g. https://www.atptour.com/en/scores/archive/
+    australian-open/580/2024/results), with matches grouped into days (div.atp_accordion-item). Includes seeds,
+    tiebreaks, unplayed sets, missing flags (singles only, the doubles parsing requires them), players without a profile link and matches without a stats link.
+
+    Args:
+        n_matches (int, optional): Number of matches. Defaults to 127 (a Grand Slam singles draw).
+        doubles (bool, optional): Whether to generate doubles matches (2 players per team). Defaults to False.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        matches_per_day (int, optional): Number of matches per day. Defaults to 16.
+
+    Returns:
+        str: The page's HTML.
+    """
+    rng = np.random.default_rng(seed)
+    rounds = ["Round of 128", "Round of 64", "Round of 32", "Round of 16", "Quarterfinals", "Semifinals", "Final",
+              "1st Round Qualifying", "2nd Round Qualifying"]
+    nations = ["ita", "srb", "esp", "usa", "aus", "fra", "ger", "gbr"]
+
+    def player_html(i):
+        name = f"P. Player{i:03d} Name{'-Two' * int(rng.integers(0, 2))}"
+        if rng.random() < 0.03:
+            pinfo = f"<p>{name}</p>"
+        else:
+            pinfo = f'<a href="/en/players/player-{i}/p{i:03d}/overview">\n            {name}\n        </a>'
+        seed_ = rng.choice(["", f"({int(rng.integers(1, 33))})", "(WC)", "(Q)"], p=[0.55, 0.3, 0.05, 0.1])
+        if not doubles and rng.random() < 0.01:
+            flag = '<svg class="atp-flag"></svg>'
+        else:
+            flag = f'<svg class="atp-flag flag-{rng.choice(nations)}"><use href="/assets/atptour/assets/flags.svg#flag-{rng.choice(nations)}"></use></svg>'
+        return (f'<div class="player-info"><div class="flag">{flag}</div>'
+                f'<div class="name">{pinfo} <span>{seed_}</span></div></div>')
+
+    def scores_html(sets, tiebreaks):
+        items = []
+        for games, tiebreak in zip(sets, tiebreaks):
+            spans = f"<span>{games}</span>" + (f"<span>{tiebreak}</span>" if tiebreak is not None else "")
+            items.append(f'<div class="score-item">{spans}</div>')
+        items += ['<div class="score-item"></div>'] * (5 - len(sets))
+        return f'<div class="scores">{"".join(items)}</div>'
+
+    matches = []
+    for m in range(n_matches):
+        n_sets = int(rng.integers(3, 6))
+        sets_1, sets_2, tiebreaks_1, tiebreaks_2 = [], [], [], []
+        for _ in range(n_sets):
+            if rng.random() < 0.2:
+                tiebreak = int(rng.integers(0, 11))
+                winner_1 = rng.random() < 0.5
+                sets_1.append(7 if winner_1 else 6)
+                sets_2.append(6 if winner_1 else 7)
+                tiebreaks_1.append(None if winner_1 else tiebreak)
+                tiebreaks_2.append(tiebreak if winner_1 else None)
+            else:
+                games = int(rng.integers(0, 5))
+                winner_1 = rng.random() < 0.5
+                sets_1.append(6 if winner_1 else games)
+                sets_2.append(games if winner_1 else 6)
+                tiebreaks_1.append(None)
+                tiebreaks_2.append(None)
+        n_players = 2 if doubles else 1
+        team_1 = "".join(player_html(4*m + k) for k in range(n_players))
+        team_2 = "".join(player_html(4*m + 2 + k) for k in range(n_players))
+        if rng.random() < 0.05:
+            cta = '<a href="/en/players/atp-head-2-head/p-vs-p/a/b">H2H</a>'
+        else:
+            cta = (f'<a href="/en/players/atp-head-2-head/p-vs-p/a/b">H2H</a>'
+                   f'<a href="/en/scores/match-stats/archive/2024/580/{"md" if doubles else "ms"}{m+1:03d}">Stats</a>')
+        matches.append(
+            f'<div class="match"><div class="match-header"><span><strong>{rounds[m % len(rounds)]} - Court {m % 20}</strong></span>'
+            f'<span>0{m % 5}:{m % 60:02d}:00</span></div><div class="match-content"><div class="match-stats">'
+            f'<div class="stats-item">{team_1}{scores_html(sets_1, tiebreaks_1)}</div>'
+            f'<div class="stats-item">{team_2}{scores_html(sets_2, tiebreaks_2)}</div></div></div>'
+            f'<div class="match-footer"><div class="match-cta">{cta}</div></div></div>')
+
+    days = []
+    for d in range(0, n_matches, matches_per_day):
+        days.append(f'<div class="atp_accordion-item"><div class="tournament-day"><h4>Day ({d // matches_per_day + 1})</h4></div>'
+                    f'<div class="atp_accordion-content">{"".join(matches[d:d + matches_per_day])}</div></div>')
+    return (f'<!DOCTYPE html><html><head><title>Results</title></head><body><div class="atp_layout">'
+            f'<div class="tournament-results">{"".join(days)}</div></div></body></html>')
@@ -0,0 +1,80 @@
+"""
+Settings of the scrapers and routines, i.e. the sections of config.yaml (see the comments in the file).
+
+The file is read (and yaml imported) the first time a setting is accessed rather than when a module is imported, and
+only once per process and file (see get_config()), e.g.
+
+    config = get_config()
+    url = config["atp"]["calendar"]
+    n_workers = config.get_setting("processing", "workers", 1)
+"""
+import os
+import threading
+
+# config.yaml at the root of the repository
+config_path_default = os.path.join(os.path.dirname(__file__), "../config.yaml")
+
+
+class Config:
+    """
+    Settings of a config file, loaded when first accessed. The sections are accessed like the keys of a dict.
+
+    Args:
+        path (str, optional): Path of the config file. Defaults to config_path_default.
+    """
+    def __init__(self, path=None):
+        self.path = path if path is not None else config_path_default
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        """
+        dict: The parsed config file (read the first time it is accessed).
+        """
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    import yaml
+                    with open(self.path, "r") as yamlfile:
+                        self._data = yaml.safe_load(yamlfile) or {}
+        return self._data
+
+    def __getitem__(self, section):
+        return self.data[section]
+
+    def __contains__(self, section):
+        return section in self.data
+
+    def get(self, section, default=None):
+        """
+        Returns a section of the config, or default if it is missing.
+        """
+        return self.data.get(section, default)
+
+    def get_setting(self, section, key, default=None):
+        """
+        Returns a setting of a section, or default if the section or setting is missing.
+        """
+        return (self.data.get(section) or {}).get(key, default)
+
+
+# Config of each file path loaded in this process
+configs_loaded = {}
+configs_lock = threading.Lock()
+
+def get_config(path=None):
+    """
+    Returns the Config of a config file, the same (cached) object for every call with the same file.
+
+    Args:
+        path (str, optional): Path of the config file. Defaults to None (config.yaml at the root of the repository).
+
+    Returns:
+        Config: The config.
+    """
+    path = os.path.abspath(path if path is not None else config_path_default)
+    with configs_lock:
+        if path not in configs_loaded:
+            configs_loaded[path] = Config(path)
+        return configs_loaded[path]
@@ -0,0 +1,140 @@
+"""
+Batch processing functions for raw scraped data to dataframe (for DB insertion). Each function processes many
+matches of one data type into a single, typed dataframe (e.g. for 1 bulk insert per batch).
+
+The matches are given as an iterable of (metadata, raw_data) pairs, where metadata is a dict (or a row of the
+results dataframe) with at least the keys "year", "tournament_id", "match_id" and "round". For key-stats, an
+optional 3rd element can be given, i.e. (metadata, raw_data, raw_data_rallies), with the match's raw rally-analysis data
+or its unreturned serves already derived from it (see processing_keystats.get_unret_serves_index()).
+"""
+import logging
+
+import pandas as pd
+
+from infotennis.processing.processing_keystats import read_key_stats, format_key_stats
+from infotennis.processing.processing_rallys import process_rally_analysis
+from infotennis.processing.processing_strokes import process_stroke_analysis
+from infotennis.processing.processing_courtvision import process_points_data, process_court_vision_points
+from infotennis.schemas import apply_table_dtypes
+
+match_keys = ["year", "tournament_id", "match_id"]
+
+def get_match_args(metadata):
+    """
+    Returns the (year, tourn_id, match_id, round_n) args of a match for the processing functions.
+
+    Args:
+        metadata (dict or pandas.Series): Match metadata with keys "year", "tournament_id", "match_id" and "round".
+
+    Returns:
+        tuple: (year, tourn_id, match_id, round_n)
+    """
+    return metadata["year"], metadata["tournament_id"], metadata["match_id"], metadata["round"]
+
+def concat_processed(list_df: list, table: str):
+    """
+    Concatenates the processed dataframes of many matches once and casts them to the table's dtypes.
+
+    Args:
+        list_df (list): List of processed dataframes (Nones are skipped).
+        table (str): Table name or data type of the processed data (e.g. "key-stats").
+
+    Returns:
+        df_batch (pandas.DataFrame): Concatenated and typed dataframe (empty if there is no data).
+    """
+    list_df = [df for df in list_df if df is not None and len(df) > 0]
+    if len(list_df) == 0:
+        return pd.DataFrame()
+    df_batch = pd.concat(list_df, ignore_index=True)
+    return apply_table_dtypes(df_batch, table)
+
+def process_key_stats_batch(matches):
+    """
+    Processes raw key-stats data of many matches into a single dataframe. See process_key_stats(). The raw stats of
+    all matches are read first, and then processed at once (see format_key_stats()).
+
+    Args:
+        matches (iterable): (metadata, raw_data) pairs or (metadata, raw_data, raw_data_rallies) triples, where
+        raw_data_rallies can also be the match's unreturned serves (see get_unret_serves_index()).
+
+    Returns:
+        df_stats (pandas.DataFrame): Processed key-stats dataframe of all matches.
+    """
+    list_df = []
+    for match in matches:
+        metadata, raw_data = match[0], match[1]
+        raw_data_rallies = match[2] if len(match) > 2 else None
+        if raw_data_rallies is not None and "rallyData" not in raw_data_rallies:
+            list_df.append(read_key_stats(*get_match_args(metadata), raw_data, unret_serves=raw_data_rallies))
+        else:
+            list_df.append(read_key_stats(*get_match_args(metadata), raw_data, raw_data_rallies=raw_data_rallies))
+    list_df = [df for df in list_df if len(df) > 0]
+    if len(list_df) == 0:
+        return pd.DataFrame()
+    return format_key_stats(pd.concat(list_df, ignore_index=True))
+
+def process_rally_analysis_batch(matches):
+    """
+    Processes raw rally-analysis data of many matches into a single dataframe. See process_rally_analysis().
+
+    Args:
+        matches (iterable): (metadata, raw_data) pairs.
+
+    Returns:
+        df_rallies (pandas.DataFrame): Processed rally-analysis dataframe of all matches.
+    """
+    list_df = [process_rally_analysis(*get_match_args(metadata), raw_data) for metadata, raw_data in matches]
+    return concat_processed(list_df, "rally_analysis")
+
+def process_stroke_analysis_batch(matches):
+    """
+    Processes raw stroke-analysis data of many matches into a single dataframe. See process_stroke_analysis().
+
+    Args:
+        matches (iterable): (metadata, raw_data) pairs.
+
+    Returns:
+        df_strokes (pandas.DataFrame): Processed stroke-analysis dataframe of all matches.
+    """
+    list_df = [process_stroke_analysis(*get_match_args(metadata), raw_data) for metadata, raw_data in matches]
+    return concat_processed(list_df, "stroke_analysis")
+
+def process_court_vision_batch(matches):
+    """
+    Processes raw court vision data of many matches into a single dataframe. Only the point data is flattened per
+    match, the trajectories and match scores of all matches are processed together. See process_court_vision().
+
+    Args:
+        matches (iterable): (metadata, raw_data) pairs.
+
+    Returns:
+        df_court_vision (pandas.DataFrame): Processed court vision dataframe of all matches.
+    """
+    list_df_points = [process_points_data(*get_match_args(metadata), raw_data) for metadata, raw_data in matches]
+    list_df_points = [df for df in list_df_points if len(df) > 0]
+    if len(list_df_points) == 0:
+        return pd.DataFrame()
+    df_points_sorted = pd.concat(list_df_points, ignore_index=True)
+    return concat_processed([process_court_vision_points(df_points_sorted)], "court_vision")
+
+# Batch processing function for each data type
+batch_functions = {"key-stats": process_key_stats_batch,
+                "rally-analysis": process_rally_analysis_batch,
+                "stroke-analysis": process_stroke_analysis_batch,
+                "court-vision": process_court_vision_batch}
+
+def process_batch(data_type: str, matches):
+    """
+    Processes raw data of many matches of the given data type into a single dataframe.
+
+    Args:
+        data_type (str): Type of data ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+        matches (iterable): (metadata, raw_data) pairs (see the module docstring).
+
+    Returns:
+        df_batch (pandas.DataFrame): Processed and typed dataframe of all matches.
+    """
+    if data_type not in batch_functions:
+        logging.error(f"Unrecognised data_type {data_type} provided.")
+        raise ValueError(f"Unrecognised data_type {data_type} provided.")
+    return batch_functions[data_type](matches)
@@ -6,6 +6,8 @@ Processing functions for raw scraped data to dataframe (for DB insertion). For A
 import numpy as np
 import pandas as pd
 
+from infotennis.schemas import get_point_key
+
 # Court Vision raw data columns have been anonymised. The following 2 dicts maps suggested names to each column present 
 # in the raw data. (Credit: petertea96)
 dict_cols = {
@@ -78,11 +80,60 @@ matchScore_cols = {'a122': 'p1_set1_score',
 'a142': 'p1_game_score',
 'a143': 'p2_game_score'}
 
+# Keys of the ball trajectory coordinates (elements of the 'trajectory_data' list)
+dict_traj_keys = {"a70": "x", "a71": "y", "a72": "z", "a73": "position"}
+# Keys of the coordinate columns (e.g. 'ball_hit_coordinate'), which are flattened into <prefix>_x, <prefix>_y etc.
+dict_coord_keys = {"a70": "x", "a71": "y", "a72": "z", "a74": "erroneous_ball"}
+coord_cols = ['ball_hit_coordinate', 'ball_peak_coordinate', 'ball_net_coordinate','ball_bounce_coordinate','ball_last_coordinate',\
+            'server_coordinate','receiver_coordinate','serve_bounce_coordinate']
+# Columns with a value and unit given as a str (e.g. "189.34 KPH"), stored as float
+float_cols = ['ball_speed', 'return_speed', 'return_speed_kmh', 'spin', 'height_above_net',\
+    'ball_speed_kmh', 'height_above_net_m', 'distance_outside_court', 'distance_outside_court_m']
+
+def parse_unit_value(value):
+    """
+    Returns the numeric part of a value given with a unit (e.g. "189.34 KPH" -> 189.34), or NaN if there
+    is none (e.g. "NA").
+    """
+    try:
+        return float(str(value).split(" ")[0])
+    except ValueError:
+        return np.nan
+
+def flatten_point_data(point_data: dict):
+    """
+    Renames the anonymised keys of a single point's raw data and flattens its nested coordinate and match score 
+    dicts into top-level keys, in a single pass. The 'trajectory_data' list is kept as is (with its raw keys, 
+    see dict_traj_keys) for process_match_trajectories().
+
+    Args:
+        point_data (dict): Raw court vision data of a single point (an element under the 'pointsData' key).
+
+    Returns:
+        row (dict): Flat dict of the point's data, e.g. {'point_id': ..., 'ball_hit_x': ..., 'p1_set1_score': ...}.
+    """
+    row = {}
+    for key, value in point_data.items():
+        col = dict_cols.get(key, key)
+        if col in coord_cols:
+            prefix = col.replace("_coordinate", "")
+            for ckey, cval in (value or {}).items():
+                row[f"{prefix}_{dict_coord_keys.get(ckey, ckey)}"] = cval
+        elif col == "match_score":
+            for skey, sval in (value or {}).items():
+                row[matchScore_cols.get(skey, skey)] = sval
+        elif col in float_cols:
+            row[col] = parse_unit_value(value)
+        else:
+            row[col] = value
+    return row
+
 # Processing Functions
 def process_points_data(year: int, tourn_id: str, match_id: str, round_n: str, raw_data: dict):
     """
     1st step of processing raw court vision data scraped from the ATP, AO and RG infosys sites.
-    Top-Level JSON dict key renaming and key/column renaming for majority of elements under the 'pointsData' key. 
+    Renames the keys of every point under the 'pointsData' key and flattens them into typed columns (see 
+    flatten_point_data()). The raw_data dict is not modified.
 
     Args:
         year (int): Year in which the match took place (e.g. 2023).
@@ -95,49 +146,22 @@ def process_points_data(year: int, tourn_id: str, match_id: str, round_n: str, r
         df_points_sorted (pandas.core.frame.DataFrame): Intermediate processed court vision data 
         with named columns and sorted by point occurrence.
     """
-    data_dict = raw_data['courtVisionData'][0]
-
     new_keys = ['is_match_complete', 'event_type', 'court_name', 'court_id', 'points_data', 'players_data', 'stats_data', 'sets_completed', 'point_id', 'match_status']
+    data_dict = dict(zip(new_keys, raw_data['courtVisionData'][0].values()))
 
-    for i,key in enumerate(list(data_dict.keys())):
-        data_dict[new_keys[i]] = data_dict.pop(key)
-
-    point_keys = data_dict['points_data'].keys()
-    df_points_list = [pd.json_normalize(data_dict['points_data'][pkey], max_level=0) for pkey in point_keys ]
-
-    df_points = pd.concat(df_points_list)
-
-    # Rename all first level columns in df_points
-    df_points = df_points.rename(columns=dict_cols)
-
-    # Rename the columns of the tracking data coordinates
-    df_points['trajectory_data'] = df_points['trajectory_data'].apply(lambda x: pd.DataFrame(x).rename(columns={"a70": "x", "a71": "y", "a72": "z", "a73": "position"}).to_dict('records') )
-
-    # Rename the x,y,z coords in the following columns
-    for key in ['ball_hit_coordinate', 'ball_peak_coordinate', 'ball_net_coordinate','ball_bounce_coordinate','ball_last_coordinate',\
-                'server_coordinate','receiver_coordinate','serve_bounce_coordinate']:
-        df_points[key] = df_points[key].apply(lambda x: pd.DataFrame([x]).rename(columns={"a70": "x", "a71": "y", "a72": "z", "a74": "erroneous_ball"}).to_dict('records')[0] )
-    
-    # Rename the keys in the matchScore column
-    df_points['match_score'] = df_points['match_score'].apply(lambda x: pd.DataFrame([x]).rename(columns=matchScore_cols).to_dict('records')[0] )
+    df_points = pd.DataFrame([flatten_point_data(point) for point in data_dict['points_data'].values()])
 
     # Set these columns as int type so that their values will be sorted numerically rather than as strings
     cols_toset2int = ["rally_length", "rally_length_werr", "set_n", "set", "game", "point","serve"]
     df_points = df_points[~(df_points[cols_toset2int] == "NA").any(axis=1)] # Remove any rows with "NA" entry here so that the dtype can be changed to int
-    for col in cols_toset2int:
-        df_points[col] = df_points[col].astype(int)
-
-    # Set these columns as float type
-    float_cols = ['ball_speed', 'return_speed', 'return_speed_kmh', 'spin', 'height_above_net',\
-        'ball_speed_kmh', 'height_above_net_m', 'distance_outside_court', 'distance_outside_court_m']
+    df_points = df_points.astype({col: int for col in cols_toset2int})
 
-    for col in float_cols:
-        df_points[col] = pd.to_numeric(df_points[col].apply(lambda x: x.split(" ")[0]), errors="coerce")
+    df_points["point_key"] = get_point_key(df_points["set"], df_points.game, df_points.point, df_points.serve)
 
-    df_points_sorted = df_points.sort_values(["set", "game", "point","serve"]).reset_index(drop=True)
+    df_points_sorted = df_points.sort_values("point_key", kind="stable").reset_index(drop=True)
 
     # Assign a player1_id and player2_id that matches up with the player1 and 2 in the court-vision data e.g. in matchScore
-    player_ids = [raw_data['courtVisionData'][0]['players_data'][k][0]['a86'] for k in raw_data['courtVisionData'][0]['players_data'].keys()]
+    player_ids = [data_dict['players_data'][k][0]['a86'] for k in data_dict['players_data'].keys()]
 
     ### 3. Match Metadata 
     df_points_sorted.insert(0, "year", [year]*len(df_points_sorted))
@@ -149,83 +173,35 @@ def process_points_data(year: int, tourn_id: str, match_id: str, round_n: str, r
 
     return df_points_sorted
 
-# Processing functions for the renamed "trajectory_data" column present in the df_points_sorted returned by process_points_data()
-def save_trajectory_data_one_rally(one_point_sequence):
-    """
-    Takes an input dictionary containing trajectory data sequence of a single point, and returns
-    a dataframe of each recorded coordinate sorted by stroke and trajectory order. 
-
-    Credit: Taken from petertea96's Github Repo, with minor edits.
-
-    Args:
-        one_point_sequence (dict or pandas.core.series.Series): Dictionary/Series containing the ball trajectory coordinates for a single point 
-        derived directly from the raw data.
-
-    Returns:
-        df_ball_trajectory (pandas.core.frame.DataFrame): Dataframe containing the trajectory data sequence
-        for one point. Columns are: 
-            x, y, z, position, stroke_idx, point_id, set_n, game, point, serve
-    """
-    df_ball_trajectory = pd.DataFrame(one_point_sequence['trajectory_data'])
-    # If trajectory data is missing, just return a DF with dummy -999 values for x,y,z
-    if df_ball_trajectory.empty:
-        df_ball_trajectory = pd.DataFrame(columns=["x", "y", "z", "position", "stroke_idx", "point_id", "set_n", "game", "point", "serve"])
-        df_ball_trajectory.loc[0] = [-999, -999, -999, "hit", 1, one_point_sequence['point_id'], one_point_sequence['set_n'], \
-                                    one_point_sequence['game'], one_point_sequence['point'], one_point_sequence['serve']]
-        return df_ball_trajectory
-    #######################################################################
-    #                     Match situation information                     #
-    #######################################################################
-    # --> Get indices where ball is hit 
-    hit_indices = df_ball_trajectory.index[df_ball_trajectory['position'] == 'hit'].tolist()
-    hit_indices.append(df_ball_trajectory.shape[0])
-
-    # Get lengths of rally index (expect 4 or 5)
-    # In the usual case, we expect this sequence: Hit --> Peak --> Net --> Bounce
-    # But what if it's a half volley? (Hit --> Peak --> Net)
-    # But what if it's a hit on the rise?  Hit --> Peak --> Net --> Bounce --> Peak
-    # *** Ball trajectory also includes erroneous balls (mishits)...so we sometimes get strike_index = 1 + rally_index
-    hit_indices_diff_len = [x - hit_indices[i - 1] for i, x in enumerate(hit_indices)][1:]
-
-    rally_length = len(hit_indices_diff_len)
-
-    rally_index_list = []
-    for rally_ind in range(1, rally_length + 1):
-        rally_index_list.append(np.repeat( rally_ind, repeats=hit_indices_diff_len[rally_ind-1]))
-    
-    # Combine a list of numpy arrays into a single array
-    df_ball_trajectory['stroke_idx'] = np.concatenate( rally_index_list, axis=0 )
-    
-    ##################################################
-    #          Match situation information           #
-    ##################################################
-    df_ball_trajectory['point_id'] = one_point_sequence['point_id']
-    df_ball_trajectory['set_n'] = one_point_sequence['set_n']
-    df_ball_trajectory['game'] = one_point_sequence['game'] 
-    df_ball_trajectory['point'] = one_point_sequence['point']
-    df_ball_trajectory['serve'] = one_point_sequence['serve']
-    
-    return df_ball_trajectory
-
+# Processing functions for the "trajectory_data" column present in the df_points_sorted returned by process_points_data()
 # Create list of columns to be used for storing the ball coords in the processed data (wide format)
 cols_ordered = []
 traj_cols = ["hit", "peak_pre", "net", "bounce", "peak_post"]
 for col in traj_cols:
     cols_ordered += [c + col  for c in ["x_", "y_", "z_"]]
 
-def process_stroke_trajectory(df_stroke_trajectory: pd.DataFrame):
+def process_match_trajectories(df_points_sorted: pd.DataFrame, key_cols=['point_id', 'set_n', 'game', 'point', 'serve']):
     """
-    Converts the ball trajectory dataframe for 1 stroke (i.e. 1 stroke_idx) from long to wide format.
+    Processes the ball trajectory data of every point of a match into a wide format, with 1 row per stroke. All
+    trajectory coordinates of the match are flattened into numpy arrays once, the stroke_idx and peak_pre/peak_post
+    labels are derived with cumulative sums and the x,y,z coords are scattered into the wide cols_ordered layout in a
+    single pass (no per-point/per-stroke DataFrames or pivot tables).
+
+    The first non-null value is taken for repeated positions within a stroke, positions without a value are set to
+    -999, and strokes without any recorded coordinate are dropped. Points with no trajectory data get a single stroke
+    with -999 coords.
 
     Args:
-        df_stroke_trajectory (pandas.core.frame.DataFrame): Dataframe containing the trajectory data sequence
-        for one stroke (e.g. subset of data from df_ball_trajectory that belongs to 1 stroke_idx).
+        df_points_sorted (pandas.core.frame.DataFrame): Intermediate processed court vision data 
+        from process_points_data().
+        key_cols (list, optional): Columns of df_points_sorted to identify each stroke's point with. Defaults to
+        ['point_id', 'set_n', 'game', 'point', 'serve'] (add e.g. 'match_id' if df_points_sorted has several matches).
 
     Returns:
-        df_stroke_trajectory_wide (pandas.core.frame.DataFrame): Dataframe containing the trajectory data sequence
-        for one stroke as a single row (wide-format). Columns are: 
-            stroke_idx, point_id, set_n, game, point, serve, x_hit, y_hit, z_hit,...(other trajectory xyz coords)
-        
+        df_trajectories (pandas.core.frame.DataFrame): Dataframe of processed ball trajectory data for every point 
+        in a wide format, with 1 row per stroke. Columns are:
+            stroke_idx, <key_cols>, x_hit, y_hit, z_hit,...(other trajectory xyz coords)
+
         where the available trajectory suffixes are:
             hit:        where the ball contacts a racket
             peak_pre:   vertical peak of the ball pre-bounce or next hit
@@ -233,136 +209,149 @@ def process_stroke_trajectory(df_stroke_trajectory: pd.DataFrame):
             bounce:     where the ball bounces on the court (i.e. z=0)
             peak_post:  vertical peak of the ball post-bounce (if it did)
     """
-    idx_peaks = df_stroke_trajectory.index[df_stroke_trajectory.loc[:,"position"] == "peak"]
-    if len(idx_peaks) > 0:
-        df_stroke_trajectory.loc[idx_peaks[0], "position"] = 'peak_pre' #Trajectory peak pre-bounce (can be before or after crossing the net)
-    if len(idx_peaks) > 1:
-        df_stroke_trajectory.loc[idx_peaks[1], "position"] = 'peak_post' #Trajectory peak post-bounce
-
-    df_stroke_trajectory_wide = df_stroke_trajectory.pivot_table(index=['stroke_idx', 'point_id', 'set_n', 'game', 'point', 'serve'], columns='position', values=['x', 'y', 'z'], aggfunc='first')
-    # Flatten the multi-index columns
-    df_stroke_trajectory_wide.columns = [f'{col}_{pos}' for col, pos in df_stroke_trajectory_wide.columns]
-
-    # Reset the index
-    df_stroke_trajectory_wide.reset_index(inplace=True)
-    # Insert missing columns
-    for col in cols_ordered:
-    #    insert_missing_traj_col(df_stroke_wide, col)
-        if col not in df_stroke_trajectory_wide.columns:
-            df_stroke_trajectory_wide[col] = -999
-
-    df_stroke_trajectory_wide = df_stroke_trajectory_wide[list(df_stroke_trajectory_wide.columns[:6]) + cols_ordered]
-
-    return df_stroke_trajectory_wide
-
-def process_point_trajectory(df_ball_trajectory: pd.DataFrame):
-    """
-    Concats a list of process_stroke_trajectory() calls on df_stroke_trajectory within a point to return
-    a Dataframe of processed ball trajectory data for one point in a wide format.
-
-    Args:
-        df_ball_trajectory (pandas.core.frame.DataFrame): Dataframe of ball trajectory data, i.e. returned
-        from save_trajectory_data_one_rally().
+    n_points = len(df_points_sorted)
+    trajectories = [t if isinstance(t, list) else [] for t in df_points_sorted['trajectory_data']]
+    # Points without any trajectory data get a single dummy "hit" coordinate of -999 values
+    trajectories = [t if len(t) > 0 else [{"a70": -999, "a71": -999, "a72": -999, "a73": "hit"}] for t in trajectories]
+    n_coords = np.array([len(t) for t in trajectories], dtype=np.int64)
+
+    # Flatten every recorded coordinate of the match into 1d arrays
+    coords = [c for t in trajectories for c in t]
+    pt_idx = np.repeat(np.arange(n_points), n_coords)
+    position = np.array([c.get("a73") for c in coords], dtype=object)
+    xyz = np.array([[c.get("a70"), c.get("a71"), c.get("a72")] for c in coords], dtype=float).reshape(-1, 3)
+
+    # Stroke index: running count of "hit"s, restarted at every point
+    pt_start = np.cumsum(n_coords) - n_coords
+    is_hit = (position == "hit").astype(np.int64)
+    hit_cum = np.cumsum(is_hit)
+    stroke_idx = hit_cum - (hit_cum[pt_start] - is_hit[pt_start])[pt_idx]
+    # Coordinates before the first hit of a point can't be assigned to a stroke
+    keep = stroke_idx > 0
+    pt_idx, position, xyz, stroke_idx = pt_idx[keep], position[keep], xyz[keep], stroke_idx[keep]
+
+    # Unique id for every (point, stroke) pair, in order of occurrence
+    new_stroke = np.ones(len(stroke_idx), dtype=bool)
+    new_stroke[1:] = (pt_idx[1:] != pt_idx[:-1]) | (stroke_idx[1:] != stroke_idx[:-1])
+    stroke_id = np.cumsum(new_stroke) - 1
+    n_strokes = int(stroke_id[-1]) + 1 if len(stroke_id) > 0 else 0
+
+    # 1st peak of a stroke is the peak pre-bounce, 2nd peak is post-bounce (any further peaks are ignored)
+    is_peak = (position == "peak").astype(np.int64)
+    peak_cum = np.cumsum(is_peak)
+    stroke_start = np.flatnonzero(new_stroke)
+    peak_n = (peak_cum - (peak_cum[stroke_start] - is_peak[stroke_start])[stroke_id]) * is_peak
+
+    # Position code = index of the position in traj_cols, -1 for positions not stored (e.g. "last")
+    pos_code = np.full(len(position), -1, dtype=np.int64)
+    for pos in ["hit", "net", "bounce"]:
+        pos_code[position == pos] = traj_cols.index(pos)
+    pos_code[peak_n == 1] = traj_cols.index("peak_pre")
+    pos_code[peak_n == 2] = traj_cols.index("peak_post")
+
+    # Scatter the first non-null value of each (stroke, position, coord) into the wide array
+    wide = np.full((n_strokes, len(traj_cols), 3), -999, dtype=float)
+    for k in range(3):
+        valid = np.flatnonzero((pos_code >= 0) & ~np.isnan(xyz[:, k]))
+        _, first = np.unique(stroke_id[valid] * len(traj_cols) + pos_code[valid], return_index=True)
+        rows = valid[first]
+        wide[stroke_id[rows], pos_code[rows], k] = xyz[rows, k]
+
+    # Strokes where no coordinate at all has been recorded are dropped (as the pivot would)
+    has_data = np.zeros(n_strokes, dtype=bool)
+    has_data[stroke_id[~np.isnan(xyz).all(axis=1) & pd.notna(position)]] = True
+
+    stroke_pt = pt_idx[stroke_start]
+    df_trajectories = pd.DataFrame({"stroke_idx": stroke_idx[stroke_start]})
+    for col in key_cols:
+        df_trajectories[col] = df_points_sorted[col].to_numpy()[stroke_pt]
+    # cols_ordered is ordered by position then by x,y,z
+    df_wide = pd.DataFrame(wide.reshape(n_strokes, len(cols_ordered)), columns=cols_ordered)
+    df_trajectories = pd.concat([df_trajectories, df_wide], axis=1)[has_data].reset_index(drop=True)
+
+    return df_trajectories
+
+
+# Processing functions for the match score columns present in the df_points_sorted returned by process_points_data()
+# Set score (games each) at which a tiebreak is played, by tournament ID. Tournaments not listed here
+# use default_tiebreak_games. Add entries here for other tournaments with non-standard set formats.
+tiebreak_games = {
+    "7696": 3, # Next Gen Finals (sets to 4, tiebreak at 3-3)
+}
+default_tiebreak_games = 6
 
-    Returns:
-        df_point_trajectory (pandas.core.frame.DataFrame): Dataframe of processed ball trajectory data for one point in
-        a wide format. See help(process_stroke_trajectory) for dataframe columns and explanation.
+def process_match_scores(df_points_sorted: pd.DataFrame, tiebreak_games_map=None):
     """
-    pt_len = df_ball_trajectory.stroke_idx.max()
-    df_point_trajectory_wide = pd.concat([process_stroke_trajectory(df_ball_trajectory[df_ball_trajectory.stroke_idx==i]) for i in np.arange(1,pt_len+1)])
-    return df_point_trajectory_wide
-    
+    Returns the current match score for every point of one or more matches, computed for all points at once, i.e.
+    for every point of the intermediate court vision data, with the number of sets won per player and if the
+    point was played during a tie-break.
 
-# Processing functions for the renamed "match_score" column present in the df_points_sorted returned by process_points_data()
-def process_point_score(df_point_sorted: pd.DataFrame, setend_point_ids: list, tourn_id: str):
-    """
-    Returns a processed dataframe of the current match score for a given point from the intermediate
-    court vision data, which additionally derives the number of sets won per player and if the point was
-    played during a tie-break.
+    Set scores are compared numerically, and the number of sets won is -999 for both players if a preceding set's 
+    score is missing.
 
     Args:
-        df_point_sorted (pandas.core.series.Series): A single row of intermediate processed court vision data
-        from process_points_data().
-        setend_point_ids (list): List of point_ids of the match's converted set points.
-        tourn_id (str): Tournament ID of the match. Used to check for tie-break triggering format.
+        df_points_sorted (pandas.core.frame.DataFrame): Intermediate processed court vision data from 
+        process_points_data(), sorted by point occurrence within each match. Can contain several matches 
+        (identified by year, tournament_id and match_id).
+        tiebreak_games_map (dict, optional): Set score at which a tiebreak is played, by tournament_id. 
+        Defaults to None (i.e. use the module-level tiebreak_games).
 
     Returns:
-        df_point_score_processed (pandas.core.frame.DataFrame): Processed dataframe of the current match score for a given point from the intermediate
-    court vision data. Columns are: 
-        p1_sets_w, p2_sets_w, p1_set_score, p2_set_score, p1_game_score, p2_game_score, is_tiebreak
+        df_match_score (pandas.core.frame.DataFrame): Processed dataframe of the current match score for every point,
+        with the same index as df_points_sorted. Columns are: 
+            p1_sets_w, p2_sets_w, p1_set_score, p2_set_score, p1_game_score, p2_game_score, is_tiebreak
     """
-    df_point_score = df_point_sorted.match_score
-    set_n = df_point_sorted.set_n
-
-    # Compute how many sets each player has won at the current point
-    p1_sets_w = 0
-    p2_sets_w = 0
-    if set_n != 1:
-        for s in range(set_n-1, 0, -1):
-            try:
-                if df_point_score[f'p1_set{s}_score'] > df_point_score[f'p2_set{s}_score']:
-                    p1_sets_w += 1
-                elif df_point_score[f'p1_set{s}_score'] < df_point_score[f'p2_set{s}_score']:    
-                    p2_sets_w += 1
-            except: # Just none if there are missing data and the set_scores are NoneType, interrupting the >/< comparison
-                p1_sets_w = -999
-                p2_sets_w = -999
-                continue
-    
-    p1_set_score = df_point_score[f'p1_set{set_n}_score']
-    p2_set_score = df_point_score[f'p2_set{set_n}_score']
-
-    if p1_set_score is None:
-        p1_set_score = -999
-    if p2_set_score is None:
-        p2_set_score = -999
-
-    # For some reason the supposedly tb_score cols don't represent anything useful (by eye)
-    # if df_point_score[f'p1_set{set_n}_tb_score'] == "0" and df_point_score[f'p2_set{set_n}_tb_score'] == "0":
-    #     p1_game_score = df_point_score['p1_game_score']
-    #     p2_game_score = df_point_score['p2_game_score']
-    #     is_tiebreak = 0
-    # else:
-    #     p1_game_score = df_point_score['p1_set1_tb_score']
-    #     p2_game_score = df_point_score['p2_set1_tb_score']
-    #     is_tiebreak = 1
-    p1_game_score = df_point_score['p1_game_score']
-    p2_game_score = df_point_score['p2_game_score']
+    if tiebreak_games_map is None:
+        tiebreak_games_map = tiebreak_games
+    n_points = len(df_points_sorted)
+    set_n = df_points_sorted["set_n"].to_numpy(dtype=np.int64)
+    rows = np.arange(n_points)
+
+    # Set scores of each player as (n_points, n_sets) arrays, NaN where missing
+    n_sets = 5
+    p1_scores = np.column_stack([pd.to_numeric(df_points_sorted[f'p1_set{s}_score'], errors="coerce") for s in range(1, n_sets+1)]).astype(float)
+    p2_scores = np.column_stack([pd.to_numeric(df_points_sorted[f'p2_set{s}_score'], errors="coerce") for s in range(1, n_sets+1)]).astype(float)
+
+    # Compute how many sets each player has won before the current set
+    prev_sets = np.arange(1, n_sets+1) < set_n[:, None]
+    p1_sets_w = ((p1_scores > p2_scores) & prev_sets).sum(axis=1)
+    p2_sets_w = ((p1_scores < p2_scores) & prev_sets).sum(axis=1)
+    sets_missing = ((np.isnan(p1_scores) | np.isnan(p2_scores)) & prev_sets).any(axis=1)
+
+    p1_set_score = p1_scores[rows, set_n-1]
+    p2_set_score = p2_scores[rows, set_n-1]
+
+    p1_game_score = df_points_sorted['p1_game_score'].to_numpy()
+    p2_game_score = df_points_sorted['p2_game_score'].to_numpy()
+    no_game = (p1_game_score != "GAME") & (p2_game_score != "GAME")
 
     # Tiebreak determination
-    if tourn_id == '7696': # Tiebreak at 3-3 only for Nextgen Finals
-        score_tb = '3' # Set score both players must have for there to be a TB
-        score_tbW = '4'
-    else:
-        score_tb = '6'
-        score_tbW = '7'
-
-    if (df_point_score[f'p1_set{set_n}_score'] == score_tbW and df_point_score[f'p2_set{set_n}_score'] == score_tb) or \
-        (df_point_score[f'p1_set{set_n}_score'] == score_tb and df_point_score[f'p2_set{set_n}_score'] == score_tbW):
-        is_tiebreak = 1
-    elif df_point_score[f'p1_set{set_n}_score'] == score_tb and df_point_score[f'p2_set{set_n}_score'] == score_tb:
-        if p1_game_score != "GAME" and p2_game_score != "GAME": # If there is a "GAME", it's from the last point that just precedes the TB
-            is_tiebreak = 1
-        else:
-            is_tiebreak = 0
-    else:
-        is_tiebreak = 0
-
-    # Add an additional set to sets_w if the point is the last point of the match 
-    if df_point_sorted.point_id in setend_point_ids:
-        if p1_game_score == "GAME":
-            p1_sets_w += 1
-        else:
-            p2_sets_w += 1
-
-    df_point_score_processed = {"p1_sets_w": p1_sets_w, "p2_sets_w": p2_sets_w, "p1_set_score": int(p1_set_score), "p2_set_score": int(p2_set_score), \
-            "p1_game_score": p1_game_score, "p2_game_score": p2_game_score, "is_tiebreak": is_tiebreak}
-    
-    return df_point_score_processed
+    score_tb = df_points_sorted["tournament_id"].astype(str).map(tiebreak_games_map).fillna(default_tiebreak_games).to_numpy()
+    is_tiebreak = ((p1_set_score == score_tb+1) & (p2_set_score == score_tb)) | \
+        ((p1_set_score == score_tb) & (p2_set_score == score_tb+1)) | \
+        ((p1_set_score == score_tb) & (p2_set_score == score_tb) & no_game) # If there is a "GAME", it's from the last point that just precedes the TB
+
+    # Add an additional set to sets_w if the point is the last point of a set
+    match_cols = [col for col in ["year", "tournament_id", "match_id"] if col in df_points_sorted.columns]
+    is_set_end = ~df_points_sorted.duplicated(match_cols + ["set_n"], keep="last").to_numpy()
+    p1_sets_w = p1_sets_w + (is_set_end & (p1_game_score == "GAME"))
+    p2_sets_w = p2_sets_w + (is_set_end & (p1_game_score != "GAME"))
+
+    df_match_score = pd.DataFrame({
+        "p1_sets_w": np.where(sets_missing, -999, p1_sets_w),
+        "p2_sets_w": np.where(sets_missing, -999, p2_sets_w),
+        "p1_set_score": np.nan_to_num(p1_set_score, nan=-999).astype(np.int64),
+        "p2_set_score": np.nan_to_num(p2_set_score, nan=-999).astype(np.int64),
+        "p1_game_score": p1_game_score,
+        "p2_game_score": p2_game_score,
+        "is_tiebreak": is_tiebreak.astype(np.int64)}, index=df_points_sorted.index)
+
+    return df_match_score
 
 # Put all above functions in sequence to process from raw data -> dataframe for atp_court_vision table
 def process_court_vision(year: int, tourn_id: str, match_id: str, round_n: str, raw_data: dict):
-    """_summary_
+    """
+    Reads in raw court vision data and processes it into a dataframe with 1 row per shot-stroke.
 
     Args:
         year (int): Year in which the match took place (e.g. 2023).
@@ -376,16 +365,32 @@ def process_court_vision(year: int, tourn_id: str, match_id: str, round_n: str,
         per shot-stroke containing ball trajectory coordinates and match score at the given stroke's point.
     """
     df_points_sorted = process_points_data(year, tourn_id, match_id, round_n, raw_data)
-    # Return list of the row indexes of each set's last point
-    setend_point_ids = df_points_sorted.groupby("set_n").last().point_id.tolist()
+    df_court_vision = process_court_vision_points(df_points_sorted)
+
+    return df_court_vision
+
+def process_court_vision_points(df_points_sorted: pd.DataFrame):
+    """
+    Processes intermediate court vision data (from process_points_data()) of one or more matches into the final 
+    court vision dataframe, with 1 row per shot-stroke.
+
+    Args:
+        df_points_sorted (pandas.core.frame.DataFrame): Intermediate processed court vision data, sorted by point
+        occurrence within each match (e.g. the concatenated process_points_data() outputs of several matches).
+
+    Returns:
+        df_court_vision (pandas.core.frame.DataFrame): Final processed court vision data, with 1 row
+        per shot-stroke containing ball trajectory coordinates and match score at the given stroke's point.
+    """
+    point_keys = ["year", "tournament_id", "match_id", "point_id", "set_n", "game", "point", "serve"]
     # Return DF of all points' trajectories for the serve, return, 3rd shot and last shot
-    df_trajectories_all = pd.concat( [ process_point_trajectory(save_trajectory_data_one_rally(df_points_sorted.iloc[i])) for i in range(len(df_points_sorted)) ] )
+    df_trajectories_all = process_match_trajectories(df_points_sorted, key_cols=point_keys)
     # Return DF of the match score for every row in df_points_sorted
-    df_match_score = pd.DataFrame([process_point_score(df_points_sorted.iloc[x], setend_point_ids, tourn_id) for x in range(len(df_points_sorted))])
+    df_match_score = process_match_scores(df_points_sorted)
     df_points_sorted_shortn = df_points_sorted[["year", "tournament_id", "match_id", "round", "p1_id", "p2_id", "point_id", "server_id", "scorer_id", "receiver_id",\
                                                 "ball_speed_kmh", "rally_length", 'point_end_type', 'stroke_type', 'serve_type', 'court', 'set_n',\
-                                                'game', 'point', 'serve', 'hand', 'break_point','break_point_converted']]
+                                                'game', 'point', 'serve', 'point_key', 'hand', 'break_point','break_point_converted']]
     # Concat, and merge to create final processed DF
-    df_court_vision = pd.merge(pd.concat([df_points_sorted_shortn, df_match_score], axis=1), df_trajectories_all, on=["point_id", "set_n", "game", "point", "serve"])
+    df_court_vision = pd.merge(pd.concat([df_points_sorted_shortn, df_match_score], axis=1), df_trajectories_all, on=point_keys)
 
-    return df_court_vision
\ No newline at end of file
+    return df_court_vision
@@ -6,249 +6,291 @@ Processing functions for raw scraped data to dataframe (for DB insertion). For A
 import numpy as np
 import pandas as pd
 
+from infotennis.schemas import apply_table_dtypes, get_table_columns
+
 tourn_id_slams = ["520", "580"]
 
-def reverse_ratio(ratio_str: str):
+# Standardised names of the raw key-stats rows of the Grand Slams with Infosys API data (AO and RG), in their raw order.
+# Stats are ordered differently btn AO and RG annoyingly (net, BP)
+slam_stats_columns = {
+    "580": ['aces', 'double_faults', '1st_serve', '1st_serve_points_won', '2nd_serve_points_won', 'break_points_converted',
+            'net_points_won', 'return_points_won', 'winners', 'unforced_errors', 'total_points_won',
+            'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed'], # AO
+    "520": ['aces', 'double_faults', '1st_serve', '1st_serve_points_won', '2nd_serve_points_won', 'net_points_won',
+            'break_points_converted', 'return_points_won', 'winners', 'unforced_errors', 'total_points_won',
+            'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed'], # RG
+}
+
+# Layouts of the Slams' raw key-stats, by their no. of rows: the no. of leading rows which are (in order) the stats of
+# slam_stats_columns. Any remaining rows are dropped. Layouts not listed here are kept as they are.
+slam_stats_layouts = {
+    14: 14, # Full key stats
+    11: 11, # No serve speed data (seen at RG)
+    19: 14, # 5 extra rows at the end
+    16: 11, # 5 extra rows at the end, no serve speed data
+}
+
+# This is the set of columns expected if the full key stats are collected
+# Some matches e.g. qualifiers at 250s don't have certain collected stats
+columns_full = ['serve_rating', 'aces', 'double_faults', '1st_serve',
+    '1st_serve_points_won', '2nd_serve_points_won', 'break_points_saved',
+    'service_games_played', 'return_rating', '1st_serve_return_points_won',
+    '2nd_serve_return_points_won', 'break_points_converted',
+    'return_games_played', 'net_points_won', 'winners', 'unforced_errors',
+    'service_points_won', 'return_points_won', 'total_points_won',
+    'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed']
+columns_index = {col: i for i, col in enumerate(columns_full)}
+
+# Ratio columns (e.g. "3/4 (75%)") which are reformatted into a ratio (e.g. "3/4") and a % number column (col + "_pct")
+percen_list = ["1st_serve", "1st_serve_points_won", "2nd_serve_points_won", "break_points_saved",
+    "1st_serve_return_points_won", "2nd_serve_return_points_won", "break_points_converted",
+    "net_points_won", "service_points_won", "return_points_won", "total_points_won"]
+
+# Ratio expression, and its numerator and denominator if it has them, i.e. everything before the bracketed % value
+ratio_pattern = r"^(?P<ratio>(?:(?P<numer>\d+)/(?P<denom>\d+))?[^ ]*)"
+
+#Final renaming of columns to a more SQL-friendly standard
+num_cols_rnm = {"1st_serve":"serve1",\
+"1st_serve_pct": "serve1_pct",\
+"1st_serve_points_won":"serve1_pts_won",\
+"1st_serve_points_won_pct":"serve1_pts_won_pct",\
+"2nd_serve_points_won":"serve2_pts_won",\
+"2nd_serve_points_won_pct":"serve2_pts_won_pct",\
+"1st_serve_return_points_won":"serve1_return_pts_won",\
+"1st_serve_return_points_won_pct":"serve1_return_pts_won_pct",\
+"2nd_serve_return_points_won":"serve2_return_pts_won",\
+"2nd_serve_return_points_won_pct":"serve2_return_pts_won_pct",\
+"1st_serve_average_speed":"serve1_avg_speed",\
+"2nd_serve_average_speed":"serve2_avg_speed"}
+
+def parse_ratios(values: pd.Series):
     """
-    Takes a ratio and percentage expression (e.g. "3/4 (75%)") and returns it reversed e.g. "1/4 (25%)".
+    Parses ratio expressions (e.g. "3/4 (75%)") into the ratio without the bracketed % value (e.g. "3/4") and the ratio
+    as a percentage, rounded to 1dp (e.g. 75.0, 66.7). The percentage is 0 if the ratio is "0/0" and NaN if the value
+    isn't a ratio (e.g. "" for a missing stat).
 
     Args:
-        ratio_str (str): A str-type ratio expression (e.g. "3/4 (75%)").
+        values (pandas.Series): str-type ratio expressions.
 
     Returns:
-        str: A str-type ratio expression (e.g. "3/4 (75%)").
+        tuple: (numpy.ndarray of str ratios, numpy.ndarray of float numerators, numpy.ndarray of float denominators,
+        numpy.ndarray of float percentages).
     """
-    ratio, percen = ratio_str.split(" ")
-    percen = percen.replace("(","").replace(")","").replace("%","")
-
-    ratio_r = f'{int(ratio.split("/")[-1]) - int(ratio.split("/")[0])}/{ratio.split("/")[-1]}'
-    if ratio_r == "0/0":
-        percen_r = "(0%)"
-    else:
-        percen_r = f'({100- int(percen)}%)'
+    parts = values.astype(str).str.extract(ratio_pattern)
+    numer = parts["numer"].astype(float).to_numpy()
+    denom = parts["denom"].astype(float).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(denom == 0, 0, np.round(numer*100/denom, 1))
+    return parts["ratio"].to_numpy(dtype=object), numer, denom, pct
+
+def swap_players(values: np.ndarray):
+    """
+    Swaps the values of player1 and player2 of each set, for values ordered [player1, player2] per set.
+    """
+    return values.reshape(-1, 2)[:, ::-1].ravel()
 
-    return ratio_r + " " + percen_r
+def format_ratio(numer: np.ndarray, denom: np.ndarray):
+    """
+    Returns str-type ratio expressions (e.g. "3/4") from int numerators and denominators.
+    """
+    return pd.Series(numer.astype(int)).astype(str).str.cat(pd.Series(denom.astype(int)).astype(str), sep="/").to_numpy(dtype=object)
 
-def calc_percentage(ratio_str: str):
+def derive_slam_stats(df_slams: pd.DataFrame):
     """
-    Takes a ratio expression (e.g. "3/4")  and returns it expressed as a percentage, rounded to 1dp.
-    Returns 0 if given ratio is "0/0".
+    Computes the stats missing from the Grand Slams' raw key-stats (AO and RG) from the ones available, i.e. the total
+    points won as a ratio, service points won, return points won (on 1st and 2nd serves and overall) and break points
+    saved.
 
     Args:
-        ratio_str (str): A str-type ratio expression (e.g. "3/4", "2/3").
+        df_slams (pandas.DataFrame): Key-stats rows of Grand Slam matches with standardised columns, 2 rows per set
+        ordered [player1, player2].
 
     Returns:
-        float: A ratio as a percentage expression, rounded to 1dp (e.g. 75, 66.7).
+        dict: The derived columns (numpy.ndarray of str ratios).
     """
-    if ratio_str is None:
-        return None
-    numer = int(str(ratio_str).split(' ')[0].split("/")[0])
-    denom = int(str(ratio_str).split(' ')[0].split("/")[1])
-
-    if denom == 0:
-        return 0
-    else:
-        return np.round(numer*100/denom,1)
-
-def get_unret_serves(raw_data_r: dict, set_n=0):
-    """Returns a list containing the number of unreturned serves, [player1, player2], deriving from
-    the raw rally-analysis data for the match, if available.
+    # Total points won of both players in each set
+    total_won = df_slams["total_points_won"].astype(int).to_numpy()
+    total_played = np.repeat(total_won.reshape(-1, 2).sum(axis=1), 2)
+
+    _, serve1_won, serve1_played, _ = parse_ratios(df_slams["1st_serve_points_won"])
+    _, serve2_won, serve2_played, _ = parse_ratios(df_slams["2nd_serve_points_won"])
+    _, bp_won, bp_played, _ = parse_ratios(df_slams["break_points_converted"])
+    serve_won = serve1_won + serve2_won
+    serve_played = serve1_played + serve2_played
+
+    # Return points are the opponent's serve points not won by them. Return Points Won is re-done because the raw
+    # number from the API data doesn't add up with the derived 1st and 2nd returns
+    return {"total_points_won": df_slams["total_points_won"].to_numpy(dtype=object) + "/" + total_played.astype(str),
+            "service_points_won": format_ratio(serve_won, serve_played),
+            "1st_serve_return_points_won": format_ratio(swap_players(serve1_played - serve1_won), swap_players(serve1_played)),
+            "2nd_serve_return_points_won": format_ratio(swap_players(serve2_played - serve2_won), swap_players(serve2_played)),
+            "break_points_saved": format_ratio(swap_players(bp_played - bp_won), swap_players(bp_played)),
+            "return_points_won": format_ratio(swap_players(serve_played - serve_won), swap_players(serve_played))}
+
+def get_unret_serves_index(raw_data_r: dict):
+    """Returns the number of unreturned serves of each player per set, deriving from the raw rally-analysis data for
+    the match. It can be saved (e.g. alongside the raw data, see infotennis.raw_store.derived_data_types) for the
+    key-stats to be processed without the rally-analysis data.
 
     Args:
         raw_data_r (dict): Raw rally-analysis data, from which unreturned serves can be computed.
-        set_n (int, optional): Set number of the match to get stat for. Defaults to 0.
 
     Returns:
-        list_unret_serves (list): List of number of unreturned serves, [player1, player2].
+        unret_serves (dict): Number of unreturned serves [player1, player2] by set number (str, "0" is the whole match).
     """
-    # # Count unreturned Serves (From rally analysis data if avail)
-    p1_unret_list = [ item['pointId'] for item in pd.json_normalize(raw_data_r['rallyData']).iloc[1].t2err ]
-    p2_unret_list = [ item['pointId'] for item in pd.json_normalize(raw_data_r['rallyData']).iloc[1].t1err ]
-
-    # Subset data accordingly depending on which set's data is being processed
-    if set_n == 0:
-        list_unret_serves = [len(p1_unret_list), len(p2_unret_list)]
-        return list_unret_serves
-    else:
-        # Split into sets
-        # Since the "set number" of each point id is given by the prefix "setnum_"
-        p1_unret_list_s = [x for x in p1_unret_list if x[:2] == f"{set_n}_"]
-        p2_unret_list_s = [x for x in p2_unret_list if x[:2] == f"{set_n}_"]
+    # Unreturned serves of a player are their opponent's errors in the rally data's 2nd category (serve returns),
+    # given as point IDs, where the "set number" of each point id is given by the prefix "setnum_"
+    serve_returns = raw_data_r['rallyData'][1]
+    unret_serves = {"0": [0, 0]}
+    for i, key in enumerate(["t2err", "t1err"]):
+        for item in serve_returns[key]:
+            set_n = item['pointId'].split("_")[0]
+            unret_serves.setdefault(set_n, [0, 0])[i] += 1
+            unret_serves["0"][i] += 1
+    return unret_serves
+
+def read_set_stats(tourn_id: str, raw_set_stats: list):
+    """
+    Reads the raw key-stats of a set (1 dict per stat) into their standardised names and values.
 
-        list_unret_serves =  [len(p1_unret_list_s), len(p2_unret_list_s)]
-        return list_unret_serves
+    Args:
+        tourn_id (str): Tournament ID of the match (e.g. "404" - Indian Wells).
+        raw_set_stats (list): Raw key-stats of the set, e.g. raw_data['setStats']['set1'].
 
-def process_set_stats(year: int, tourn_id: str, match_id: str, round_n: str, 
-    player_ids: list, raw_data: dict, set_n=0, raw_data_rallies=None):
+    Returns:
+        tuple: (list of stat names, list of player1 values, list of player2 values).
+    """
+    # The stat's name and players' values are the 2nd to 4th fields of each stat (after "order").
+    # From 2025, there appeared to be extra fields in the setStats data (starting with "tm")
+    # These seem to be empty and will return assign rows/columns incorrectly if kept, so we skip them
+    key_name, key_p1, key_p2 = [key for key in raw_set_stats[0] if not key.startswith('tm')][1:4]
+    # Rename the stats to a lower case + underscore convention
+    names = [str(stat.get(key_name)).lower().replace(" ","_") for stat in raw_set_stats]
+    values_p1 = [stat.get(key_p1, "") for stat in raw_set_stats]
+    values_p2 = [stat.get(key_p2, "") for stat in raw_set_stats]
+
+    # Rename the raw key-stats of Grand Slams with Infosys API data (AO and RG) to the standard ones
+    if tourn_id in tourn_id_slams and len(names) in slam_stats_layouts:
+        n_stats = slam_stats_layouts[len(names)]
+        names = slam_stats_columns[tourn_id][:n_stats]
+        values_p1, values_p2 = values_p1[:n_stats], values_p2[:n_stats]
+    return names, values_p1, values_p2
+
+def read_key_stats(year: int, tourn_id: str, match_id: str, round_n: str,
+    raw_data: dict, raw_data_rallies=None, unret_serves=None):
     """
-    Reads in raw key-stats data and processes it into a dataframe for a single given set.
+    Reads in raw key-stats data of every set played and the whole match (set0) into a dataframe of the raw (str) stats
+    with standardised columns (columns_full) and the match metadata, 2 rows per set ordered [player1, player2]. The
+    stats of all sets are read into a long (set and player, stat, value) array, which is pivoted once into the columns.
 
     Args:
         year (int): Year in which the match took place (e.g. 2023).
         tourn_id (str): Tournament ID of the match (e.g. "404" - Indian Wells).
         match_id (str): Match ID of the match (e.g. "ms001").
         round_n (str): Round in which the match took place (e.g. "Final").
-        player_ids (list): List of str-type player IDs [player1Id, player2Id].
         raw_data (dict): Raw key-stats data (from JSON).
-        set_n (int, optional): Set number of the match to get stats for. Defaults to 0 (i.e. whole match).
         raw_data_rallies (dict, optional): Raw rally-analysis data, if provides, will compute the 
         unreturned serves stat, else unreturned serves will be set to -999. Defaults to None.
+        unret_serves (dict, optional): Unreturned serves of the match (see get_unret_serves_index()), used instead of
+        raw_data_rallies. Defaults to None.
 
     Returns:
-        df_set_stats (pandas.DataFrame): Processed key-stats dataframe for a single given set or the whole match (set0).
+        df_stats (pandas.DataFrame): Raw key-stats dataframe for every set and the whole match (set0).
     """
-    try:
-        # From 2025, there appeared to be extra columns in the setStats data (starting with "tm")
-        # These seem to be empty and will return assign rows/columns incorrectly if kept, so we drop them
-        df_sstats_raw = pd.DataFrame(raw_data['setStats'][f'set{set_n}'])
-        df_sstats_raw = df_sstats_raw.loc[:, ~df_sstats_raw.columns.str.startswith('tm')]
-        df_set_stats = df_sstats_raw.iloc[:,1:4].T
-    except KeyError:
-        return
-    # Return if df_stats is empty. Seen one case where 'setsCompleted' was incorrect (1 extra set) in raw_data.
-    if len(df_set_stats) == 0:
-        return 
-    # Set the first row to be the column names
-    df_set_stats.rename(columns=df_set_stats.iloc[0], inplace = True)
-    # Drop the original first row 
-    df_set_stats = df_set_stats.drop(df_set_stats.index[0])
-
-    # Rename the columns to a lower case + underscore convention
-    df_set_stats.columns =  [x.lower().replace(" ","_") for x in df_set_stats.columns]
+    ### Get some info from raw_data
+    # No. of sets played
+    n_sets = raw_data['setsCompleted']
+    # Get stats player IDs
+    player_ids = [player['player1Id'] for player in raw_data['players']]
+    tourn_id = str(int(tourn_id))
+
+    # Long array of the stats of all sets: row (2 per set, 1 per player), column of the stat and value
+    rows, cols, values = [], [], []
+    set_ns = []
+    for set_n in range(n_sets+1):
+        raw_set_stats = raw_data['setStats'].get(f'set{set_n}')
+        # Skip sets without stats. Seen one case where 'setsCompleted' was incorrect (1 extra set) in raw_data.
+        if not raw_set_stats:
+            continue
+        row = 2*len(set_ns)
+        for name, value_p1, value_p2 in zip(*read_set_stats(tourn_id, raw_set_stats)):
+            # Stats which aren't in columns_full are dropped
+            col = columns_index.get(name)
+            if col is not None:
+                rows += [row, row+1]
+                cols += [col, col]
+                values += [value_p1, value_p2]
+        set_ns.append(set_n)
+
+    # Pivot to 1 column per stat. If the raw stats are missing certain stat fields, they are given ""
+    stats = np.full((2*len(set_ns), len(columns_full)), "", dtype=object)
+    stats[rows, cols] = np.array(values, dtype=object)
+
+    # If rally-analysis data is available for this match, get the no. of unreturned serves, else fill with -999
+    if unret_serves is None and raw_data_rallies is not None:
+        unret_serves = get_unret_serves_index(raw_data_rallies)
+    if unret_serves is not None:
+        unret_serves = [n for set_n in set_ns for n in unret_serves.get(str(set_n), [0, 0])]
+    else:
+        unret_serves = [-999]*(2*len(set_ns))
 
-    # Extra processing steps for Grand Slams with Infosys API data (AO and RG)
-    if tourn_id in tourn_id_slams: 
-        # Stats are ordered differently btn AO and RG annoyingly (net, BP)
-        if tourn_id == "580": #AO
-            # Rename raw key-stats columns for AO/RG data to these to standardise
-            columns_slams = ['aces', 'double_faults', '1st_serve',
-            '1st_serve_points_won', '2nd_serve_points_won', 'break_points_converted',
-            'net_points_won', 'return_points_won', 'winners', 'unforced_errors', 'total_points_won',
-            'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed']
-        else: # RG (Serve Speed Data might be missing)
-            columns_slams = ['aces', 'double_faults', '1st_serve',
-            '1st_serve_points_won', '2nd_serve_points_won', 'net_points_won', 'break_points_converted',
-            'return_points_won', 'winners', 'unforced_errors', 'total_points_won',
-            'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed']
-
-
-        # Rename raw data columns first if the tourn_id is either 520 or 580
-        if len(df_set_stats.columns) != len(columns_slams):
-            if len(df_set_stats.columns) == len(columns_slams) - 3:
-                df_set_stats.columns = columns_slams[:-3]
-            elif len(df_set_stats.columns) == len(columns_slams) + 5:
-                df_set_stats = df_set_stats.iloc[:,:-5]
-                df_set_stats.columns = columns_slams
-            elif len(df_set_stats.columns) == len(columns_slams) + 5 - 3:
-                # Has the above extra 5 cols, but no serve speed
-                df_set_stats = df_set_stats.iloc[:,:-5]
-                df_set_stats.columns = columns_slams[:-3]
-                
-        else:
-            df_set_stats.columns =  columns_slams
-
-    # This is the set of columns expected if the full key stats are collected
-    # Some matches e.g. qualifiers at 250s don't have certain collected stats
-    columns_full = ['serve_rating', 'aces', 'double_faults', '1st_serve',
-        '1st_serve_points_won', '2nd_serve_points_won', 'break_points_saved',
-        'service_games_played', 'return_rating', '1st_serve_return_points_won',
-        '2nd_serve_return_points_won', 'break_points_converted',
-        'return_games_played', 'net_points_won', 'winners', 'unforced_errors',
-        'service_points_won', 'return_points_won', 'total_points_won',
-        'max_speed', '1st_serve_average_speed', '2nd_serve_average_speed']
-
-    ### 1. Reformatting existing stats/columns
-    # If the raw stats file is missing certain stat fields, we reindex the columns so that it will match
-    # the full set. Empty fields will be given NaN
-    if len(df_set_stats.columns) != len(columns_full):
-        df_set_stats = df_set_stats.reindex(columns=columns_full, fill_value="")
-    # Gather list of columns to reformat into % numbers
-    percen_list = ["1st_serve", "1st_serve_points_won", "2nd_serve_points_won", "break_points_saved",
-    "1st_serve_return_points_won", "2nd_serve_return_points_won", "break_points_converted",
-    "net_points_won", "service_points_won", "return_points_won", "total_points_won"]
+    ### Match Metadata 
+    df_stats = {"year": year, "tournament_id": tourn_id, "match_id": match_id.lower(), "round": round_n,
+                "sets_completed": raw_data['setsCompleted'], "set_n": np.repeat(set_ns, 2),
+                "player_id": player_ids*len(set_ns), "opponent_id": player_ids[::-1]*len(set_ns),
+                **dict(zip(columns_full, stats.T)), "serves_unreturned": unret_serves}
+    return pd.DataFrame(df_stats, index=pd.RangeIndex(2*len(set_ns)))
+
+def format_key_stats(df_raw: pd.DataFrame):
+    """
+    Processes raw key-stats dataframes (see read_key_stats()), of any number of sets and matches at once, into the
+    key_stats table's columns and dtypes:
+    - Computes the stats missing from the Grand Slams' raw data (see derive_slam_stats()).
+    - Reformats the ratio columns (percen_list) into a ratio and a % number column, with all of them parsed at once.
+    - Adds the no. of break points faced.
+    - Filters out nonsensical serve speeds.
+
+    Args:
+        df_raw (pandas.DataFrame): Raw key-stats dataframe(s) (concatenated), 2 rows per set ordered [player1, player2].
+
+    Returns:
+        df_stats (pandas.DataFrame): Processed key-stats dataframe.
+    """
+    df_stats = df_raw.reset_index(drop=True)
 
     # Extra processing steps for Grand Slams with Infosys API data (AO and RG)
-    if tourn_id in tourn_id_slams: 
-        # Calculate values for "total points won" column
-        df_set_stats.total_points_won = df_set_stats.total_points_won.apply(lambda x: x + f"/{df_set_stats.total_points_won.astype(int).sum()}")
-        # Calculate values for "total service points won" column
-        serve_won = df_set_stats["1st_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[0]).astype(int) + \
-        df_set_stats["2nd_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[0]).astype(int) 
-        serve_played = df_set_stats["1st_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[1]).astype(int) + \
-        df_set_stats["2nd_serve_points_won"].apply(lambda x: x.split(" ")[0].split("/")[1]).astype(int) 
-        df_set_stats["service_points_won"] = serve_won.astype(str) +"/"+ serve_played.astype(str)
-        # Calculate values for "return points won and BP saved" columns
-        df_set_stats["1st_serve_return_points_won"] = [reverse_ratio(df_set_stats["1st_serve_points_won"].iloc[1]), reverse_ratio(df_set_stats["1st_serve_points_won"].iloc[0])]
-        df_set_stats["2nd_serve_return_points_won"] = [reverse_ratio(df_set_stats["2nd_serve_points_won"].iloc[1]), reverse_ratio(df_set_stats["2nd_serve_points_won"].iloc[0])]
-        df_set_stats["break_points_saved"] = [reverse_ratio(df_set_stats["break_points_converted"].iloc[1]), reverse_ratio(df_set_stats["break_points_converted"].iloc[0])]
-        # Return Points Won needs to be re-done because the raw number from the API data doesn't add up with the derived 1st and 2nd returns
-        ret_won = serve_played.iloc[::-1] - serve_won.iloc[::-1]
-        ret_played = serve_played.iloc[::-1]
-        df_set_stats["return_points_won"] = list(ret_won.astype(str) +"/"+ ret_played.astype(str))
-
-    for col in percen_list: 
-        col_idx = df_set_stats.columns.get_loc(col)
-        # Insert formatted % data into as a new column
-        try:
-            df_set_stats.insert(col_idx+1, col+"_pct", df_set_stats[col].apply(lambda x: calc_percentage(x)))
-        except ValueError as ve:
-            # If valuerror encountered, e.g. due to missing stat which will be filled as ""
-            df_set_stats.insert(col_idx+1, col+"_pct", df_set_stats[col].apply(lambda x: x))
-        except IndexError as ie:
-            # If indexerror encountered, e.g. due to missing stat which will be filled as ""
-            df_set_stats.insert(col_idx+1, col+"_pct", df_set_stats[col].apply(lambda x: x))
-        # Reformat the original column to remove the bracket enclosed % value
-        df_set_stats[col] = df_set_stats[col].apply(lambda x: x.split(' ')[0])
+    is_slam = df_stats["tournament_id"].isin(tourn_id_slams).to_numpy()
+    if is_slam.any():
+        for col, values in derive_slam_stats(df_stats.loc[is_slam]).items():
+            df_stats[col] = df_stats[col].astype(object)
+            df_stats.loc[is_slam, col] = values
+
+    ### 1. Reformatting the ratio columns
+    # All ratio columns, row by row, as a single column
+    ratios, _, denoms, pcts = parse_ratios(pd.Series(df_stats[percen_list].to_numpy().ravel()))
+    ratios = np.where(ratios == "", None, ratios).reshape(-1, len(percen_list))
+    denoms = denoms.reshape(-1, len(percen_list))
+    pcts = pcts.reshape(-1, len(percen_list))
+    for i, col in enumerate(percen_list):
+        df_stats[col] = ratios[:, i]
+        df_stats[col+"_pct"] = pcts[:, i]
 
     ### 2. Adding additional Stats
     # Get number of break points faced
-    BPfaced = df_set_stats["break_points_saved"].apply(lambda x: str(x).split('/')[-1].split(' (')[0])
-    # # Insert BP faced list into df_stats
-    df_set_stats.insert(df_set_stats.columns.get_loc("break_points_converted")+2, 'break_points_faced', BPfaced)
-
-    # If rally-analysis data is available for this match, compute the no. of unreturned serves, else fill with None
-    if raw_data_rallies is not None:
-        # Insert this information right after aces
-        df_set_stats.insert(df_set_stats.columns.get_loc("aces")+1, 'serves_unreturned', get_unret_serves(raw_data_rallies, set_n))
-    else:
-        df_set_stats.insert(df_set_stats.columns.get_loc("aces")+1, 'serves_unreturned', [-999, -999])
-
-    ### 3. Match Metadata 
-    df_set_stats.insert(0, "year", [year]*2)
-    df_set_stats.insert(1, "tournament_id", [str(int(tourn_id))]*2)
-    df_set_stats.insert(2, "match_id", [match_id.lower()]*2)
-    df_set_stats.insert(3, "round", [round_n]*2)
-    df_set_stats.insert(4, "sets_completed", [raw_data['setsCompleted']]*2)
-    df_set_stats.insert(5, "set_n", [set_n]*2)
-    df_set_stats.insert(6, "player_id", player_ids)
-    df_set_stats.insert(7, "opponent_id", player_ids[::-1])
-
-    # Reset the index
-    df_set_stats = df_set_stats.reset_index(drop=True)
-    # Convert Dataframe values to numeric where appropriate, else ignore (e.g. for strings)
-    df_set_stats = df_set_stats.apply(pd.to_numeric, errors='ignore')
-    # Reconvert the dtype of tournament_id back to object
-    df_set_stats["tournament_id"] = df_set_stats["tournament_id"].astype('Int64').astype(str)
-
-    #Final renaming of columns to a more SQL-friendly standard
-    num_cols_rnm = {"1st_serve":"serve1",\
-    "1st_serve_pct": "serve1_pct",\
-    "1st_serve_points_won":"serve1_pts_won",\
-    "1st_serve_points_won_pct":"serve1_pts_won_pct",\
-    "2nd_serve_points_won":"serve2_pts_won",\
-    "2nd_serve_points_won_pct":"serve2_pts_won_pct",\
-    "1st_serve_return_points_won":"serve1_return_pts_won",\
-    "1st_serve_return_points_won_pct":"serve1_return_pts_won_pct",\
-    "2nd_serve_return_points_won":"serve2_return_pts_won",\
-    "2nd_serve_return_points_won_pct":"serve2_return_pts_won_pct",\
-    "1st_serve_average_speed":"serve1_avg_speed",\
-    "2nd_serve_average_speed":"serve2_avg_speed"}
-
-    df_set_stats = df_set_stats.rename(columns = num_cols_rnm)
-    return df_set_stats
+    df_stats["break_points_faced"] = denoms[:, percen_list.index("break_points_saved")]
+
+    df_stats = df_stats.rename(columns = num_cols_rnm)
+    df_stats = apply_table_dtypes(df_stats[list(get_table_columns("key_stats"))], "key_stats")
+
+    # Do some sanity-based data cleaning.
+    # Have observed nonsensical serve-speed values before. Use 300 as a max-speed filter (world record is like 260-269 kmh)
+    for col_spd in ["max_speed", "serve1_avg_speed", "serve2_avg_speed"]:
+        df_stats.loc[(df_stats[col_spd].abs() > 300).fillna(False), col_spd] = -999
+
+    return df_stats
 
 def process_key_stats(year: int, tourn_id: str, match_id: str, round_n: str,
-    raw_data: dict, raw_data_rallies=None):
+    raw_data: dict, raw_data_rallies=None, unret_serves=None):
     """
     Reads in raw key-stats data and processes it into a dataframe with len=(n_sets+1)*2, i.e.
     1 row per player, per set played + whole match (set0).
@@ -261,29 +303,10 @@ def process_key_stats(year: int, tourn_id: str, match_id: str, round_n: str,
         raw_data (dict): Raw key-stats data (from JSON).
         raw_data_rallies (dict, optional): Raw rally-analysis data, if provides, will compute the 
         unreturned serves stat, else unreturned serves will be set to -999. Defaults to None.
+        unret_serves (dict, optional): Unreturned serves of the match (see get_unret_serves_index()), used instead of
+        raw_data_rallies. Defaults to None.
 
     Returns:
         df_stats (pandas.DataFrame): Processed key-stats dataframe for every set and the whole match (set0).
     """
-    ### Get some info from raw_data
-    # No. of sets played
-    n_sets = raw_data['setsCompleted']
-    # Get stats player IDs
-    player_ids = list(pd.DataFrame(raw_data['players']).player1Id)
-    
-    ### Actual data processing starts
-    df_stats_list = []
-    # Loop through each played set and process the stats into a DF, append each to the list of DFs and then concat 
-    for n in range(n_sets+1):
-        df_set_stats = process_set_stats(year, tourn_id, match_id, round_n, player_ids, raw_data, n, raw_data_rallies)
-        # Append to list
-        df_stats_list.append(df_set_stats)
-
-    df_stats = pd.concat(df_stats_list)
-
-    # Do some sanity-based data cleaning.
-    # Have observed nonsensical serve-speed values before. Use 300 as a max-speed filter (world record is like 260-269 kmh)
-    for col_spd in ["max_speed", "serve1_avg_speed", "serve2_avg_speed"]:
-        df_stats.loc[abs(df_stats[col_spd]) > 300, col_spd] = -999
-
-    return df_stats
\ No newline at end of file
+    return format_key_stats(read_key_stats(year, tourn_id, match_id, round_n, raw_data, raw_data_rallies, unret_serves))
@@ -3,67 +3,53 @@ Created by Gerald on 21/9/2023 10:40 LT.
 
 Processing functions for raw scraped data to dataframe (for DB insertion). For ATP Rally Analysis.
 """
+import re
+
 import numpy as np
 import pandas as pd
 
-def process_rallystat_col(rally_df_r: pd.DataFrame, shot_num: int, outcome: str, player_id: str, opp_id: str):
-    """Process and extract rally statistics from raw rally-analysis data for a specific shot outcome.
-
-    Args:
-        rally_df_r (pandas.DataFrame): The raw rally-analysis data for a specific outcome.
-        shot_num (int): The shot number (1 to 11), where 9 represents 9+ (odd), 10 represents
-        10+ (even), and 11 is uncategorized.
-        outcome (str): The shot outcome, one of {"t1err", "t1win", "t2err", "t2win"} (from rally_df_r).
-        player_id (str): The ID of the player associated with the outcome.
-        opp_id (str): The ID of the opponent player.
-
-    Returns:
-        rally_sub_df (pandas.DataFrame): A processed DataFrame containing rally statistics for the specified shot outcome.
-
-        It also checks for any incorrectly assigned rows, such as "DOUBLE FAULT" appearing in the wrong outcome category
-        and corrects them if needed. (Not sure how exhaustive this is.)
-    """
+from infotennis.schemas import get_table_columns, get_point_key
 
-    rally_sub_df = pd.json_normalize(rally_df_r[outcome].iloc[shot_num-1])
+# Outcome lists of each rally-analysis category, with the player (0 for player1, 1 for player2) and shot outcome of their points
+rally_outcomes = [("t1win", 0, "W"), ("t1err", 0, "L"), ("t2win", 1, "W"), ("t2err", 1, "L")]
 
-    if len(rally_sub_df) == 0:
-        return rally_sub_df
+# Columns of the processed rally-analysis data (the rally_analysis table's)
+rally_columns = list(get_table_columns("rally_analysis"))
 
-    # Convert raw column names from camel to snake case     
-    rally_sub_df.columns = rally_sub_df.columns.str.replace('(?<=[a-z])(?=[A-Z])', '_', regex=True)\
-        .str.replace('^t(1|2)', r'p\1_', regex=True).str.lower()
+# Raw point fields (camelCase) converted to column names so far
+snake_case_fields = {}
 
-    if "err" in outcome:
-        shot_outcome = "L"
-    elif "win" in outcome:
-        shot_outcome = "W"
+def to_snake_case(field: str):
+    """
+    Converts a raw point field name from camel to snake case, with the team prefixes "t1"/"t2" as "p1_"/"p2_",
+    e.g. "pointEndType" -> "point_end_type", "t1BreakPoint" -> "p1_break_point".
+    """
+    if field not in snake_case_fields:
+        column = re.sub('^t(1|2)', r'p\1_', re.sub('(?<=[a-z])(?=[A-Z])', '_', field)).lower()
+        snake_case_fields[field] = column
+    return snake_case_fields[field]
 
+def get_shot_number(shot_num: int):
+    """
+    Returns the shot number label of a rally-analysis category (1 to 11), where 9 represents 9+ (odd), 10 represents
+    10+ (even), and 11 is uncategorized, i.e. "1"..."8", "9+_odd", "10+_even" or "Unknown".
+    """
     if shot_num < 9:
-        shot_num = str(int(shot_num))
+        return str(int(shot_num))
     elif shot_num == 9:
-        shot_num = "9+_odd"
+        return "9+_odd"
     elif shot_num == 10:
-        shot_num = "10+_even"
-    else:
-        shot_num = "Unknown"
-        
-    ### Match Metadata 
-    rally_sub_df.insert(0, "shot_number", [shot_num]*len(rally_sub_df))
-    rally_sub_df.insert(1, "outcome", [shot_outcome]*len(rally_sub_df))
-    rally_sub_df.insert(2, "player_id", [player_id]*len(rally_sub_df))
-    rally_sub_df.insert(3, "opponent_id", [opp_id]*len(rally_sub_df))
-
-    # Check for any incorrectly assigned rows, e.g. DOUBLE FAULT appears in "t1win" which shd belong in "t2err"
-    err_indexs = np.where((rally_sub_df.point_end_type == "DOUBLE FAULT") & (rally_sub_df.outcome == "W"))[0]
-    for ei in err_indexs:
-        rally_sub_df.loc[ei,["outcome", "player_id", "opponent_id"]] = ["L", opp_id, player_id]
-
-    return rally_sub_df
+        return "10+_even"
+    return "Unknown"
 
 def process_rally_analysis(year: int, tourn_id: str, match_id: str, round_n: str, raw_data: dict):
     """
     Reads in raw rally-analysis data and returns a dataFrame with rally-type data (shot_number, 
-    point_end_type, serve, serve_speed, etc.) sorted by point played.
+    point_end_type, serve, serve_speed, etc.) sorted by point played, i.e. by their point_key (see get_point_key()).
+
+    The points of every category (shot number) and outcome of rallyData are read in a single walk into flat lists of
+    the points' fields, so the dataframe is built once. It also checks for any incorrectly assigned rows, such as
+    "DOUBLE FAULT" appearing in the wrong outcome category and corrects them if needed. (Not sure how exhaustive this is.)
 
     Args:
         year (int): Year in which the match took place (e.g. 2023).
@@ -75,36 +61,53 @@ def process_rally_analysis(year: int, tourn_id: str, match_id: str, round_n: str
     Returns:
         df_rallies (pandas.DataFrame): Processed rally-analysis dataframe.
     """
-
     # Get stats player IDs
-    player_ids = list(pd.DataFrame(raw_data['playerDetails']).player1Id)
-    
+    player_ids = np.array([player['player1Id'] for player in raw_data['playerDetails']], dtype=object)
+
     ### Actual data processing starts
-    list_rally_sub_df = []
-    for outcome in ["t1win", "t1err"]:
-        df_rallies_r = pd.json_normalize(raw_data['rallyData'])
-        rally_sub_df1 = pd.concat([process_rallystat_col(df_rallies_r, i+1, outcome, player_ids[0], player_ids[1]) for i in range(len(df_rallies_r))] )
-        list_rally_sub_df.append(rally_sub_df1)
-    for outcome in ["t2win", "t2err"]:
-        rally_sub_df2 = pd.concat([process_rallystat_col(df_rallies_r, i+1, outcome, player_ids[1], player_ids[0]) for i in range(len(df_rallies_r))] )
-        list_rally_sub_df.append(rally_sub_df2)
-    
-    df_rallies = pd.concat(list_rally_sub_df).reset_index(drop=True)
-
-    # Insert game and point columns
-    idx_set = df_rallies.columns.get_loc('set') #Get index of the "set" column, then insert "game" and "point" after it
-    df_rallies.insert(idx_set+1, "game", df_rallies.point_id.apply(lambda x: x.split("_")[1]))
-    df_rallies.insert(idx_set+2, "point", df_rallies.point_id.apply(lambda x: x.split("_")[2]))
-
-    # Order the dataframe
-    df_rallies= df_rallies.sort_values(["set", "game", "point","serve"]).reset_index(drop=True)
-    # Insert generic cols
-    df_rallies.insert(0, "year", [year]*len(df_rallies))
-    df_rallies.insert(1, "tournament_id", [str(int(tourn_id))]*len(df_rallies))
-    df_rallies.insert(2, "match_id", [match_id.lower()]*len(df_rallies))
-    df_rallies.insert(3, "round", [round_n]*len(df_rallies))
-    df_rallies.insert(4, "sets_completed", [raw_data['setsCompleted']]*len(df_rallies))
+    # Points of all categories and outcomes, with the shot number, outcome and player of each point
+    points, shot_numbers, outcomes, players = [], [], [], []
+    for outcome, player, shot_outcome in rally_outcomes:
+        for i, category in enumerate(raw_data['rallyData']):
+            points_cat = category[outcome]
+            points += points_cat
+            shot_numbers += [get_shot_number(i+1)]*len(points_cat)
+            outcomes += [shot_outcome]*len(points_cat)
+            players += [player]*len(points_cat)
+
+    # Fields of the points (in the order they first appear), as columns
+    fields = list(dict.fromkeys(field for point in points for field in point))
+    df_rallies = pd.DataFrame({to_snake_case(field): [point.get(field) for point in points] for field in fields},
+                              index=pd.RangeIndex(len(points)))
+    if len(df_rallies) == 0:
+        return pd.DataFrame(columns=rally_columns)
+
+    # Check for any incorrectly assigned rows, e.g. DOUBLE FAULT appears in "t1win" which shd belong in "t2err"
+    outcomes, players = np.array(outcomes, dtype=object), np.array(players)
+    is_misassigned = (df_rallies.point_end_type.to_numpy() == "DOUBLE FAULT") & (outcomes == "W")
+    outcomes[is_misassigned] = "L"
+    players[is_misassigned] = 1 - players[is_misassigned]
+
+    df_rallies["shot_number"] = shot_numbers
+    df_rallies["outcome"] = outcomes
+    df_rallies["player_id"] = player_ids[players]
+    df_rallies["opponent_id"] = player_ids[1 - players]
+
+    # Game and point columns, from the point ID "set_game_point_serve"
+    point_id_parts = df_rallies.point_id.str.split("_")
+    df_rallies["game"] = point_id_parts.str[1]
+    df_rallies["point"] = point_id_parts.str[2]
+    df_rallies["point_key"] = get_point_key(df_rallies["set"], df_rallies.game, df_rallies.point, df_rallies.serve)
+
+    # Order the dataframe (numerically, since game and point are strings)
+    df_rallies = df_rallies.sort_values("point_key", kind="stable").reset_index(drop=True)
+    # Generic cols
+    df_rallies["year"] = year
+    df_rallies["tournament_id"] = str(int(tourn_id))
+    df_rallies["match_id"] = match_id.lower()
+    df_rallies["round"] = round_n
+    df_rallies["sets_completed"] = raw_data['setsCompleted']
 
     df_rallies = df_rallies.rename(columns = {"set":"set_n"})
 
-    return df_rallies
\ No newline at end of file
+    return df_rallies.reindex(columns=rally_columns)
@@ -0,0 +1,320 @@
+"""
+Compressed store of the raw (decoded) match data, instead of 1 JSON file per match and data type.
+
+The data of each year is appended to a segment file <root>/<year>.seg as zstd-compressed records (1 per match and
+data type), and every record's location is appended to the year's index file <root>/<year>.idx (1 JSON line per
+record). The index is keyed on (year, tourn_id, match_id, data_type) and loaded per year when it is first needed.
+Records are never modified: putting a key again appends a new record, and the index points to the latest one.
+
+Migrate the existing JSON files into a store with infotennis.routines.migrate_raw_data. Lookups of the JSON files
+themselves go through a RawFileIndex instead of globbing the directories per match.
+
+Data derived from the raw data of a match (see derived_data_types) can be cached alongside it, i.e. as a record of
+the store or a JSON file next to the raw data file, with put_derived(). get_derived_location() only returns it if it
+was saved after the raw data it derives from.
+"""
+import json
+import os
+
+import zstandard
+
+# Data types derived from the raw data of another data type and cached alongside it, {derived data type: source data type}
+derived_data_types = {
+    "unret-serves": "rally-analysis", # Unreturned serves per set, see processing_keystats.get_unret_serves_index()
+}
+
+
+def get_key(year, tourn_id, match_id, data_type):
+    """
+    Returns the key of a record, i.e. (year, tourn_id, match_id, data_type) with the match_id in upper case as in
+    the JSON file names.
+    """
+    return int(year), str(tourn_id), str(match_id).upper(), data_type
+
+def parse_raw_file_name(file_name):
+    """
+    Parses the name of a raw data JSON file saved by scrape_ATP_results_data(), i.e. 
+    {tourn_id}_{round}_{player1}-vs-{player2}_{year}_{MATCH_ID}_{data_type}.json.
+
+    Args:
+        file_name (str): File name or path.
+
+    Returns:
+        tuple: The key (year, tourn_id, match_id, data_type) of the file, or None if the name doesn't match the scheme.
+    """
+    parts = os.path.basename(file_name)[:-len(".json")].split("_")
+    if not file_name.endswith(".json") or len(parts) < 5 or not parts[-3].isdigit():
+        return None
+    return get_key(parts[-3], parts[0], parts[-2], parts[-1])
+
+def read_record(location):
+    """
+    Reads the raw data of a record from its location in a segment file, without loading the index (e.g. in worker processes).
+
+    Args:
+        location (tuple): (segment file, offset, length) of the record, see RawDataStore.get_location().
+
+    Returns:
+        dict: The raw data.
+    """
+    file_segment, offset, length = location
+    with open(file_segment, "rb") as fp:
+        fp.seek(offset)
+        frame = fp.read(length)
+    return json.loads(zstandard.ZstdDecompressor().decompress(frame))
+
+def load_raw_data(source):
+    """
+    Loads raw data either from a JSON file or from a record of a RawDataStore.
+
+    Args:
+        source (str or tuple): Path of the JSON file, or the location of the record (see read_record()).
+
+    Returns:
+        dict: The raw data.
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as j:
+            return json.loads(j.read())
+    return read_record(source)
+
+
+
+class RawFileIndex:
+    """
+    In-memory index of the raw data JSON files (saved by scrape_ATP_results_data()), keyed on
+    (year, tourn_id, match_id, data_type) by parsing the file names. Each <data_type>/<year> directory is listed once,
+    the first time a file in it is looked up, and files written afterwards are added with add().
+
+    Args:
+        data_dir (str): The directory where data files are stored.
+        data_path (str): The file path pattern of the data files (with <data_type> and <year> placeholders).
+    """
+    def __init__(self, data_dir, data_path):
+        self.data_dir = data_dir
+        self.data_path = data_path
+        self.files = {}
+        # (data_type, year) of the directories listed so far
+        self.dirs_scanned = set()
+
+    def get_dir(self, year, data_type):
+        # Derived data is saved in the directory of its source data type
+        data_type = derived_data_types.get(data_type, data_type)
+        return self.data_dir + self.data_path.replace("<data_type>", data_type).replace("<year>", str(year))
+
+    def scan_dir(self, year, data_type):
+        """
+        Adds the files of a <data_type>/<year> directory to the index, with the files of the data derived from them.
+        """
+        self.dirs_scanned.add((int(year), data_type))
+        dir_files = self.get_dir(year, data_type)
+        if not os.path.isdir(dir_files):
+            return
+        dir_data_types = [data_type] + [derived for derived, source in derived_data_types.items() if source == data_type]
+        for file_name in sorted(os.listdir(dir_files)):
+            key = parse_raw_file_name(file_name)
+            if key is not None and key[3] in dir_data_types:
+                self.files.setdefault(key, os.path.join(dir_files, file_name))
+
+    def add(self, file):
+        """
+        Adds a (newly written) file to the index.
+        """
+        key = parse_raw_file_name(file)
+        if key is not None:
+            self.files[key] = file
+
+    def get_location(self, year, tourn_id, match_id, data_type):
+        """
+        Returns the path of a match's raw data file, or None if there is no file.
+        """
+        dir_data_type = derived_data_types.get(data_type, data_type)
+        if (int(year), dir_data_type) not in self.dirs_scanned:
+            self.scan_dir(year, dir_data_type)
+        return self.files.get(get_key(year, tourn_id, match_id, data_type))
+
+    def exists(self, year, tourn_id, match_id, data_type):
+        """
+        Returns whether a match has a raw data file.
+        """
+        return self.get_location(year, tourn_id, match_id, data_type) is not None
+
+    def get_derived_location(self, year, tourn_id, match_id, data_type):
+        """
+        Returns the path of a match's derived data file (see derived_data_types), or None if there is no file or it is
+        older than the raw data file it derives from.
+        """
+        file = self.get_location(year, tourn_id, match_id, data_type)
+        file_source = self.get_location(year, tourn_id, match_id, derived_data_types[data_type])
+        if file is None or file_source is None or os.path.getmtime(file) < os.path.getmtime(file_source):
+            return None
+        return file
+
+    def put_derived(self, year, tourn_id, match_id, data_type, data):
+        """
+        Saves data derived from a match's raw data file (see derived_data_types) next to it, in a file named like it
+        with the derived data type, e.g. ..._2023_MS001_unret-serves.json for ..._2023_MS001_rally-analysis.json.
+        """
+        source_type = derived_data_types[data_type]
+        file_source = self.get_location(year, tourn_id, match_id, source_type)
+        if file_source is None:
+            raise KeyError(get_key(year, tourn_id, match_id, source_type))
+        file = file_source[:-len(f"{source_type}.json")] + f"{data_type}.json"
+        with open(file, "w") as fp:
+            json.dump(data, fp)
+        self.add(file)
+
+
+
+class RawDataStore:
+    """
+    Compressed, indexed store of raw match data.
+
+    Args:
+        root (str): Directory of the segment and index files (created if it doesn't exist).
+        level (int, optional): zstd compression level. Defaults to 3.
+    """
+    def __init__(self, root, level=3):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        # Index of every year loaded so far, {year: {key: entry}}
+        self.index = {}
+
+    def segment_file(self, year):
+        return os.path.join(self.root, f"{year}.seg")
+
+    def index_file(self, year):
+        return os.path.join(self.root, f"{year}.idx")
+
+    def get_year_index(self, year):
+        """
+        Returns the index {key: entry} of a year, reading its index file the first time.
+        """
+        year = int(year)
+        if year not in self.index:
+            index_year = {}
+            if os.path.exists(self.index_file(year)):
+                with open(self.index_file(year), "r") as fp:
+                    line = ""
+                    for line in fp:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # Incomplete last line of an interrupted put, the record isn't indexed
+                            continue
+                        index_year[get_key(year, entry["tourn_id"], entry["match_id"], entry["data_type"])] = entry
+                # End an incomplete last line so that the next entry is appended on a new line
+                if line != "" and not line.endswith("\n"):
+                    with open(self.index_file(year), "a") as fp:
+                        fp.write("\n")
+            self.index[year] = index_year
+        return self.index[year]
+
+    def put(self, year, tourn_id, match_id, data_type, raw_data, name=None):
+        """
+        Adds the raw data of a match to the store (replacing the existing record of the key, if any).
+
+        Args:
+            year (int): Year of the tournament.
+            tourn_id (str): ATP tournament ID.
+            match_id (str): ATP match ID.
+            data_type (str): Type of data ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+            raw_data (dict): The raw (decoded) data.
+            name (str, optional): Name of the record, e.g. the JSON file name it would have had. Defaults to None.
+        """
+        key = get_key(year, tourn_id, match_id, data_type)
+        index_year = self.get_year_index(key[0])
+        frame = self.compressor.compress(json.dumps(raw_data).encode("utf-8"))
+        # The record is written before its index entry, so the index never points to a missing record
+        with open(self.segment_file(key[0]), "ab") as fp:
+            offset = fp.seek(0, os.SEEK_END)
+            fp.write(frame)
+        entry = {"tourn_id": key[1], "match_id": key[2], "data_type": data_type, "offset": offset, "length": len(frame),
+                 "name": name}
+        with open(self.index_file(key[0]), "a") as fp:
+            fp.write(json.dumps(entry) + "\n")
+        index_year[key] = entry
+
+    def get_location(self, year, tourn_id, match_id, data_type):
+        """
+        Returns the location (segment file, offset, length) of a record, or None if the key isn't in the store.
+        """
+        key = get_key(year, tourn_id, match_id, data_type)
+        entry = self.get_year_index(key[0]).get(key)
+        if entry is None:
+            return None
+        return self.segment_file(key[0]), entry["offset"], entry["length"]
+
+    def exists(self, year, tourn_id, match_id, data_type):
+        """
+        Returns whether the raw data of a match is in the store.
+        """
+        return get_key(year, tourn_id, match_id, data_type) in self.get_year_index(year)
+
+    def get_derived_location(self, year, tourn_id, match_id, data_type):
+        """
+        Returns the location of the data derived from a match's raw data (see derived_data_types), or None if it isn't
+        in the store or it was put before the latest record of the raw data it derives from.
+        """
+        index_year = self.get_year_index(year)
+        entry = index_year.get(get_key(year, tourn_id, match_id, data_type))
+        entry_source = index_year.get(get_key(year, tourn_id, match_id, derived_data_types[data_type]))
+        # Records are appended, so the later record has the larger offset
+        if entry is None or entry_source is None or entry["offset"] < entry_source["offset"]:
+            return None
+        return self.segment_file(int(year)), entry["offset"], entry["length"]
+
+    def put_derived(self, year, tourn_id, match_id, data_type, data):
+        """
+        Adds data derived from a match's raw data (see derived_data_types) to the store.
+        """
+        self.put(year, tourn_id, match_id, data_type, data)
+
+    def get(self, year, tourn_id, match_id, data_type):
+        """
+        Returns the raw data of a match.
+
+        Args:
+            year (int): Year of the tournament.
+            tourn_id (str): ATP tournament ID.
+            match_id (str): ATP match ID.
+            data_type (str): Type of data.
+
+        Returns:
+            dict: The raw data (raises KeyError if the match isn't in the store).
+        """
+        location = self.get_location(year, tourn_id, match_id, data_type)
+        if location is None:
+            raise KeyError(get_key(year, tourn_id, match_id, data_type))
+        return read_record(location)
+
+    def get_years(self):
+        """
+        Returns the years with data in the store.
+        """
+        return sorted(int(file[:-4]) for file in os.listdir(self.root) if file.endswith(".idx"))
+
+    def keys(self, year=None, data_type=None):
+        """
+        Returns the keys (year, tourn_id, match_id, data_type) in the store, optionally of 1 year and/or data type only.
+        """
+        years = self.get_years() if year is None else [int(year)]
+        return [key for year in years for key in self.get_year_index(year) if data_type is None or key[3] == data_type]
+
+    def iterate(self, year=None, data_type=None):
+        """
+        Yields the (key, raw_data) of every record in the store, optionally of 1 year and/or data type only. The records 
+        of each year are read sequentially from its segment file.
+        """
+        years = self.get_years() if year is None else [int(year)]
+        decompressor = zstandard.ZstdDecompressor()
+        for year in years:
+            entries = sorted(((entry["offset"], entry["length"], key) for key, entry in self.get_year_index(year).items()
+                              if data_type is None or key[3] == data_type))
+            if len(entries) == 0:
+                continue
+            with open(self.segment_file(year), "rb") as fp:
+                for offset, length, key in entries:
+                    fp.seek(offset)
+                    yield key, json.loads(decompressor.decompress(fp.read(length)))
@@ -3,45 +3,58 @@ import os
 import warnings
 warnings.filterwarnings("ignore")
 
-from dotenv import load_dotenv
-import pandas as pd
-import pymysql
-import yaml
-
-from infotennis.routines.sql_functions import initalise_tables
-
-# Load config file into dict 'configs'
-with open("./config.yaml", "r") as yamlfile:
-    configs = yaml.safe_load(yamlfile)
-
-# Configure settings
-load_dotenv()
-host = os.getenv('MYSQL_HOST')
-port = os.getenv('MYSQL_PORT')
-user = os.getenv('MYSQL_USER')
-password = os.getenv('DATABASE_PASSWORD')
-database_name = os.getenv('DATABASE_NAME')
-
-# Create a connection to the given database
-conn = pymysql.connect(
-    host=host,
-    port=int(3306),
-    user="root",
-    passwd=password,
-    db=database_name,
-    charset='utf8mb4')
-
-# This is the object used to interact with the database
-# Do not create an instance of a Cursor yourself. Call connections.Connection.cursor().
-mycursor = conn.cursor()
+from infotennis.config import get_config
+from infotennis.routines.sql_functions import MySQLBackend
+from infotennis.routines.storage import open_storage
+
+
+def main(config_path="./config.yaml"):
+    """
+    Creates all tables in the MySQL database configured in .env (or the embedded storage backend of the config), i.e.
+    python -m infotennis.routines.init_tables. The database is connected here, not when the module is imported.
+
+    Args:
+        config_path (str, optional): Path of the config file. Defaults to "./config.yaml".
+    """
+    from dotenv import load_dotenv
+    import pymysql
+
+    config = get_config(config_path)
+    db_backend = config.get_setting("database", "backend", "mysql")
+    db_path = config.get_setting("database", "path", "./data/infotennis.db")
+
+    # Configure settings
+    load_dotenv()
+    password = os.getenv('DATABASE_PASSWORD')
+    database_name = os.getenv('DATABASE_NAME')
+
+    if db_backend == "mysql":
+        # Create a connection to the given database
+        conn = pymysql.connect(
+            host=os.getenv('MYSQL_HOST'),
+            port=int(3306),
+            user="root",
+            passwd=password,
+            db=database_name,
+            charset='utf8mb4')
+
+        # This is the object used to interact with the database
+        # Do not create an instance of a Cursor yourself. Call connections.Connection.cursor().
+        mycursor = conn.cursor()
+        storage = MySQLBackend(conn, database_name, mycursor)
+    else:
+        # Embedded database file or Parquet files (e.g. for running the pipeline locally without a MySQL server)
+        storage = open_storage(db_backend, db_path)
+
+    storage.initalise_tables(table="all")
+
 
 if __name__ == "__main__":
     try:
-        initalise_tables(mycursor, database_name, table="all")
+        main()
     except:
         import traceback, pdb, sys
         traceback.print_exc()
         print ('')
         pdb.post_mortem()
         sys.exit(1)
-
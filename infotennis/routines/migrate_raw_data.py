@@ -0,0 +1,78 @@
+"""
+Migrates the raw data JSON files (saved in <output dir><output path> by the update routine) into a compressed raw data
+store (see infotennis/raw_store.py), e.g. 
+
+$ python -m infotennis.routines.migrate_raw_data --store-dir ./data/raw_store/ [--data-type key-stats] [--delete]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+
+from infotennis.config import get_config
+from infotennis.raw_store import RawDataStore, parse_raw_file_name
+
+data_types_all = ["key-stats", "rally-analysis", "stroke-analysis", "court-vision"]
+
+
+def migrate_raw_data(data_dir, data_path, raw_store, data_types=data_types_all, overwrite=False, delete=False):
+    """
+    Adds the raw data JSON files of the given data types to a raw data store.
+
+    Args:
+        data_dir (str): The directory where data files are stored.
+        data_path (str): The file path pattern for locating data files (with <data_type> and <year> placeholders).
+        raw_store (RawDataStore): The store to add the data to.
+        data_types (list, optional): Data types to migrate. Defaults to all 4 data types.
+        overwrite (bool, optional): Add files whose key is already in the store again (replacing the stored data). Defaults to False.
+        delete (bool, optional): Delete each JSON file once its data is in the store. Defaults to False.
+
+    Returns:
+        dict: No. of files "added" to the store, "skipped" (already in the store) and "failed" (unparseable name or JSON).
+    """
+    counts = {"added": 0, "skipped": 0, "failed": 0}
+    for data_type in data_types:
+        files = glob.glob(data_dir + data_path.replace("<data_type>", data_type).replace("<year>", "*") + f"*_{data_type}.json")
+        for file in sorted(files):
+            key = parse_raw_file_name(file)
+            if key is None or key[3] != data_type:
+                logging.error(f"Could not parse the raw data file name {file}.")
+                counts["failed"] += 1
+                continue
+            if overwrite or not raw_store.exists(*key):
+                try:
+                    with open(file, 'r') as j:
+                        raw_data = json.loads(j.read())
+                except Exception as e:
+                    logging.error(f"Could not read raw data file {file}. Error: {e}")
+                    counts["failed"] += 1
+                    continue
+                raw_store.put(*key, raw_data, name=file.replace("\\", "/").split("/")[-1])
+                counts["added"] += 1
+            else:
+                counts["skipped"] += 1
+            if delete:
+                os.remove(file)
+        print(f"Migrated the {data_type} files ({counts} in total so far).")
+    return counts
+
+
+if __name__ == "__main__":
+    config = get_config("./config.yaml")
+    data_dir = config["output"]['dir']
+    data_path = config["output"]['path']
+    store_dir = config["output"].get('store_dir')
+
+    parser = argparse.ArgumentParser(description="Migrate the raw data JSON files into a compressed raw data store.")
+    parser.add_argument("--store-dir", default=store_dir, help="Directory of the raw data store (defaults to output: store_dir in config.yaml).")
+    parser.add_argument("--data-type", default="all", choices=["all"] + data_types_all, help="Data type to migrate.")
+    parser.add_argument("--overwrite", action="store_true", help="Replace data already in the store.")
+    parser.add_argument("--delete", action="store_true", help="Delete the JSON files once they are in the store.")
+    args = parser.parse_args()
+    if not args.store_dir:
+        parser.error("No raw data store directory given (--store-dir or output: store_dir in config.yaml).")
+
+    data_types = data_types_all if args.data_type == "all" else [args.data_type]
+    migrate_raw_data(data_dir, data_path, RawDataStore(args.store_dir), data_types=data_types, overwrite=args.overwrite,
+                     delete=args.delete)
@@ -0,0 +1,213 @@
+"""
+Parquet storage backend: the tables are kept as a lake of Parquet files (needs the pyarrow package), partitioned by
+table/year/tournament_id, i.e. <path>/<table>/year=<year>/tournament_id=<tournament_id>/part-<n>.parquet.
+
+The files have explicit Arrow schemas derived from table_dtypes_all. Every upsert appends a new file per partition
+(written to a hidden temporary file first, so readers never see partial files), unless some of its rows have the same
+unique index key (see table_unique_indexes) as existing rows, in which case the partition is merged and rewritten with
+the same semantics as insert_results_data_new(). Use compact() to merge the small files of each partition. The rows of
+the tables with a point order index (see table_indexes) are written sorted by it, so scans of a range of a match's points
+(e.g. filtered on point_key) only read the row groups containing them.
+
+The tables can be scanned with predicate pushdown (e.g. a season of court-vision trajectories), see ParquetBackend.scan().
+"""
+import glob
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from infotennis.routines.storage import StorageBackend
+from infotennis.schemas import apply_table_dtypes, db_tables, get_table_columns, table_indexes, table_unique_indexes
+
+# Arrow types used for each column type of table_dtypes_all
+arrow_types = {"INT": pa.int32(), "TINYINT": pa.int16(), "BIGINT": pa.int64(), "FLOAT": pa.float64(), "VARCHAR": pa.string()}
+
+# Columns that the tables are partitioned by (stored in the directory names, not in the files)
+partition_cols = ["year", "tournament_id"]
+partition_schema = pa.schema([("year", pa.int32()), ("tournament_id", pa.string())])
+
+def get_arrow_schema(table: str, partitions=True):
+    """
+    Returns the Arrow schema of a table in table_dtypes_all.
+
+    Args:
+        table (str): Table name, see get_table_columns().
+        partitions (bool, optional): Include the partition columns (year, tournament_id). Defaults to True.
+
+    Returns:
+        pyarrow.Schema: The table's schema.
+    """
+    return pa.schema([(col, arrow_types[sql_type]) for col, sql_type in get_table_columns(table).items()
+                      if partitions or col not in partition_cols])
+
+
+class ParquetBackend(StorageBackend):
+    """
+    Tables stored as partitioned Parquet files.
+
+    Args:
+        path (str): Root directory of the Parquet files.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def table_dir(self, table):
+        return os.path.join(self.path, table)
+
+    def partition_dir(self, table, year, tourn_id):
+        return os.path.join(self.table_dir(table), f"year={year}", f"tournament_id={tourn_id}")
+
+    def get_partition_files(self, table, year, tourn_id):
+        """
+        Returns the Parquet files of a partition, in the order they were written.
+        """
+        return sorted(glob.glob(os.path.join(self.partition_dir(table, year, tourn_id), "part-*.parquet")))
+
+    def get_partitions(self, table):
+        """
+        Returns the (year, tournament_id) of every partition of a table.
+        """
+        partitions = []
+        for part_dir in glob.glob(os.path.join(self.table_dir(table), "year=*", "tournament_id=*")):
+            year_dir, tourn_dir = part_dir.split(os.sep)[-2:]
+            partitions.append((int(year_dir.split("=", 1)[1]), tourn_dir.split("=", 1)[1]))
+        return partitions
+
+    def read_files(self, table, files, columns=None):
+        """
+        Reads Parquet files of a single partition into a dataframe (without the partition columns).
+        """
+        return ds.dataset(files, schema=get_arrow_schema(table, partitions=False), format="parquet")\
+            .to_table(columns=columns).to_pandas()
+
+    def write_file(self, table, year, tourn_id, dataframe, replace=()):
+        """
+        Writes the rows of a partition to a new Parquet file, then deletes the files in replace (i.e. the rows they
+        contained are in the new file). The rows are sorted by the table's point order index, if it has one.
+        """
+        part_dir = self.partition_dir(table, year, tourn_id)
+        os.makedirs(part_dir, exist_ok=True)
+        schema = get_arrow_schema(table, partitions=False)
+        if table in table_indexes:
+            sort_cols = [col for col in table_indexes[table][1] if col not in partition_cols]
+            dataframe = dataframe.sort_values(sort_cols, kind="stable")
+        file_name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        # Hidden files (starting with ".") are ignored by Parquet readers until they are renamed
+        file_tmp = os.path.join(part_dir, "." + file_name)
+        pq.write_table(pa.Table.from_pandas(dataframe[schema.names], schema=schema, preserve_index=False), file_tmp)
+        os.replace(file_tmp, os.path.join(part_dir, file_name))
+        for file in replace:
+            os.remove(file)
+
+    def merge_rows(self, table, dataframe):
+        """
+        Merges rows with the same unique index key, where later rows update earlier ones except for their NULL values.
+        """
+        index_cols = [col for col in table_unique_indexes[table][1] if col in dataframe.columns]
+        if len(index_cols) == 0:
+            # All rows have the same key (i.e. the table is unique on its partition columns, e.g. atp_calendars)
+            return dataframe.groupby(np.zeros(len(dataframe), dtype=int)).last().reset_index(drop=True)
+        return dataframe.groupby(index_cols, sort=False, dropna=False).last().reset_index()[list(dataframe.columns)]
+
+    def initalise_tables(self, table="all"):
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            os.makedirs(self.table_dir(table))
+
+    def drop_tables(self, table="all"):
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            for file in glob.glob(os.path.join(self.table_dir(table), "year=*", "tournament_id=*", "*.parquet")):
+                os.remove(file)
+            for root, dirs, files in os.walk(self.table_dir(table), topdown=False):
+                os.rmdir(root)
+
+    def upsert(self, table, dataframe, batch=True, method="insert", chunk_size=1000):
+        if len(dataframe) == 0:
+            return
+        columns = [col for col in get_table_columns(table) if col not in partition_cols]
+        df_typed = apply_table_dtypes(dataframe.reindex(columns=list(get_table_columns(table))), table)
+        index_cols = table_unique_indexes[table][1] if table in table_unique_indexes else None
+
+        for (year, tourn_id), df_part in df_typed.groupby(partition_cols, sort=False):
+            df_part = df_part[columns]
+            files = self.get_partition_files(table, year, tourn_id)
+            if index_cols is not None:
+                key_cols = [col for col in index_cols if col not in partition_cols]
+                if (df_part.duplicated(key_cols).any() if len(key_cols) > 0 else len(df_part) > 1):
+                    df_part = self.merge_rows(table, df_part)
+                if len(files) > 0:
+                    if len(key_cols) > 0:
+                        keys_old = pd.MultiIndex.from_frame(self.read_files(table, files, columns=key_cols))
+                        keys_exist = pd.MultiIndex.from_frame(df_part[key_cols]).isin(keys_old).any()
+                    else:
+                        keys_exist = True
+                    # Rows with existing keys -> merge them into the partition and rewrite it as 1 file
+                    if keys_exist:
+                        df_old = apply_table_dtypes(self.read_files(table, files), table)
+                        df_merged = self.merge_rows(table, pd.concat([df_old, df_part], ignore_index=True))
+                        self.write_file(table, year, tourn_id, df_merged, replace=files)
+                        continue
+            self.write_file(table, year, tourn_id, df_part)
+
+    def compact(self, table="all"):
+        """
+        Merges the Parquet files of every partition with more than 1 file into a single file.
+
+        Args:
+            table (str, optional): The table to compact. Defaults to "all".
+        """
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            for year, tourn_id in self.get_partitions(table):
+                files = self.get_partition_files(table, year, tourn_id)
+                if len(files) <= 1:
+                    continue
+                df_part = apply_table_dtypes(self.read_files(table, files), table)
+                if table in table_unique_indexes:
+                    df_part = self.merge_rows(table, df_part)
+                self.write_file(table, year, tourn_id, df_part, replace=files)
+
+    def dataset(self, table):
+        """
+        Returns the pyarrow Dataset of a table's files (incl. the partition columns).
+        """
+        os.makedirs(self.table_dir(table), exist_ok=True)
+        return ds.dataset(self.table_dir(table), schema=get_arrow_schema(table), format="parquet",
+                          partitioning=ds.partitioning(partition_schema, flavor="hive"))
+
+    def scan(self, table, columns=None, filter=None):
+        """
+        Reads the rows of a table matching a filter, only reading the files/row groups and columns needed.
+
+        Args:
+            table (str): The name of the table.
+            columns (list, optional): Columns to read. Defaults to None (all columns).
+            filter (pyarrow.compute.Expression, optional): Row filter, e.g. (ds.field("year") == 2023) &
+            (ds.field("tournament_id") == "352"). Defaults to None (all rows).
+
+        Returns:
+            pandas.DataFrame: The rows read (INT columns as nullable Int64).
+        """
+        int_types = {arrow_types[sql_type]: pd.Int64Dtype() for sql_type in ["INT", "TINYINT", "BIGINT"]}
+        return self.dataset(table).to_table(columns=columns, filter=filter).to_pandas(types_mapper=int_types.get)
+
+    def read_sql(self, query):
+        raise NotImplementedError("SQL queries aren't supported by the parquet backend, use scan() instead.")
+
+    def read_table(self, table, year=None):
+        return self.scan(table, filter=(ds.field("year") == year) if year is not None else None)
+
+    def get_loaded_matches(self, table, years=None):
+        filter = ds.field("year").isin([int(year) for year in years]) if years is not None else None
+        return self.scan(table, columns=["year", "tournament_id", "match_id"], filter=filter).drop_duplicates().reset_index(drop=True)
+
+    def close(self):
+        pass
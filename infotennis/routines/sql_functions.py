@@ -3,61 +3,22 @@ Created by Gerald on 23/9/2023 16:51 LT.
 
 Functions for creating/deleting/updating the Database (MySQL).
 """
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import datetime
-import glob
-import json
 import logging
 import os
+import tempfile
 
 import numpy as np
 import pandas as pd
-import yaml
-
-from infotennis.processing.processing_keystats import process_key_stats
-from infotennis.processing.processing_rallys import process_rally_analysis
-from infotennis.processing.processing_strokes import process_stroke_analysis
-from infotennis.processing.processing_courtvision import process_court_vision
-
-
-# Suppress "WDM INFO ====== WebDriver manager ======" messages
-os.environ['WDM_LOG_LEVEL'] = '0'
-
-
-table_dtypes_all = {   
-    "atp_calendars": "year INT, tournament VARCHAR(255), tournament_id VARCHAR(32), category VARCHAR(64), location VARCHAR(255),\
-                date_start VARCHAR(32), tournament_status VARCHAR(32), draw VARCHAR(32), surface VARCHAR(64), finance VARCHAR(32),\
-                winner VARCHAR(255), url VARCHAR(255)",
-    "atp_results": "year INT, tournament VARCHAR(255), tournament_id VARCHAR(255), category VARCHAR(255), match_id VARCHAR(255),\
-                round VARCHAR(255), player1_name VARCHAR(255), player1_id VARCHAR(255), player1_seed VARCHAR(255),\
-                player1_nation VARCHAR(255), player2_name VARCHAR(255), player2_id VARCHAR(255), player2_seed VARCHAR(255),\
-                player2_nation VARCHAR(255), score VARCHAR(255), url VARCHAR(255), court_vision INT",
-    "key_stats": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT, set_n INT,\
-                player_id VARCHAR(32), opponent_id VARCHAR(32), serve_rating INT, aces INT, serves_unreturned INT, double_faults INT,\
-                serve1 VARCHAR(32), serve1_pct FLOAT, serve1_pts_won VARCHAR(32), serve1_pts_won_pct FLOAT, serve2_pts_won VARCHAR(32),\
-                serve2_pts_won_pct FLOAT, break_points_saved VARCHAR(32), break_points_saved_pct FLOAT, service_games_played INT,\
-                return_rating INT, serve1_return_pts_won VARCHAR(32), serve1_return_pts_won_pct FLOAT, serve2_return_pts_won VARCHAR(32),\
-                serve2_return_pts_won_pct FLOAT, break_points_converted VARCHAR(32), break_points_converted_pct FLOAT, break_points_faced INT,\
-                return_games_played INT, net_points_won VARCHAR(32), net_points_won_pct FLOAT, winners INT, unforced_errors INT,\
-                service_points_won VARCHAR(32), service_points_won_pct FLOAT, return_points_won VARCHAR(32), return_points_won_pct FLOAT,\
-                total_points_won VARCHAR(32), total_points_won_pct FLOAT, max_speed INT, serve1_avg_speed INT, serve2_avg_speed INT",
-    "rally_analysis": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT,\
-                shot_number VARCHAR(32), outcome VARCHAR(32), player_id VARCHAR(32), opponent_id VARCHAR(32), crucial_point TINYINT,\
-                score VARCHAR(32), hand VARCHAR(32), point_end_type VARCHAR(32), point_id VARCHAR(32), serve INT, serve_dir VARCHAR(32),\
-                court_side VARCHAR(32), serve_speed INT, set_n INT, game VARCHAR(32), point VARCHAR(32), shot_type VARCHAR(32),\
-                p1_break_point TINYINT, p2_break_point TINYINT, p1_net_point TINYINT, p2_net_point TINYINT, tie_break TINYINT,\
-                set_point TINYINT",
-    "stroke_analysis": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT, set_n INT,\
-                player_id VARCHAR(32), opponent_id VARCHAR(32), hand VARCHAR(32), shot_type VARCHAR(32), winners INT, errors INT,\
-                unforced_errors INT, others INT",
-    "court_vision": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), p1_id VARCHAR(32), p2_id VARCHAR(32),\
-                point_id VARCHAR(32), server_id VARCHAR(32), scorer_id VARCHAR(32), receiver_id VARCHAR(32), ball_speed_kmh FLOAT,\
-                rally_length INT, point_end_type VARCHAR(32), stroke_type VARCHAR(32), serve_type VARCHAR(32), court VARCHAR(32),\
-                set_n INT, game INT, point INT, serve INT, hand VARCHAR(32), break_point TINYINT, break_point_converted TINYINT,\
-                p1_sets_w INT, p2_sets_w INT, p1_set_score INT, p2_set_score INT, p1_game_score VARCHAR(32), p2_game_score VARCHAR(32),\
-                is_tiebreak INT, stroke_idx INT, x_hit FLOAT, y_hit FLOAT, z_hit FLOAT, x_peak_pre FLOAT, y_peak_pre FLOAT,\
-                z_peak_pre FLOAT, x_net FLOAT, y_net FLOAT, z_net FLOAT, x_bounce FLOAT, y_bounce FLOAT, z_bounce FLOAT, x_peak_post FLOAT,\
-                y_peak_post FLOAT, z_peak_post FLOAT"
-}
+
+from infotennis.processing.processing_batch import batch_functions, match_keys, process_batch
+from infotennis.processing.processing_keystats import get_unret_serves_index
+from infotennis.raw_store import RawFileIndex, load_raw_data
+from infotennis.routines.storage import LoadedMatchIndex, StorageBackend, dataframe_to_rows
+from infotennis.schemas import db_tables, get_table_dtypes, table_dtypes_all, table_indexes, table_unique_indexes
+
 
 def initalise_tables(mycursor, database_name, table="all"):
     """
@@ -81,30 +42,23 @@ def initalise_tables(mycursor, database_name, table="all"):
     - atp_court_vision
     """
     if table == "all":
-        tables = ["atp_results", "atp_calendars", "atp_key_stats", "atp_rally_analysis", "atp_stroke_analysis", "atp_court_vision"]
+        tables = db_tables
     else:
         tables = [table]
 
     for table in tables:
-        if table in ["atp_results", "atp_calendars"]:
-            table_dtypes = table_dtypes_all[table]
-        else:
-            table_dtypes = table_dtypes_all["_".join(table.split("_")[1:])]
-
         mycursor.execute(f"CREATE TABLE {table} (id INT AUTO_INCREMENT PRIMARY KEY, "+\
-                table_dtypes + ")")
+                get_table_dtypes(table) + ")")
+        table_columns_cache.pop((database_name, table), None)
         
         # Create a unique index based on the unique match identifying fields for following table types
-        if table == "atp_calendars":
-            mycursor.execute(f"CREATE UNIQUE INDEX year_tourn_id ON {database_name}.{table} (year, tournament_id);") 
-        elif table == "atp_key_stats":
-            mycursor.execute(f"CREATE UNIQUE INDEX unique_stat_row ON {database_name}.{table} (year, tournament_id, match_id, set_n, player_id);")
-        elif table == "atp_stroke_analysis":
-            mycursor.execute(f"CREATE UNIQUE INDEX unique_stat_row ON {database_name}.{table} (year, tournament_id, match_id, set_n, player_id, hand, shot_type);")
-        elif table == "atp_rally_analysis":
-            mycursor.execute(f"CREATE UNIQUE INDEX unique_stat_row ON {database_name}.{table} (year, tournament_id, match_id, point_id);")
-        elif table == "atp_court_vision":
-            mycursor.execute(f"CREATE UNIQUE INDEX unique_stat_row ON {database_name}.{table} (year, tournament_id, match_id, point_id, stroke_idx);")
+        if table in table_unique_indexes:
+            index_name, index_cols = table_unique_indexes[table]
+            mycursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {database_name}.{table} ({', '.join(index_cols)});")
+        # Index on the point order of the point-by-point tables (for range scans of a match's points)
+        if table in table_indexes:
+            index_name, index_cols = table_indexes[table]
+            mycursor.execute(f"CREATE INDEX {index_name} ON {database_name}.{table} ({', '.join(index_cols)});")
 
 
 def drops_tables(mycursor, database_name, table="all"):
@@ -128,14 +82,75 @@ def drops_tables(mycursor, database_name, table="all"):
     - atp_court_vision
     """
     if table == "all":
-        tables = ["atp_results", "atp_calendars", "atp_key_stats", "atp_rally_analysis", "atp_stroke_analysis" "atp_court_vision"]
+        tables = db_tables
     else:
         tables = [table]
     for table in tables:
         mycursor.execute(f"DROP TABLE " + database_name+"."+table)
+        table_columns_cache.pop((database_name, table), None)
+
+
+# Cache of the (non-id) column names of each DB table, keyed by (database_name, table)
+table_columns_cache = {}
+
+def get_db_table_columns(mycursor, database_name, table, refresh=False):
+    """
+    Returns the column names (excluding the auto-increment id) of a MySQL table. The result is cached per table,
+    so SHOW COLUMNS is only queried once per table.
+
+    Args:
+        mycursor (pymysql.cursors.Cursor): The MySQL cursor for executing queries.
+        database_name (str): The name of the database where the table resides.
+        table (str): The name of the table.
+        refresh (bool, optional): Re-query the columns even if they are cached. Defaults to False.
 
+    Returns:
+        columns (list): List of the table's column names.
+    """
+    if refresh or (database_name, table) not in table_columns_cache:
+        mycursor.execute("SHOW COLUMNS FROM "+database_name+"."+table)
+        table_columns_cache[(database_name, table)] = [column[0] for column in mycursor.fetchall()][1:]
+    return table_columns_cache[(database_name, table)]
 
-def insert_results_data_new(mycursor, conn, database_name, table, dataframe, batch=False):
+
+def load_data_infile(mycursor, database_name, table, columns, dataframe, update_statement):
+    """
+    Stages a DataFrame into a temporary copy of a MySQL table with LOAD DATA LOCAL INFILE (from a temporary CSV file), 
+    then merges it into the table with an INSERT ... SELECT ... ON DUPLICATE KEY UPDATE. The connection must have been 
+    created with local_infile=True.
+
+    Args:
+        mycursor (pymysql.cursors.Cursor): The MySQL cursor for executing queries.
+        database_name (str): The name of the database where the table resides.
+        table (str): The name of the table where data should be inserted.
+        columns (list): The table's column names, in the order of the DataFrame's columns.
+        dataframe (pandas.DataFrame): The DataFrame containing the data to be inserted.
+        update_statement (str): The "ON DUPLICATE KEY UPDATE ..." clause of the merge.
+    """
+    table_tmp = f"{table}_staging"
+    # Booleans need to be written as 1/0 for TINYINT columns
+    df_csv = dataframe.copy()
+    for col in df_csv.columns[df_csv.dtypes == bool]:
+        df_csv[col] = df_csv[col].astype(int)
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="", encoding="utf-8") as fp:
+        # With no escape character, MySQL reads an unquoted NULL as a NULL value
+        df_csv.to_csv(fp, index=False, header=False, na_rep="NULL", lineterminator="\n")
+        file_csv = fp.name
+    try:
+        mycursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {database_name}.{table_tmp}")
+        mycursor.execute(f"CREATE TEMPORARY TABLE {database_name}.{table_tmp} LIKE {database_name}.{table}")
+        mycursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {database_name}.{table_tmp} CHARACTER SET utf8mb4 "+\
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\n' "+\
+            "(" + ', '.join(columns) + ")", (file_csv.replace(os.sep, "/"),))
+        mycursor.execute(f"INSERT INTO {database_name}.{table} (" + ', '.join(columns) + ") " +\
+            f"SELECT " + ', '.join(columns) + f" FROM {database_name}.{table_tmp} " + update_statement)
+        mycursor.execute(f"DROP TEMPORARY TABLE {database_name}.{table_tmp}")
+    finally:
+        os.remove(file_csv)
+
+
+def insert_results_data_new(mycursor, conn, database_name, table, dataframe, batch=False, method="insert", chunk_size=1000,
+                            reset_auto_increment=True):
     """
     Inserts data from a DataFrame into a MySQL table, updating existing rows if a duplicate key is found.
 
@@ -146,46 +161,58 @@ def insert_results_data_new(mycursor, conn, database_name, table, dataframe, bat
         table (str): The name of the table where data should be inserted.
         dataframe (pandas.DataFrame): The DataFrame containing the data to be inserted.
         batch (bool, optional): Flag indicating whether to insert data in batches. Defaults to False.
+        method (str, optional): "insert" for INSERT statements or "load_data" to stage the data with LOAD DATA LOCAL INFILE
+        into a temporary table and merge it (needs a connection with local_infile=True). Defaults to "insert".
+        chunk_size (int, optional): Number of rows sent per multi-row INSERT in batch mode. Defaults to 1000.
+        reset_auto_increment (bool, optional): Reset the table's AUTO_INCREMENT to MAX(id)+1 before inserting. Defaults to True.
 
     This function inserts data from a DataFrame into a MySQL table. If a duplicate key is found, it updates the existing row
     instead of inserting a new one. The function dynamically generates the INSERT...ON DUPLICATE KEY UPDATE statement based
-    on the column names in the table.
+    on the column names in the table (which are cached per table, see get_db_table_columns()), and the DataFrame's columns 
+    are matched to them by name.
 
-    The function supports batch insertion, which can be faster for large DataFrames. If batch mode is enabled, data is inserted
-    in smaller batches (default batch size is 10) to improve performance. If batch mode is disabled, data is inserted row by row.
+    The function supports batch insertion, which is much faster for large DataFrames. If batch mode is enabled, rows are sent 
+    as multi-row INSERT statements of chunk_size rows (or all at once with method="load_data"). If batch mode is disabled, 
+    data is inserted row by row. NaN values are inserted as NULL.
 
-    After inserting or updating the data, the function sends a COMMIT statement to the MySQL server to commit the changes.
+    After inserting or updating the data, the function sends a single COMMIT statement to the MySQL server to commit the changes.
     """
-    # Reset the id-column to auto-increment starting from +1 of the last entry's id 
-    # Step 1: Find the current maximum "id" value
-    mycursor.execute(f"SELECT MAX(id) FROM "+ database_name+"."+table)
-    max_id = mycursor.fetchone()[0]
-    
-    # Step 2: Alter the table to set the auto-increment value
-    if max_id is not None:
-        mycursor.execute(f"ALTER TABLE "+ database_name+"."+table +f" AUTO_INCREMENT = {max_id + 1}")
+    if reset_auto_increment:
+        # Reset the id-column to auto-increment starting from +1 of the last entry's id 
+        # Step 1: Find the current maximum "id" value
+        mycursor.execute(f"SELECT MAX(id) FROM "+ database_name+"."+table)
+        max_id = mycursor.fetchone()[0]
+        
+        # Step 2: Alter the table to set the auto-increment value
+        if max_id is not None:
+            mycursor.execute(f"ALTER TABLE "+ database_name+"."+table +f" AUTO_INCREMENT = {max_id + 1}")
     
-    # Get all column names from the input DB table
-    mycursor.execute("SHOW COLUMNS FROM "+database_name+"."+table)
-    columns = [column[0] for column in mycursor.fetchall()][1:]
+    # Get all column names from the input DB table, and insert the DataFrame's columns by name (not by position, since 
+    # e.g. a column added to an existing table with ALTER TABLE can be in another position than in the table schema)
+    table_columns = get_db_table_columns(mycursor, database_name, table)
+    columns = [column for column in table_columns if column in dataframe.columns]
+    missing_columns = [column for column in dataframe.columns if column not in table_columns]
+    if len(missing_columns) > 0:
+        logging.warning(f"Columns {', '.join(missing_columns)} are not in {database_name}.{table} and aren't inserted.")
+    dataframe = dataframe[columns]
     column_value_pairs = [f"{column} = IF(VALUES({column}) IS NULL, {column}, VALUES({column}))" for column in columns]
+    on_duplicate_statement = " ON DUPLICATE KEY UPDATE " + ", ".join(column_value_pairs)
     
     update_statement = "INSERT INTO " + table + " (" + ', '.join(columns) + ") " + \
-        "VALUES" + "(" + ', '.join(['%s'] * len(columns)) + ")"\
-        " ON DUPLICATE KEY UPDATE " + ", ".join(column_value_pairs)
+        "VALUES" + "(" + ', '.join(['%s'] * len(columns)) + ")" + on_duplicate_statement
         
     # Execute the insertion
-    # Execute row-by-row or as a batch (default size of 20)
-    if batch: 
-        for bt in range(0, len(dataframe), 10):
-            if bt+10 >  len(dataframe):
-                mycursor.executemany(update_statement, [list(row) for i,row in dataframe.iloc[bt:].iterrows()])
-            else:
-                mycursor.executemany(update_statement, [list(row) for i,row in dataframe.iloc[bt:bt+10].iterrows()])
+    if batch and method == "load_data":
+        load_data_infile(mycursor, database_name, table, columns, dataframe, on_duplicate_statement)
+    elif batch:
+        # pymysql's executemany sends the rows of each chunk as a multi-row INSERT statement
+        rows = dataframe_to_rows(dataframe)
+        for bt in range(0, len(rows), chunk_size):
+            mycursor.executemany(update_statement, rows[bt:bt+chunk_size])
     else:
         # Loop thru the stats_processed DF and insert into the key_stats table
-        for index, row in dataframe.iterrows():
-            mycursor.execute(update_statement, list(row))
+        for row in dataframe_to_rows(dataframe):
+            mycursor.execute(update_statement, row)
 
     # Sends a COMMIT statement to the MySQL server, committing the current transaction. Since by default Connector/Python does not 
     # autocommit, it is important to call this method after every transaction that modifies data for tables that use transactional 
@@ -195,7 +222,183 @@ def insert_results_data_new(mycursor, conn, database_name, table, dataframe, bat
     return
 
 
-def update_stat_tables_from_files(df_results_update, data_type, database_name, table, mycursor, conn, data_dir, data_path, insert=True):
+class MySQLBackend(StorageBackend):
+    """
+    Tables stored in a MySQL database, using the functions above.
+
+    Args:
+        conn (pymysql.connections.Connection): The MySQL database connection.
+        database_name (str): The name of the database where the tables reside.
+        mycursor (pymysql.cursors.Cursor, optional): The MySQL cursor for executing queries. Defaults to None (a new cursor of conn).
+    """
+    def __init__(self, conn, database_name, mycursor=None):
+        self.conn = conn
+        self.database_name = database_name
+        self.mycursor = mycursor if mycursor is not None else conn.cursor()
+
+    def table_name(self, table):
+        return f"{self.database_name}.{table}" if self.database_name else table
+
+    def initalise_tables(self, table="all"):
+        initalise_tables(self.mycursor, self.database_name, table)
+
+    def drop_tables(self, table="all"):
+        drops_tables(self.mycursor, self.database_name, table)
+
+    def upsert(self, table, dataframe, batch=True, method="insert", chunk_size=1000):
+        insert_results_data_new(self.mycursor, self.conn, self.database_name, table, dataframe, batch=batch, method=method,
+                                chunk_size=chunk_size)
+
+    def read_sql(self, query):
+        return pd.read_sql_query(query, self.conn)
+
+
+def get_storage(conn, database_name=None, mycursor=None):
+    """
+    Returns the storage backend of a connection, i.e. conn itself if it is already a StorageBackend (e.g. an SQLiteBackend),
+    else a MySQLBackend of the MySQL connection.
+
+    Args:
+        conn (StorageBackend or pymysql.connections.Connection): The storage backend or MySQL database connection.
+        database_name (str, optional): The name of the MySQL database. Defaults to None.
+        mycursor (pymysql.cursors.Cursor, optional): The MySQL cursor for executing queries. Defaults to None.
+
+    Returns:
+        StorageBackend: The storage backend.
+    """
+    if isinstance(conn, StorageBackend):
+        return conn
+    return MySQLBackend(conn, database_name, mycursor)
+
+
+def filter_processed_matches(df_stats_processed, data_type):
+    """
+    Drops the matches of a processed (batch) dataframe whose data isn't worth adding to the DB.
+
+    Args:
+        df_stats_processed (pandas.DataFrame): Processed data of one or more matches.
+        data_type (str): Type of the processed data ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+
+    Returns:
+        df_stats_processed (pandas.DataFrame): Processed data of the matches to keep.
+    """
+    if len(df_stats_processed) == 0:
+        return df_stats_processed
+    by_match = df_stats_processed.groupby(match_keys, sort=False)
+    if data_type == "rally-analysis":
+        # If non-unknown rows are fewer than 90% of the total points played, don't bother adding this to the DB
+        is_known = df_stats_processed.shot_number != "Unknown"
+        keep = is_known.groupby([df_stats_processed[k] for k in match_keys], sort=False).transform("sum") >= by_match.shot_number.transform("size")*0.9
+        df_stats_processed = df_stats_processed[keep & is_known]
+    elif data_type == "stroke-analysis":
+        # If the max value of the "winners", "errors", "unforced_errors" and "others" columns is 0, don't bother adding this to the DB
+        keep = by_match[["winners", "errors", "unforced_errors", "others"]].transform("max").max(axis=1) > 0
+        df_stats_processed = df_stats_processed[keep]
+    return df_stats_processed.reset_index(drop=True)
+
+
+def load_and_process_matches(data_type, matches):
+    """
+    Reads the raw data files of a batch of matches and processes them into a single dataframe. If processing the batch
+    fails, its matches are processed one at a time so that only the match(es) with errors are dropped.
+
+    Args:
+        data_type (str): Type of data ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+        matches (list): List of (metadata, stats source, unreturned serves source or None, rally-analysis source or None)
+        of the matches to process, where a source is a JSON file or a record location in a RawDataStore (see
+        infotennis.raw_store.load_raw_data()). The rally-analysis data is only read for key-stats without the unreturned
+        serves derived from it already.
+
+    Returns:
+        tuple: (df_stats_processed, failed, unret_derived), the processed dataframe of the batch, a list of (metadata, 
+        error str) of the matches that failed and a list of (metadata, unreturned serves) derived from the rally-analysis
+        data read (see get_unret_serves_index()).
+    """
+    batch = []
+    failed = []
+    unret_derived = []
+    for metadata, file_stats, file_unret, file_rallies in matches:
+        try:
+            raw_data = load_raw_data(file_stats)
+            if data_type == "key-stats":
+                unret_serves = None
+                if file_unret is not None:
+                    unret_serves = load_raw_data(file_unret)
+                elif file_rallies is not None:
+                    unret_serves = get_unret_serves_index(load_raw_data(file_rallies))
+                    unret_derived.append((metadata, unret_serves))
+                batch.append((metadata, raw_data, unret_serves))
+            else:
+                batch.append((metadata, raw_data))
+        except Exception as e:
+            failed.append((metadata, repr(e)))
+
+    df_stats_processed, failed_processing = process_matches(data_type, batch)
+    return df_stats_processed, failed + failed_processing, unret_derived
+
+
+def process_matches(data_type, batch):
+    """
+    Processes the raw data of a batch of matches into a single dataframe of the matches worth adding to the DB. If 
+    processing the batch fails, its matches are processed one at a time so that only the match(es) with errors are dropped.
+
+    Args:
+        data_type (str): Type of data ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+        batch (list): List of (metadata, raw_data) or, for key-stats, (metadata, raw_data, raw_data_rallies) of the matches 
+        (see infotennis.processing.processing_batch).
+
+    Returns:
+        tuple: (df_stats_processed, failed), the processed dataframe of the batch and a list of (metadata, error str) 
+        of the matches that failed.
+    """
+    failed = []
+    try:
+        df_stats_processed = filter_processed_matches(process_batch(data_type, batch), data_type)
+    except Exception:
+        list_df = []
+        for match in batch:
+            try:
+                list_df.append(filter_processed_matches(process_batch(data_type, [match]), data_type))
+            except Exception as e:
+                failed.append((match[0], repr(e)))
+        list_df = [df for df in list_df if len(df) > 0]
+        df_stats_processed = pd.concat(list_df, ignore_index=True) if len(list_df) > 0 else pd.DataFrame()
+
+    return df_stats_processed, failed
+
+
+def map_batches(func, data_type, batches, n_workers=1):
+    """
+    Yields func(data_type, batch) for every batch, in order. With n_workers > 1 the calls run in a pool of worker 
+    processes, with at most 2 batches per worker submitted at a time to bound the memory held by pending results.
+
+    Args:
+        func (callable): Module-level (i.e. picklable) function taking (data_type, batch).
+        data_type (str): Type of data passed on to func.
+        batches (list): List of batches.
+        n_workers (int, optional): Number of worker processes. Defaults to 1 (run serially in this process).
+
+    Yields:
+        The output of func for each batch, in the order of batches.
+    """
+    if n_workers is None or n_workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            yield func(data_type, batch)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(batches))) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(func, data_type, batch))
+            if len(pending) >= 2*n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def update_stat_tables_from_files(df_results_update, data_type, database_name, table, mycursor, conn, data_dir, data_path, insert=True, batch_size=100,
+                                  n_workers=1, insert_method="insert", chunk_size=1000, raw_store=None,
+                                  file_index=None, loaded_index=None):
     """
     Update MySQL tables with tennis statistics data from raw data files.
 
@@ -204,26 +407,52 @@ def update_stat_tables_from_files(df_results_update, data_type, database_name, t
         data_type (str): Type of data to update ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
         database_name (str): The name of the database where tables will be updated.
         table (str): The name of the table to update.
-        mycursor (pymysql.cursors.Cursor): The MySQL cursor for executing queries.
-        conn (pymysql.connections.Connection): The MySQL database connection.
+        mycursor (pymysql.cursors.Cursor): The MySQL cursor for executing queries (None for other storage backends).
+        conn (pymysql.connections.Connection or StorageBackend): The MySQL database connection or a storage backend (e.g. SQLiteBackend).
         data_dir (str): The directory where data files are stored.
         data_path (str): The file path pattern for locating data files.
         insert (bool, optional): Flag indicating whether to insert the data into the database. Defaults to True.
+        batch_size (int, optional): Number of matches processed together and inserted in one go. Defaults to 100.
+        n_workers (int, optional): Number of worker processes reading and processing the batches. Defaults to 1 (i.e. 
+        everything runs serially in this process).
+        insert_method (str, optional): Bulk insert method, "insert" or "load_data" (see insert_results_data_new()). Defaults to "insert".
+        chunk_size (int, optional): Number of rows per multi-row INSERT statement. Defaults to 1000.
+        raw_store (infotennis.raw_store.RawDataStore, optional): Store to read the raw data from instead of the JSON files
+        in data_dir. Defaults to None.
+        file_index (infotennis.raw_store.RawFileIndex, optional): Index of the JSON files in data_dir, e.g. shared by the calls for
+        all data types. Defaults to None (a new index is built).
+        loaded_index (infotennis.routines.storage.LoadedMatchIndex, optional): Index of the matches already loaded into the table, 
+        e.g. shared with the scraper. Defaults to None (the matches of the years in df_results_update are read from the table).
 
     This function updates MySQL tables with tennis statistics data from raw JSON files. It processes and inserts data into the
     specified table based on the provided data_type and the information in the df_results_update DataFrame.
 
-    The function locates and reads data files for each match, processes the data based on the data_type, and inserts
-    the resulting data into the specified MySQL table. It also keeps track of the number of matches with statistics
-    inserted and provides information about the update process.
+    The function locates the data files for each match, then reads and processes them in batches of batch_size matches 
+    (see infotennis.processing.processing_batch), inserting each batch into the specified table at once. If n_workers > 1,
+    the batches are read and processed in a process pool while the DB inserts stay in this process, in the same order as
+    df_results_update. Matches that fail to be read or processed are logged and skipped. It also keeps track of the number 
+    of matches with statistics inserted and provides information about the update process.
     """
-    
+    if data_type not in batch_functions:
+        logging.error(f"Unrecognised data_type {data_type} provided.")
+        return
+
     n_stats_uploaded = 0 #Keep a count of how many match stats have been uploaded to the DB
     n_DNP = 0            #Keep a count of how many matches weren't actually played
 
-    # Get the respective stat's DB table before the start of any processing/insertion
-    df_stats_db = pd.read_sql_query(f"SELECT year,tournament_id,match_id FROM {database_name}.{table}",conn)
+    storage = get_storage(conn, database_name, mycursor)
+    # Raw data is located either in the raw data store or in the index of the JSON files
+    if raw_store is not None:
+        raw_data_index = raw_store
+    else:
+        raw_data_index = file_index if file_index is not None else RawFileIndex(data_dir, data_path)
 
+    # Get the matches in the respective stat's DB table (of the years to update) before the start of any processing/insertion
+    if loaded_index is None:
+        loaded_index = LoadedMatchIndex(storage, table, years=df_results_update.year.unique() if len(df_results_update) > 0 else [])
+
+    # List of (metadata, stats file, unreturned serves file, rally-analysis file) of the matches to process
+    matches_toprocess = []
     for k, result in df_results_update.iterrows():
         if table in ["slams_key_stats", "slams_rally_analysis", "slams_stroke_analysis", "slams_court_vision"]:
             tourn_id, round_n, year, match_id = \
@@ -236,7 +465,7 @@ def update_stat_tables_from_files(df_results_update, data_type, database_name, t
         # if court_vision != 1 and data_type != "key-stats":
         #     continue
         # Skip this result if it already exists in the DB stats table
-        if match_id in df_stats_db[(df_stats_db.tournament_id == tourn_id) & (df_stats_db.year == year)].match_id.unique():
+        if match_id is not None and loaded_index.contains(year, tourn_id, match_id):
             continue
         if match_id is None:
             logging.info(f'No raw {data_type} file found for {year} {tourn_id}-{match_id}.')
@@ -245,62 +474,42 @@ def update_stat_tables_from_files(df_results_update, data_type, database_name, t
             n_DNP += 1
             continue
 
-        # Locate the existing key-stats json file from the result's year, tournament_id and match_id
-        file_stats = glob.glob(data_dir + data_path.replace("<data_type>", data_type).replace("<year>", str(year))  + f"{tourn_id}_*_{year}_{match_id.upper()}_{data_type}.json")
-        # If no key-stats is found for the given match, note that match is missing stats file and continue
-        if len(file_stats) == 0:
+        # Locate the match's raw data file (or record in the raw data store) from the result's year, tournament_id and match_id
+        file_stats = raw_data_index.get_location(year, tourn_id, match_id, data_type)
+        # If no raw data is found for the given match, note that match is missing stats file and continue
+        if file_stats is None:
             logging.info(f'No raw {data_type} file found for {year} {tourn_id}-{match_id}.')
             continue
-        else: # Else select the first list index
-            file_stats = file_stats[0]
-            # Open the rally-analysis file and read to a dict object
-            with open(file_stats, 'r') as j:
-                raw_data = json.loads(j.read())
-
-        # Data processing function calls depending on the input data_type
+        file_unret = file_rallies = None
         if data_type == "key-stats":
-            # Extra Step to try and locate the corresponding rally-analysis file if data_type="key-stats"
-            # Get the rally file path
-            file_rallies = glob.glob(data_dir + data_path.replace("<data_type>","rally-analysis").replace("<year>", str(year)) + f"{tourn_id}_*_{year}_{match_id.upper()}_rally-analysis.json")
-            # If no rally-analysis is found for the given match, set file_rallies to None
-            if len(file_rallies) == 0:
-                raw_rallys = None
-            else: # Else select the first list index
-                file_rallies = file_rallies[0]
-                # Open the rally-analysis file and read to a dict object
-                with open(file_rallies, 'r') as j:
-                    raw_rallys = json.loads(j.read())
-            df_stats_processed = process_key_stats(year, tourn_id, match_id, round_n, raw_data, raw_data_rallies=raw_rallys)
-
-        elif data_type == "rally-analysis":
-            df_stats_processed = process_rally_analysis(year, tourn_id, match_id, round_n, raw_data)
-            # If non-unknown rows are fewer than 90% of the total points played, don't bother adding this to the DB
-            if len(df_stats_processed[df_stats_processed.shot_number != "Unknown"]) < len(df_stats_processed)*0.9:
-                continue
-            else:
-                df_stats_processed = df_stats_processed[df_stats_processed.shot_number != "Unknown"].reset_index(drop=True)
-
-        elif data_type == "stroke-analysis":
-            df_stats_processed = process_stroke_analysis(year, tourn_id, match_id, round_n, raw_data)
-            # If the max value of the "winners", "errors", "unforced_errors" and "others" columns is 0, don't bother adding this to the DB
-            if df_stats_processed[["winners", "errors", "unforced_errors", "others"]].max().max() == 0:
-                continue
-        elif data_type == "court-vision":
-            df_stats_processed = process_court_vision(year, tourn_id, match_id, round_n, raw_data)
-        else: 
-            logging.error(f"Unrecognised data_type {data_type} provided.")
-            return
-        
+            # Extra Step to locate the unreturned serves saved alongside the corresponding rally-analysis file if
+            # data_type="key-stats", else the rally-analysis file to derive them from (None if there is none)
+            file_unret = raw_data_index.get_derived_location(year, tourn_id, match_id, "unret-serves")
+            if file_unret is None:
+                file_rallies = raw_data_index.get_location(year, tourn_id, match_id, "rally-analysis")
+        metadata = {"year": year, "tournament_id": tourn_id, "match_id": match_id, "round": round_n}
+        matches_toprocess.append((metadata, file_stats, file_unret, file_rallies))
+
+    batches = [matches_toprocess[bt:bt+batch_size] for bt in range(0, len(matches_toprocess), batch_size)]
+    for df_stats_processed, failed, unret_derived in map_batches(load_and_process_matches, data_type, batches, n_workers):
+        for metadata, error in failed:
+            logging.error(f"Failed to process {data_type} for {metadata['year']} {metadata['tournament_id']}-{metadata['match_id']}. Error: {error}")
+        # Save the unreturned serves derived from the rally-analysis files, so they aren't read again to re-process key-stats
+        for metadata, unret_serves in unret_derived:
+            try:
+                raw_data_index.put_derived(metadata["year"], metadata["tournament_id"], metadata["match_id"], "unret-serves", unret_serves)
+            except Exception as e:
+                logging.warning(f"Failed to save the unreturned serves of {metadata['year']} {metadata['tournament_id']}-{metadata['match_id']}. Error: {e}")
+        if len(df_stats_processed) == 0:
+            continue
         df_stats_processed = df_stats_processed.replace({np.nan: -999})
         if insert:
-            if data_type != "key-stats":
-                insert_results_data_new(mycursor, conn, database_name, table, df_stats_processed, batch=False)
-            else:
-                insert_results_data_new(mycursor, conn, database_name, table, df_stats_processed, batch=True)
+            storage.upsert(table, df_stats_processed, batch=True, method=insert_method, chunk_size=chunk_size)
+            loaded_index.add_frame(df_stats_processed)
         else: # Allow an insert=False option just for testing purposes, i.e. test whole pipeline but don't update the tables
             pass
 
-        n_stats_uploaded += 1
+        n_stats_uploaded += len(df_stats_processed.drop_duplicates(match_keys))
 
     print(f'Inserted {data_type} for {n_stats_uploaded} matches out of {len(df_results_update)} (total), {len(df_results_update)-n_DNP} (played).')
-    logging.info(f'Inserted {data_type} for {n_stats_uploaded} matches out of {len(df_results_update)} (total), {len(df_results_update)-n_DNP} (played).')
\ No newline at end of file
+    logging.info(f'Inserted {data_type} for {n_stats_uploaded} matches out of {len(df_results_update)} (total), {len(df_results_update)-n_DNP} (played).')
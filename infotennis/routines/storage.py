@@ -0,0 +1,350 @@
+"""
+Storage backends for the ATP data tables. The database routines (update_routines, update_stat_tables_from_files etc.)
+only use the StorageBackend methods, so the tables can live in MySQL (see sql_functions.MySQLBackend) or in an embedded
+database file (SQLite or DuckDB), e.g. to run the whole pipeline and its benchmarks locally without a MySQL server.
+
+All backends create the same tables (schemas in table_dtypes_all, unique indexes in table_unique_indexes and the point
+order indexes in table_indexes) and have the same upsert semantics as insert_results_data_new(): rows with a duplicate
+unique key update the existing row, except for the columns which are NULL in the new row.
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+from infotennis.schemas import db_tables, get_table_columns, table_indexes, table_unique_indexes
+
+
+def dataframe_to_rows(dataframe):
+    """
+    Converts a DataFrame into a list of row tuples of native Python values (NaN/NA become None), column by column
+    instead of with iterrows().
+
+    Args:
+        dataframe (pandas.DataFrame): The DataFrame to convert.
+
+    Returns:
+        list: List of tuples, 1 per row of the DataFrame.
+    """
+    columns = [dataframe[col].astype(object).where(dataframe[col].notna(), None).tolist() for col in dataframe.columns]
+    return list(zip(*columns))
+
+
+class StorageBackend:
+    """
+    Base class of the storage backends, i.e. the table operations used by the update routines.
+    """
+    def table_name(self, table):
+        """
+        Returns the name of a table as it is referenced in queries (e.g. "database_name.table" for MySQL).
+        """
+        return table
+
+    def initalise_tables(self, table="all"):
+        """
+        Creates the tables (all of db_tables or the given table) with their indexes.
+        """
+        raise NotImplementedError
+
+    def drop_tables(self, table="all"):
+        """
+        Drops the tables (all of db_tables or the given table).
+        """
+        raise NotImplementedError
+
+    def upsert(self, table, dataframe, batch=True, method="insert", chunk_size=1000):
+        """
+        Inserts the rows of a DataFrame into a table, updating the existing row if a duplicate key is found (NULL values
+        don't overwrite existing values). See insert_results_data_new() for the arguments.
+        """
+        raise NotImplementedError
+
+    def read_sql(self, query):
+        """
+        Runs a SELECT query and returns its result as a DataFrame.
+        """
+        raise NotImplementedError
+
+    def read_table(self, table, year=None):
+        """
+        Returns all rows of a table, or only the rows of the given year.
+
+        Args:
+            table (str): The name of the table.
+            year (int, optional): Year of the rows to return. Defaults to None (all rows).
+
+        Returns:
+            pandas.DataFrame: The table's rows (incl. the id column).
+        """
+        query = f"SELECT * FROM {self.table_name(table)}"
+        if year is not None:
+            query += f" WHERE year = {int(year)}"
+        return self.read_sql(query)
+
+    def get_loaded_matches(self, table, years=None):
+        """
+        Returns the (year, tournament_id, match_id) of the matches that already have rows in a table.
+
+        Args:
+            table (str): The name of the table.
+            years (list, optional): Only return the matches of these years. Defaults to None (all years).
+
+        Returns:
+            pandas.DataFrame: Dataframe with the columns year, tournament_id, match_id (1 row per match).
+        """
+        if years is not None and len(years) == 0:
+            # No query, since "IN ()" isn't valid SQL in every database (e.g. MySQL)
+            return pd.DataFrame(columns=["year", "tournament_id", "match_id"])
+        query = f"SELECT DISTINCT year, tournament_id, match_id FROM {self.table_name(table)}"
+        if years is not None:
+            query += f" WHERE year IN ({', '.join(str(int(year)) for year in years)})"
+        return self.read_sql(query)
+
+    def compact(self, table="all"):
+        """
+        Merges the small files written by the upserts of file-based backends (nothing to do for databases).
+        """
+        pass
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.conn.close()
+
+
+def get_match_key(year, tourn_id, match_id):
+    """
+    Returns the key (year, tourn_id, match_id) of a match in a LoadedMatchIndex (match_id in upper case).
+    """
+    return int(year), str(tourn_id), str(match_id).upper()
+
+
+class LoadedMatchIndex:
+    """
+    Hashed set of the (year, tournament_id, match_id) of the matches already loaded into a table, for O(1) checks of
+    whether a match needs to be scraped/processed. Keep it up to date with add_frame() after every insert.
+
+    Args:
+        storage (StorageBackend): The storage backend of the table.
+        table (str): The name of the table.
+        years (list, optional): Only index the matches of these years (i.e. of the results to update). Defaults to None (all years).
+        path (str, optional): File to persist the index in (1 tab-separated key per line). If it exists, the keys are read from it 
+        instead of from the table (so it should be created with years=None), and added keys are appended to it. Defaults to None
+        (not persisted).
+    """
+    def __init__(self, storage, table, years=None, path=None):
+        self.table = table
+        self.path = path
+        self.keys = set()
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as fp:
+                for line in fp:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3 and parts[0].isdigit() and (years is None or int(parts[0]) in years):
+                        self.keys.add(get_match_key(*parts))
+        else:
+            df_loaded = storage.get_loaded_matches(table, years=years)
+            self.keys = set(map(get_match_key, df_loaded.year, df_loaded.tournament_id, df_loaded.match_id))
+            if path is not None:
+                self.save(self.keys)
+
+    def __contains__(self, key):
+        return get_match_key(*key) in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def contains(self, year, tourn_id, match_id):
+        """
+        Returns whether a match is already loaded.
+        """
+        return get_match_key(year, tourn_id, match_id) in self.keys
+
+    def discard(self, year, tourn_id, match_id):
+        """
+        Removes a match from the index (not from its file), e.g. when its raw data has changed and it has to be loaded again.
+        """
+        self.keys.discard(get_match_key(year, tourn_id, match_id))
+
+    def save(self, keys):
+        """
+        Appends keys to the index file.
+        """
+        with open(self.path, "a") as fp:
+            fp.writelines(f"{year}\t{tourn_id}\t{match_id}\n" for year, tourn_id, match_id in keys)
+
+    def add_frame(self, dataframe):
+        """
+        Adds the matches of a dataframe (with year, tournament_id, match_id columns, e.g. the rows just inserted) to the index.
+        """
+        keys_new = set(map(get_match_key, dataframe.year, dataframe.tournament_id, dataframe.match_id)) - self.keys
+        self.keys.update(keys_new)
+        if self.path is not None and len(keys_new) > 0:
+            self.save(sorted(keys_new))
+
+
+class EmbeddedBackend(StorageBackend):
+    """
+    Common table definitions and upsert statements of the embedded (file) databases.
+    """
+    # SQL types used for each column type of table_dtypes_all
+    sql_types = {}
+
+    def make_path(self, path):
+        """
+        Creates the directory of the database file if it doesn't exist yet.
+        """
+        if path != ":memory:" and os.path.dirname(path) != "":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def get_create_statements(self, table):
+        """
+        Returns the statements creating a table (with an auto-increment id) and its indexes.
+        """
+        column_defs = ", ".join(f"{col} {self.sql_types[sql_type]}" for col, sql_type in get_table_columns(table).items())
+        statements = [f"CREATE TABLE {table} ({self.id_column(table)}, {column_defs})"]
+        if table in table_unique_indexes:
+            index_name, index_cols = table_unique_indexes[table]
+            statements.append(f"CREATE UNIQUE INDEX {table}_{index_name} ON {table} ({', '.join(index_cols)})")
+        if table in table_indexes:
+            index_name, index_cols = table_indexes[table]
+            statements.append(f"CREATE INDEX {table}_{index_name} ON {table} ({', '.join(index_cols)})")
+        return statements
+
+    def get_upsert_statement(self, table, columns, values):
+        """
+        Returns an INSERT statement of the given columns from values (e.g. "VALUES (?, ...)" or a SELECT) which updates
+        the existing row on a conflict of the table's unique index, keeping existing values where the new ones are NULL.
+        """
+        statement = f"INSERT INTO {table} ({', '.join(columns)}) {values}"
+        if table not in table_unique_indexes:
+            return statement
+        index_cols = table_unique_indexes[table][1]
+        column_value_pairs = [f"{column} = COALESCE(excluded.{column}, {table}.{column})" for column in columns
+                              if column not in index_cols]
+        if len(column_value_pairs) == 0:
+            return statement + f" ON CONFLICT ({', '.join(index_cols)}) DO NOTHING"
+        return statement + f" ON CONFLICT ({', '.join(index_cols)}) DO UPDATE SET " + ", ".join(column_value_pairs)
+
+    def initalise_tables(self, table="all"):
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            for statement in self.get_create_statements(table):
+                self.conn.execute(statement)
+        self.conn.commit()
+
+    def drop_tables(self, table="all"):
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            self.conn.execute(f"DROP TABLE {table}")
+        self.conn.commit()
+
+
+class SQLiteBackend(EmbeddedBackend):
+    """
+    Tables stored in an SQLite database file (Python's built-in sqlite3).
+
+    Args:
+        path (str): Path of the database file (":memory:" for an in-memory database).
+    """
+    sql_types = {"INT": "INTEGER", "TINYINT": "INTEGER", "BIGINT": "INTEGER", "FLOAT": "REAL", "VARCHAR": "TEXT"}
+
+    def __init__(self, path):
+        self.path = path
+        self.make_path(path)
+        # The update routines call some operations in another thread (e.g. with func_timeout), 1 at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+    def id_column(self, table):
+        return "id INTEGER PRIMARY KEY AUTOINCREMENT"
+
+    def upsert(self, table, dataframe, batch=True, method="insert", chunk_size=1000):
+        if len(dataframe) == 0:
+            return
+        columns = list(dataframe.columns)
+        update_statement = self.get_upsert_statement(table, columns, "VALUES (" + ", ".join(["?"] * len(columns)) + ")")
+        rows = dataframe_to_rows(dataframe)
+        for bt in range(0, len(rows), chunk_size):
+            self.conn.executemany(update_statement, rows[bt:bt+chunk_size])
+        self.conn.commit()
+
+    def read_sql(self, query):
+        return pd.read_sql_query(query, self.conn)
+
+
+class DuckDBBackend(EmbeddedBackend):
+    """
+    Tables stored in a DuckDB database file (columnar, for fast analytics reads). Needs the duckdb package.
+
+    Args:
+        path (str): Path of the database file (":memory:" for an in-memory database).
+    """
+    sql_types = {"INT": "INTEGER", "TINYINT": "SMALLINT", "BIGINT": "BIGINT", "FLOAT": "DOUBLE", "VARCHAR": "VARCHAR"}
+
+    def __init__(self, path):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("The duckdb storage backend requires the duckdb package (pip install duckdb).")
+        self.path = path
+        self.make_path(path)
+        self.conn = duckdb.connect(path)
+
+    def id_column(self, table):
+        return f"id BIGINT DEFAULT nextval('{table}_id_seq')"
+
+    def get_create_statements(self, table):
+        return [f"CREATE SEQUENCE {table}_id_seq START 1"] + super().get_create_statements(table)
+
+    def drop_tables(self, table="all"):
+        super().drop_tables(table)
+        tables = db_tables if table == "all" else [table]
+        for table in tables:
+            self.conn.execute(f"DROP SEQUENCE {table}_id_seq")
+        self.conn.commit()
+
+    def upsert(self, table, dataframe, batch=True, method="insert", chunk_size=1000):
+        if len(dataframe) == 0:
+            return
+        columns = list(dataframe.columns)
+        # DuckDB can't update the same row twice in 1 statement, so only the last of any rows with the same key is kept
+        if table in table_unique_indexes:
+            dataframe = dataframe.drop_duplicates(table_unique_indexes[table][1], keep="last")
+        # The whole dataframe is inserted with 1 statement, reading it directly from pandas (cast to the table's types, 
+        # since e.g. a VARCHAR column filled with -999 is read as BIGINT)
+        table_columns = get_table_columns(table)
+        select = ", ".join(f"CAST({col} AS {self.sql_types[table_columns[col]]}) AS {col}" for col in columns)
+        self.conn.register("df_staging", dataframe)
+        try:
+            self.conn.execute(self.get_upsert_statement(table, columns, f"SELECT {select} FROM df_staging"))
+        finally:
+            self.conn.unregister("df_staging")
+        self.conn.commit()
+
+    def read_sql(self, query):
+        return self.conn.execute(query).df()
+
+
+# Embedded storage backends selectable in config.yaml (database: backend)
+embedded_backends = {"sqlite": SQLiteBackend,
+                     "duckdb": DuckDBBackend}
+
+def open_storage(backend, path):
+    """
+    Returns an embedded storage backend, i.e. one of embedded_backends or "parquet" (see infotennis.routines.parquet_storage,
+    only imported if used since it needs pyarrow).
+
+    Args:
+        backend (str): Name of the backend ({"sqlite", "duckdb", "parquet"}).
+        path (str): Path of the database file (root directory of the files for "parquet").
+
+    Returns:
+        StorageBackend: The storage backend.
+    """
+    if backend == "parquet":
+        from infotennis.routines.parquet_storage import ParquetBackend
+        return ParquetBackend(path)
+    if backend not in embedded_backends:
+        raise ValueError(f"Unrecognised storage backend {backend} provided.")
+    return embedded_backends[backend](path)
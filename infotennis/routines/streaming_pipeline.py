@@ -0,0 +1,231 @@
+"""
+Streaming mode of Steps 3 and 4 of the update routine: instead of scraping every raw data file before reading them back
+from disk to process them, each match is processed and loaded into the stats tables as soon as it has been scraped.
+
+    scraper (event loop thread) --match queue--> processor (thread + worker processes) --write queue--> writer (this thread)
+
+The scraper (scrape_ATP_results_data_all()) still saves the raw data (JSON files or raw data store) for audit, and hands
+the decoded data of every match to the processor. The processor groups the matches waiting in its queue into batches
+(processed in a pool of worker processes if n_workers > 1), and the writer inserts the processed rows of each table once
+batch_size matches are pending or flush_interval seconds have passed. Both queues are bounded, so a slow writer holds
+back the processor, which holds back the scraper.
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from infotennis.processing.processing_batch import batch_functions, match_keys
+from infotennis.raw_store import RawFileIndex, load_raw_data
+from infotennis.routines.sql_functions import process_matches
+from infotennis.routines.storage import LoadedMatchIndex
+from infotennis.scrapers.scrape_match_data import scrape_ATP_results_data_all
+
+
+def process_scraped_matches(matches):
+    """
+    Processes the scraped data of a batch of matches, per data type (module-level, so it can run in worker processes).
+
+    Args:
+        matches (list): List of (metadata, raw_data, raw_rallys) of the matches, where raw_data is {data_type: raw data}
+        of the data types scraped and raw_rallys is the match's rally-analysis data (or the unreturned serves derived
+        from it) used for key-stats if it wasn't scraped with it (or None).
+
+    Returns:
+        list: List of (data_type, df_stats_processed, failed) per data type in the batch, see process_matches().
+    """
+    results = []
+    for data_type in batch_functions:
+        batch = []
+        for metadata, raw_data, raw_rallys in matches:
+            if data_type not in raw_data:
+                continue
+            if data_type == "key-stats":
+                batch.append((metadata, raw_data[data_type], raw_data.get("rally-analysis", raw_rallys)))
+            else:
+                batch.append((metadata, raw_data[data_type]))
+        if len(batch) > 0:
+            results.append((data_type, *process_matches(data_type, batch)))
+    return results
+
+
+def run_processor(match_queue, write_queue, raw_data_index, batch_size=100, n_workers=1):
+    """
+    Processes the matches of match_queue (until a None) and puts the results of each batch into write_queue.
+
+    Args:
+        match_queue (queue.Queue): Queue of (metadata, raw_data) of the scraped matches, ended by None.
+        write_queue (queue.Queue): Queue the output of process_scraped_matches() is put into.
+        raw_data_index (RawDataStore or RawFileIndex): Index of the raw data, to read the unreturned serves (or else the
+        rally-analysis data) of key-stats matches whose rally-analysis wasn't scraped in this run.
+        batch_size (int, optional): Max. matches processed together. Defaults to 100.
+        n_workers (int, optional): Number of worker processes. Defaults to 1 (process in this thread).
+    """
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers is not None and n_workers > 1 else None
+    pending = deque()
+    finished = False
+    try:
+        while not finished:
+            # Batch the matches already waiting in the queue (i.e. wait for the first one only)
+            matches = []
+            while len(matches) < batch_size:
+                try:
+                    item = match_queue.get() if len(matches) == 0 else match_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                metadata, raw_data = item
+                raw_rallys = None
+                if "key-stats" in raw_data and "rally-analysis" not in raw_data:
+                    match_key = metadata["year"], metadata["tournament_id"], metadata["match_id"]
+                    location = raw_data_index.get_derived_location(*match_key, "unret-serves")
+                    if location is None:
+                        location = raw_data_index.get_location(*match_key, "rally-analysis")
+                    if location is not None:
+                        raw_rallys = load_raw_data(location)
+                matches.append((metadata, raw_data, raw_rallys))
+            if len(matches) == 0:
+                continue
+            if executor is None:
+                write_queue.put(process_scraped_matches(matches))
+                continue
+            pending.append(executor.submit(process_scraped_matches, matches))
+            while len(pending) >= 2*n_workers or (len(pending) > 0 and pending[0].done()):
+                write_queue.put(pending.popleft().result())
+        while pending:
+            write_queue.put(pending.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def run_streaming_update(storage, df_results_update, data_types, table_stats, data_dir, data_path, insert=True, n_workers=1,
+                         batch_size=100, insert_method="insert", chunk_size=1000, raw_store=None, file_index=None,
+                         loaded_indexes=None, queue_size=100, flush_interval=5, http_cache=None, overwrite=False):
+    """
+    Scrapes, processes and loads the match statistics data of the given results in a streaming pipeline (see the module
+    docstring), i.e. Steps 3 and 4 of run_update_routines() at once.
+
+    Args:
+        storage (StorageBackend): The storage backend of the stats tables.
+        df_results_update (pandas.DataFrame): Results of the matches to scrape and load.
+        data_types (list): Types of data to update ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+        table_stats (dict): The stats table of each data type.
+        data_dir (str): The directory where the raw data files are saved.
+        data_path (str): The file path pattern of the raw data files (with <data_type> and <year> placeholders).
+        insert (bool, optional): Whether to insert the data into the tables. Defaults to True.
+        n_workers (int, optional): Number of worker processes processing the matches. Defaults to 1 (1 processor thread).
+        batch_size (int, optional): Max. matches processed together and inserted into a table together. Defaults to 100.
+        insert_method (str, optional): Bulk insert method, "insert" or "load_data" (see insert_results_data_new()). Defaults to "insert".
+        chunk_size (int, optional): Number of rows per multi-row INSERT statement. Defaults to 1000.
+        raw_store (infotennis.raw_store.RawDataStore, optional): Store the raw data is saved in instead of JSON files. Defaults to None.
+        file_index (infotennis.raw_store.RawFileIndex, optional): Index of the JSON files in data_dir. Defaults to None (a new index is built).
+        loaded_indexes (dict, optional): {data_type: LoadedMatchIndex} of the matches already loaded into each table. Defaults to
+        None (read from the tables).
+        queue_size (int, optional): Max. scraped matches waiting to be processed (and being scraped). Defaults to 100.
+        flush_interval (float, optional): Max. seconds processed rows wait to be inserted. Defaults to 5.
+        http_cache (infotennis.scrapers.http_client.HttpCache, optional): Cache of the validators of the scraped URLs. Defaults to None.
+        overwrite (bool, optional): Scrape the matches whose data is already saved or loaded again, i.e. re-poll them (with
+        http_cache, only their changed data is processed and loaded). Defaults to False.
+
+    Returns:
+        dict: {data_type: bool}, whether any data of each type was scraped (as returned by scrape_ATP_results_data_all()).
+    """
+    if file_index is None:
+        file_index = RawFileIndex(data_dir, data_path)
+    if loaded_indexes is None:
+        years_update = df_results_update.year.unique()
+        loaded_indexes = {data_type: LoadedMatchIndex(storage, table_stats[data_type], years=years_update) for data_type in data_types}
+    match_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=max(2, 2*(n_workers or 1)))
+    files_scraped = {data_type: False for data_type in data_types}
+    errors = []
+
+    async def put_match(row, raw_data):
+        # Matches that weren't played aren't added to the stats tables (as in update_stat_tables_from_files())
+        if row["player2_name"] == "Bye" or row.get("score") in ('(W())', '(R())'):
+            return
+        metadata = {"year": row["year"], "tournament_id": row["tournament_id"], "match_id": row["match_id"], "round": row["round"]}
+        # Blocks while the queue is full, without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, match_queue.put, (metadata, raw_data))
+
+    def scrape():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        try:
+            files_scraped.update(scrape_ATP_results_data_all(data_dir, data_path, df_results_update, data_types, create_output_path=True,
+                                                             overwrite=overwrite, raw_store=raw_store, file_index=file_index, loaded_indexes=loaded_indexes,
+                                                             on_match_scraped=put_match, max_matches=queue_size, http_cache=http_cache))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            match_queue.put(None)
+
+    def process():
+        try:
+            run_processor(match_queue, write_queue, raw_store if raw_store is not None else file_index, batch_size, n_workers)
+        except BaseException as e:
+            errors.append(e)
+            # Let the scraper finish (its raw data is still saved) instead of blocking on the full queue
+            while match_queue.get() is not None:
+                pass
+        finally:
+            write_queue.put(None)
+
+    # The scraper and processor run in background threads, the inserts in this thread (which owns the DB connection)
+    threads = [threading.Thread(target=scrape, daemon=True, name="infotennis-scraper"),
+               threading.Thread(target=process, daemon=True, name="infotennis-processor")]
+    for thread in threads:
+        thread.start()
+
+    pending = {data_type: [] for data_type in data_types}
+    n_pending = {data_type: 0 for data_type in data_types}
+    time_pending = {data_type: None for data_type in data_types}
+    n_stats_uploaded = {data_type: 0 for data_type in data_types}
+
+    def flush(data_type):
+        df_stats_processed = pd.concat(pending[data_type], ignore_index=True).replace({np.nan: -999})
+        if insert:
+            storage.upsert(table_stats[data_type], df_stats_processed, batch=True, method=insert_method, chunk_size=chunk_size)
+            loaded_indexes[data_type].add_frame(df_stats_processed)
+        n_stats_uploaded[data_type] += n_pending[data_type]
+        pending[data_type], n_pending[data_type], time_pending[data_type] = [], 0, None
+
+    finished = False
+    while not finished:
+        try:
+            results = write_queue.get(timeout=flush_interval)
+        except queue.Empty:
+            results = []
+        if results is None:
+            finished, results = True, []
+        for data_type, df_stats_processed, failed in results:
+            for metadata, error in failed:
+                logging.error(f"Failed to process {data_type} for {metadata['year']} {metadata['tournament_id']}-{metadata['match_id']}. Error: {error}")
+            if len(df_stats_processed) == 0:
+                continue
+            pending[data_type].append(df_stats_processed)
+            n_pending[data_type] += len(df_stats_processed.drop_duplicates(match_keys))
+            if time_pending[data_type] is None:
+                time_pending[data_type] = time.monotonic()
+        for data_type in data_types:
+            if len(pending[data_type]) > 0 and (finished or n_pending[data_type] >= batch_size
+                                                or time.monotonic() - time_pending[data_type] >= flush_interval):
+                flush(data_type)
+
+    for thread in threads:
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+
+    for data_type in data_types:
+        print(f'Inserted {data_type} for {n_stats_uploaded[data_type]} matches (streamed).')
+        logging.info(f'Inserted {data_type} for {n_stats_uploaded[data_type]} matches (streamed).')
+    return files_scraped
@@ -1,8 +1,10 @@
 # Import required libraries
+import concurrent.futures
 import datetime
 import logging
 
 import pandas as pd
+from infotennis.routines.sql_functions import get_storage
 from infotennis.scrapers.scraping_functions_atp import scrape_ATP_calendar, scrape_ATP_tournament
 
 def get_tourns_toscrape(table, conn):
@@ -12,7 +14,7 @@ def get_tourns_toscrape(table, conn):
 
     Args:
         table (str): The name of the database table where the ATP calendar data is stored.
-        conn (pymysql.connections.Connection): The MySQL database connection.
+        conn (pymysql.connections.Connection or StorageBackend): The MySQL database connection or a storage backend.
 
     Returns:
         pandas.DataFrame: A DataFrame containing tournaments that need new match data scraping and updating in the database.
@@ -32,8 +34,7 @@ def get_tourns_toscrape(table, conn):
     df_tourns_now = scrape_ATP_calendar(year_now)
 
     ### 2. Retrieve the latest ATP calendar page DataFrame from the reference table in our database
-    df_tourns_db = pd.read_sql_query(f"SELECT * FROM {table} WHERE year = {year_now}",
-    conn)
+    df_tourns_db = get_storage(conn).read_table(table, year=year_now)
 
     # Keep only tournaments with valid information/results in the scraped dataframe
     df_tourns_wres = df_tourns_now[df_tourns_now.tournament_status!=""]
@@ -52,37 +53,67 @@ def get_tourns_toscrape(table, conn):
     return df_tourns_updt
 
 
-def get_results_toscrape(table, df_tourns_updt, conn):
+def scrape_tournaments(df_tourns, n_workers=4, timeout=60):
+    """
+    Scrapes the results pages of tournaments concurrently (in a thread pool, the requests are also limited per host by
+    the shared HTTP client, see infotennis.scrapers.http_client).
+
+    Args:
+        df_tourns (pandas.DataFrame): DataFrame of the tournaments (with the columns url, tournament, tournament_id, year).
+        n_workers (int, optional): Number of results pages requested concurrently. Defaults to 4.
+        timeout (float, optional): Max. seconds to wait for each results page. Defaults to 60.
+
+    Returns:
+        list: The results DataFrame of each tournament (see scrape_ATP_tournament()), in order, or None for the tournaments
+        whose page failed or timed out (logged), so that they don't prevent the others from being updated.
+    """
+    def scrape_tournament(row):
+        try:
+            return scrape_ATP_tournament(*row[["url", "tournament", "tournament_id", "year"]], timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            logging.warning(f'Results page {row["url"]} could not be scraped within {timeout} seconds.')
+        except Exception as e:
+            logging.warning(f'Results page {row["url"]} could not be scraped. Error: {e!r}')
+        return None
+
+    rows = [row for _, row in df_tourns.iterrows()]
+    if len(rows) == 0:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(n_workers, len(rows)))) as executor:
+        return list(executor.map(scrape_tournament, rows))
+
+
+def get_results_toscrape(table, df_tourns_updt, conn, n_workers=4, timeout=60):
     """
     Retrieve tournament results to scrape based on the tournaments with updated information.
 
     Args:
         table (str): The name of the database table where the ATP results data is stored.
         df_tourns_updt (pandas.DataFrame): DataFrame containing tournaments with updated information.
-        conn (pymysql.connections.Connection): The MySQL database connection.
+        conn (pymysql.connections.Connection or StorageBackend): The MySQL database connection or a storage backend.
+        n_workers (int, optional): Number of results pages scraped concurrently. Defaults to 4.
+        timeout (float, optional): Max. seconds to wait for each results page. Defaults to 60.
 
     Returns:
         pandas.DataFrame: A DataFrame containing tournament results to scrape and update in the database.
 
     This function retrieves tournament results that need to be scraped and updated in the database. It is based on the
-    list of tournaments with updated information, and for each of these tournaments, it scrapes the latest match results
-    and identifies differences between the new data and the existing database records.
+    list of tournaments with updated information: the latest match results of these tournaments are scraped concurrently,
+    and the differences between the new data and the existing database records are identified (in a single anti-join
+    for all tournaments).
 
-    The function checks for the availability of new results and returns a DataFrame containing the results to be updated
-    in the database.
+    A tournament whose results page can't be scraped (e.g. website outage, network issues, timeout) is logged and 
+    skipped, the results of the other tournaments are still returned.
     """
     # Get the current year from system time
     year_now = datetime.datetime.now().year
 
     ### 2. Retrieve the latest ATP results page DataFrame from the reference table in our database
-    df_results_db = pd.read_sql_query(f"SELECT * FROM {table} WHERE year = {year_now}",
-    conn)
+    df_results_db = get_storage(conn).read_table(table, year=year_now)
 
-    list_df_results_updt = []
-
-    # Iterate through every tournament with updated results
-    for i, row in df_tourns_updt.iterrows():
-        df_results_newtourn = scrape_ATP_tournament(*row[["url", "tournament", "tournament_id", "year"]])
+    list_df_results_new = []
+    # Scrape the results pages of every tournament with updated results
+    for (_, row), df_results_newtourn in zip(df_tourns_updt.iterrows(), scrape_tournaments(df_tourns_updt, n_workers, timeout)):
         # Check if the scraper returned a valid dataframe or not,
         # possible reason for failure, website outage, network issues etc.
         if df_results_newtourn is None:
@@ -90,26 +121,30 @@ def get_results_toscrape(table, df_tourns_updt, conn):
             continue
         df_results_newtourn.insert(3, "category", [row["category"]]*len(df_results_newtourn))
         df_results_newtourn.insert(4, "match_id", df_results_newtourn.url.apply(lambda x: x.split('/')[-1] if x != None else None))
-
-        # Get anti-join between 2 DFs to identify rows that are different btn the 2 DFs..
-        outer_join = df_results_newtourn.replace("",None).merge(df_results_db[df_results_db.tournament_id == row['tournament_id']].iloc[:,1:], indicator=True, how='outer')
-        anti_join = outer_join[~(outer_join._merge == 'both')]
-
-        # "left_only" are those tournaments with updated information in their row compared with the existing table in the db
-        df_results_updt = anti_join[anti_join["_merge"] == "left_only"]
-        # Keep only columns that were in df_tourns
-        df_results_updt = df_results_updt.loc[:, [col for col in df_results_newtourn.columns]]
-
-        if len(df_results_updt) == 0:
+        # Latest matches are listed first on the page
+        list_df_results_new.append((row, df_results_newtourn.iloc[::-1]))
+
+    if len(list_df_results_new) == 0:
+        return pd.DataFrame()
+    df_results_new = pd.concat([df for _, df in list_df_results_new], ignore_index=True).replace("", None)
+    tournament_ids = [row["tournament_id"] for row, _ in list_df_results_new]
+
+    # Get anti-join between the new results and those in the db (of the same tournaments) to identify rows that are 
+    # different btn the 2 DFs, a left join keeps the order of the new results
+    df_results_db = df_results_db[df_results_db.tournament_id.isin(tournament_ids)].drop(columns=['id'], errors='ignore')
+    left_join = df_results_new.merge(df_results_db, indicator=True, how='left')
+
+    # "left_only" are those results with updated information in their row compared with the existing table in the db
+    df_results_update = left_join[left_join["_merge"] == "left_only"]
+    # Keep only columns that were in df_results_new
+    df_results_update = df_results_update.loc[:, [col for col in df_results_new.columns]]
+
+    n_results_updt = df_results_update.tournament_id.value_counts()
+    for row, df_results_newtourn in list_df_results_new:
+        n_results = n_results_updt.get(df_results_newtourn.tournament_id.iloc[0], 0) if len(df_results_newtourn) > 0 else 0
+        if n_results == 0:
             logging.info(f'No new results found for {row["tournament"]}-{row["year"]}.')
-            continue
         else:
-            logging.info(f'{len(df_results_updt)} new results found for {row["tournament"]}-{row["year"]}.')
-        
-        list_df_results_updt.append(df_results_updt.iloc[::-1])
-    
-    if len(list_df_results_updt) == 0:
-        df_results_update = pd.DataFrame()
-    else:
-        df_results_update = pd.concat(list_df_results_updt)
-    return df_results_update
\ No newline at end of file
+            logging.info(f'{n_results} new results found for {row["tournament"]}-{row["year"]}.')
+
+    return df_results_update
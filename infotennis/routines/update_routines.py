@@ -8,32 +8,18 @@ import time
 import warnings
 warnings.filterwarnings("ignore")
 
-from dotenv import load_dotenv
 from func_timeout import func_timeout, FunctionTimedOut
 import pandas as pd
-import pymysql
-import yaml
 
-from infotennis.scrapers.scrape_match_data import scrape_ATP_results_data
-from infotennis.routines.sql_functions import insert_results_data_new, update_stat_tables_from_files
+from infotennis.config import get_config
+from infotennis.raw_store import RawDataStore, RawFileIndex
+from infotennis.scrapers.http_client import HttpCache
+from infotennis.scrapers.scrape_match_data import scrape_ATP_results_data_all
+from infotennis.routines.sql_functions import MySQLBackend, get_storage, update_stat_tables_from_files
+from infotennis.routines.storage import LoadedMatchIndex, open_storage
+from infotennis.routines.streaming_pipeline import run_streaming_update
 from infotennis.routines.update_calendar_results import get_tourns_toscrape, get_results_toscrape
 
-# Load config file into dict 'configs'
-with open("./config.yaml", "r") as yamlfile:
-    configs = yaml.safe_load(yamlfile)
-
-data_dir = configs["output"]['dir']
-data_path = configs["output"]['path']
-log_dir = configs["log"]['dir']
-
-# Configure settings
-load_dotenv()
-host = os.getenv('MYSQL_HOST')
-port = os.getenv('MYSQL_PORT')
-user = os.getenv('MYSQL_USER')
-password = os.getenv('DATABASE_PASSWORD')
-database_name = os.getenv('DATABASE_NAME')
-
 table_cal = "atp_calendars"
 table_results = "atp_results"
 table_stats = {"key-stats": "atp_key_stats",
@@ -41,42 +27,37 @@ table_stats = {"key-stats": "atp_key_stats",
             "stroke-analysis": "atp_stroke_analysis",
             "court-vision": "atp_court_vision"}
 
-# Create a connection to the given database
-conn = pymysql.connect(
-    host=host,
-    port=int(3306),
-    user="root",
-    passwd=password,
-    db=database_name,
-    charset='utf8mb4')
-
-# This is the object used to interact with the database
-# Do not create an instance of a Cursor yourself. Call connections.Connection.cursor().
-mycursor = conn.cursor()
-
-# Log File Settings (create a new log file per month)
-log_file = log_dir+f"infotennis_log_{datetime.datetime.now().year}{datetime.datetime.now().month}.log"
-logging.basicConfig(filename=log_file,
-                    filemode='a',
-                    format='%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
-                    datefmt='%H:%M:%S',
-                    level=logging.INFO,
-                    force=True)
-# Suppress "WDM INFO ====== WebDriver manager ======" messages
-os.environ['WDM_LOG_LEVEL'] = '0'
-
-
-def run_update_routines(conn, database_name, data_dir, data_path, data_type="all", insert=True):
+
+def run_update_routines(conn, database_name, data_dir, data_path, data_type="all", insert=True, n_workers=1, batch_size=100,
+                        insert_method="insert", chunk_size=1000, store_dir=None, streaming=False, queue_size=100, flush_interval=5,
+                        http_cache_path=None, results_workers=4, results_timeout=60):
     """
     Run the ATP infotennis update routine, which includes multiple steps for updating the given database.
 
     Args:
-        conn (pymysql.connections.Connection): The MySQL database connection.
+        conn (pymysql.connections.Connection or StorageBackend): The MySQL database connection or a storage backend
+        (e.g. SQLiteBackend, see infotennis.routines.storage).
         database_name (str): The name of the database where tables will be updated.
         data_dir (str): The directory where raw match statistics data is stored.
         data_path (str): The path to the data files, including placeholders for data type and year.
         data_type (str, optional): The type of data to update (e.g., "all", "key-stats", "rally-analysis", "stroke-analysis", "court-vision"). Defaults to "all".
         insert (bool, optional): Whether to insert data into the database. Defaults to True.
+        n_workers (int, optional): Number of worker processes used to process the raw data files in Step 4. Defaults to 1.
+        batch_size (int, optional): Number of matches processed and inserted together in Step 4. Defaults to 100.
+        insert_method (str, optional): Bulk insert method for Step 4, "insert" or "load_data". Defaults to "insert".
+        chunk_size (int, optional): Number of rows per multi-row INSERT statement. Defaults to 1000.
+        store_dir (str, optional): Directory of a compressed raw data store (infotennis.raw_store.RawDataStore) used to save and read
+        the raw data in Steps 3 and 4 instead of JSON files. Defaults to None (JSON files in data_dir).
+        streaming (bool, optional): Process and load each match as soon as it is scraped in Step 3 (see 
+        infotennis.routines.streaming_pipeline) instead of reading the saved raw data back in Step 4. Defaults to False.
+        queue_size (int, optional): Max. scraped matches waiting to be processed in streaming mode. Defaults to 100.
+        flush_interval (float, optional): Max. seconds processed rows wait to be inserted in streaming mode. Defaults to 5.
+        http_cache_path (str, optional): File of the HTTP cache (infotennis.scrapers.http_client.HttpCache) of the validators of 
+        the scraped URLs. With a cache, Step 3 re-polls the matches whose data is already saved (requested conditionally, so 
+        unchanged data isn't downloaded, decoded or loaded again). Defaults to None (no cache, saved data isn't scraped again).
+        results_workers (int, optional): Number of tournament results pages scraped concurrently in Step 2. Defaults to 4.
+        results_timeout (float, optional): Max. seconds to wait for each results page in Step 2, the tournaments whose page 
+        fails or times out are skipped (logged). Defaults to 60.
 
     This function runs the ATP infotennis update routine, which includes multiple steps for updating the database:
 
@@ -92,15 +73,20 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
     print(f"ATP infotennis update routine has started at {time_utc} (UTC).")
     logging.info(f"===================================================================")
     logging.info(f"ATP infotennis update routine has started at {time_utc} (UTC).")
+    storage = get_storage(conn, database_name)
+    raw_store = RawDataStore(store_dir) if store_dir else None
+    # Index of the raw data JSON files, shared by Steps 3 and 4 for all data types
+    file_index = RawFileIndex(data_dir, data_path)
+    http_cache = HttpCache(http_cache_path) if http_cache_path else None
 
     ### Step 1
     print(f"Running Routine Step 1: Get and update calendar table.")
     st = time.time()
-    df_tourns_updt = get_tourns_toscrape(table_cal, conn)
+    df_tourns_updt = get_tourns_toscrape(table_cal, storage)
 
     # Update the respective DB table with the updated calendar
     print(f"Inserting new calendar data.")
-    insert_results_data_new(mycursor, conn, database_name, table_cal, df_tourns_updt)
+    storage.upsert(table_cal, df_tourns_updt, batch=True, chunk_size=chunk_size)
     et = time.time()
     elapsed_time = et - st
     print(f"Completed Routine Step 1 in {elapsed_time} seconds.")
@@ -108,12 +94,8 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
     ### Step 2
     print(f"Running Routine Step 2: Get and update results table.")
     st = time.time()
-    try:
-        #breakpoint()
-        df_results_update = func_timeout(300, get_results_toscrape, args=(table_results, df_tourns_updt, conn))
-    except FunctionTimedOut:
-        print ("Step 2 query for df_results_update could not complete within 5 min")
-        return
+    # The results pages are scraped concurrently, each with a timeout (a slow tournament is skipped, not the whole step)
+    df_results_update = get_results_toscrape(table_results, df_tourns_updt, storage, n_workers=results_workers, timeout=results_timeout)
     #df_results_update = get_results_toscrape(table_results, df_tourns_updt, conn)
     if len(df_results_update) == 0:
         print("No new ATP match results to add.")
@@ -125,7 +107,7 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
     # Update the respective DB table with the updated calendar
     #breakpoint()
     try:
-        func_timeout(30, insert_results_data_new, args=(mycursor, conn, database_name, table_results, df_results_update))
+        func_timeout(30, storage.upsert, args=(table_results, df_results_update), kwargs={"batch": True, "chunk_size": chunk_size})
     except FunctionTimedOut:
         print ("Step 2 query for insert_results_data_new could not complete within 30 seconds")
         return
@@ -149,10 +131,26 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
         else:
             data_types = [data_type]
 
-    files_scraped = {}
-    for d_type in data_types:
-        files_scraped[f"{d_type}"] = scrape_ATP_results_data(data_dir, data_path, df_results_update, data_type=d_type,\
-                                                            create_output_path=True)
+    # Index of the matches already loaded into each stats table (of the years to update), shared by Steps 3 and 4
+    years_update = df_results_update.year.unique()
+    loaded_indexes = {d_type: LoadedMatchIndex(storage, table_stats[d_type], years=years_update) for d_type in data_types}
+    # With the HTTP cache, the matches whose data is already saved are re-polled: only their changed data is saved again
+    # (and removed from loaded_indexes, so that Step 4 loads it again)
+    repoll = http_cache is not None
+
+    if streaming:
+        # Each match is processed and loaded as soon as it has been scraped (the raw data is still saved)
+        print(f"Streaming the scraped match statistics data into the tables.")
+        files_scraped = run_streaming_update(storage, df_results_update, data_types, table_stats, data_dir, data_path, insert,
+                                             n_workers=n_workers, batch_size=batch_size, insert_method=insert_method, chunk_size=chunk_size,
+                                             raw_store=raw_store, file_index=file_index, loaded_indexes=loaded_indexes,
+                                             queue_size=queue_size, flush_interval=flush_interval, http_cache=http_cache,
+                                             overwrite=repoll)
+    else:
+        # All data types of every match are scraped in a single pass (1 event loop and HTTP client)
+        files_scraped = scrape_ATP_results_data_all(data_dir, data_path, df_results_update, data_types, create_output_path=True,
+                                                    overwrite=repoll, raw_store=raw_store, file_index=file_index, loaded_indexes=loaded_indexes,
+                                                    http_cache=http_cache)
     et = time.time()
     elapsed_time = et - st
     print(f"Completed Routine Step 3 in {elapsed_time} seconds.")
@@ -160,11 +158,17 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
     ### Step 4 
     print(f"Running Routine Step 4: Process and update match statistics tables.")
     st = time.time()
+    # In streaming mode, this only loads the raw data saved (but not loaded) in earlier runs, the matches streamed in 
+    # Step 3 are already in loaded_indexes
     #breakpoint()
     for d_type in data_types:
         if files_scraped[f"{d_type}"]:
             table_stat = table_stats[f"{d_type}"]
-            update_stat_tables_from_files(df_results_update, d_type, database_name, table_stat, mycursor, conn, data_dir, data_path, insert)
+            update_stat_tables_from_files(df_results_update, d_type, database_name, table_stat, None, storage, data_dir, data_path, insert,
+                                          batch_size=batch_size, n_workers=n_workers, insert_method=insert_method, chunk_size=chunk_size,
+                                          raw_store=raw_store, file_index=file_index, loaded_index=loaded_indexes[d_type])
+            # Merge the small files written per batch (Parquet backend only)
+            storage.compact(table_stat)
 
     et = time.time()
     elapsed_time = et - st
@@ -173,13 +177,81 @@ def run_update_routines(conn, database_name, data_dir, data_path, data_type="all
     logging.info(f"ATP infotennis update routine has completed at {str(pd.Timestamp.utcnow())} (UTC).")
     logging.info(f"===================================================================")   
 
+def main(config_path="./config.yaml"):
+    """
+    Runs the update routine with the settings of a config file and the MySQL server configured in .env (or the embedded
+    storage backend of the config), i.e. python -m infotennis.routines.update_routines. The config is read, the database
+    connected and the log file set up here, not when the module is imported.
+
+    Args:
+        config_path (str, optional): Path of the config file. Defaults to "./config.yaml".
+    """
+    from dotenv import load_dotenv
+    import pymysql
+
+    config = get_config(config_path)
+    data_dir = config["output"]['dir']
+    data_path = config["output"]['path']
+    store_dir = config["output"].get('store_dir')
+    http_cache_path = config.get_setting("http", "cache_path")
+    log_dir = config["log"]['dir']
+    results_workers = config.get_setting("results", "workers", 4)
+    results_timeout = config.get_setting("results", "timeout", 60)
+    n_workers = config.get_setting("processing", "workers", 1)
+    batch_size = config.get_setting("processing", "batch_size", 100)
+    streaming = config.get_setting("processing", "streaming", False)
+    queue_size = config.get_setting("processing", "queue_size", 100)
+    flush_interval = config.get_setting("processing", "flush_interval", 5)
+    insert_method = config.get_setting("database", "insert_method", "insert")
+    chunk_size = config.get_setting("database", "insert_chunk_size", 1000)
+    db_backend = config.get_setting("database", "backend", "mysql")
+    db_path = config.get_setting("database", "path", "./data/infotennis.db")
+
+    # Configure settings
+    load_dotenv()
+    password = os.getenv('DATABASE_PASSWORD')
+    database_name = os.getenv('DATABASE_NAME')
+
+    if db_backend == "mysql":
+        # Create a connection to the given database
+        conn = pymysql.connect(
+            host=os.getenv('MYSQL_HOST'),
+            port=int(3306),
+            user="root",
+            passwd=password,
+            db=database_name,
+            charset='utf8mb4',
+            local_infile=(insert_method == "load_data"))
+
+        # This is the object used to interact with the database
+        # Do not create an instance of a Cursor yourself. Call connections.Connection.cursor().
+        mycursor = conn.cursor()
+        storage = MySQLBackend(conn, database_name, mycursor)
+    else:
+        # Embedded database file or Parquet files (e.g. for running the pipeline locally without a MySQL server)
+        storage = open_storage(db_backend, db_path)
+
+    # Log File Settings (create a new log file per month)
+    log_file = log_dir+f"infotennis_log_{datetime.datetime.now().year}{datetime.datetime.now().month}.log"
+    logging.basicConfig(filename=log_file,
+                        filemode='a',
+                        format='%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
+                        datefmt='%H:%M:%S',
+                        level=logging.INFO,
+                        force=True)
+
+    run_update_routines(storage, database_name, data_dir, data_path, data_type="all", insert=True, n_workers=n_workers, batch_size=batch_size,
+                        insert_method=insert_method, chunk_size=chunk_size, store_dir=store_dir, streaming=streaming,
+                        queue_size=queue_size, flush_interval=flush_interval, http_cache_path=http_cache_path,
+                        results_workers=results_workers, results_timeout=results_timeout)
+
+
 if __name__ == "__main__":
     try:
-        run_update_routines(conn, database_name, data_dir, data_path, data_type="all", insert=True)
+        main()
     except:
         import traceback, pdb, sys
         traceback.print_exc()
         print ('')
         pdb.post_mortem()
         sys.exit(1)
-    
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Table schemas of the processed ATP data, shared by the processing functions and the database routines.
+"""
+import re
+
+import pandas as pd
+
+
+table_dtypes_all = {   
+    "atp_calendars": "year INT, tournament VARCHAR(255), tournament_id VARCHAR(32), category VARCHAR(64), location VARCHAR(255),\
+                date_start VARCHAR(32), tournament_status VARCHAR(32), draw VARCHAR(32), surface VARCHAR(64), finance VARCHAR(32),\
+                winner VARCHAR(255), url VARCHAR(255)",
+    "atp_results": "year INT, tournament VARCHAR(255), tournament_id VARCHAR(255), category VARCHAR(255), match_id VARCHAR(255),\
+                round VARCHAR(255), player1_name VARCHAR(255), player1_id VARCHAR(255), player1_seed VARCHAR(255),\
+                player1_nation VARCHAR(255), player2_name VARCHAR(255), player2_id VARCHAR(255), player2_seed VARCHAR(255),\
+                player2_nation VARCHAR(255), score VARCHAR(255), url VARCHAR(255), court_vision INT",
+    "key_stats": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT, set_n INT,\
+                player_id VARCHAR(32), opponent_id VARCHAR(32), serve_rating INT, aces INT, serves_unreturned INT, double_faults INT,\
+                serve1 VARCHAR(32), serve1_pct FLOAT, serve1_pts_won VARCHAR(32), serve1_pts_won_pct FLOAT, serve2_pts_won VARCHAR(32),\
+                serve2_pts_won_pct FLOAT, break_points_saved VARCHAR(32), break_points_saved_pct FLOAT, service_games_played INT,\
+                return_rating INT, serve1_return_pts_won VARCHAR(32), serve1_return_pts_won_pct FLOAT, serve2_return_pts_won VARCHAR(32),\
+                serve2_return_pts_won_pct FLOAT, break_points_converted VARCHAR(32), break_points_converted_pct FLOAT, break_points_faced INT,\
+                return_games_played INT, net_points_won VARCHAR(32), net_points_won_pct FLOAT, winners INT, unforced_errors INT,\
+                service_points_won VARCHAR(32), service_points_won_pct FLOAT, return_points_won VARCHAR(32), return_points_won_pct FLOAT,\
+                total_points_won VARCHAR(32), total_points_won_pct FLOAT, max_speed INT, serve1_avg_speed INT, serve2_avg_speed INT",
+    "rally_analysis": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT,\
+                shot_number VARCHAR(32), outcome VARCHAR(32), player_id VARCHAR(32), opponent_id VARCHAR(32), crucial_point TINYINT,\
+                score VARCHAR(32), hand VARCHAR(32), point_end_type VARCHAR(32), point_id VARCHAR(32), serve INT, serve_dir VARCHAR(32),\
+                court_side VARCHAR(32), serve_speed INT, set_n INT, game VARCHAR(32), point VARCHAR(32), point_key BIGINT, shot_type VARCHAR(32),\
+                p1_break_point TINYINT, p2_break_point TINYINT, p1_net_point TINYINT, p2_net_point TINYINT, tie_break TINYINT,\
+                set_point TINYINT",
+    "stroke_analysis": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), sets_completed INT, set_n INT,\
+                player_id VARCHAR(32), opponent_id VARCHAR(32), hand VARCHAR(32), shot_type VARCHAR(32), winners INT, errors INT,\
+                unforced_errors INT, others INT",
+    "court_vision": "year INT, tournament_id VARCHAR(32), match_id VARCHAR(32), round VARCHAR(32), p1_id VARCHAR(32), p2_id VARCHAR(32),\
+                point_id VARCHAR(32), server_id VARCHAR(32), scorer_id VARCHAR(32), receiver_id VARCHAR(32), ball_speed_kmh FLOAT,\
+                rally_length INT, point_end_type VARCHAR(32), stroke_type VARCHAR(32), serve_type VARCHAR(32), court VARCHAR(32),\
+                set_n INT, game INT, point INT, serve INT, point_key BIGINT, hand VARCHAR(32), break_point TINYINT, break_point_converted TINYINT,\
+                p1_sets_w INT, p2_sets_w INT, p1_set_score INT, p2_set_score INT, p1_game_score VARCHAR(32), p2_game_score VARCHAR(32),\
+                is_tiebreak INT, stroke_idx INT, x_hit FLOAT, y_hit FLOAT, z_hit FLOAT, x_peak_pre FLOAT, y_peak_pre FLOAT,\
+                z_peak_pre FLOAT, x_net FLOAT, y_net FLOAT, z_net FLOAT, x_bounce FLOAT, y_bounce FLOAT, z_bounce FLOAT, x_peak_post FLOAT,\
+                y_peak_post FLOAT, z_peak_post FLOAT"
+}
+
+# Database tables of the ATP data
+db_tables = ["atp_results", "atp_calendars", "atp_key_stats", "atp_rally_analysis", "atp_stroke_analysis", "atp_court_vision"]
+
+# Unique index (name, columns) on the identifying fields of each table's rows (atp_results has none)
+table_unique_indexes = {
+    "atp_calendars": ("year_tourn_id", ["year", "tournament_id"]),
+    "atp_key_stats": ("unique_stat_row", ["year", "tournament_id", "match_id", "set_n", "player_id"]),
+    "atp_stroke_analysis": ("unique_stat_row", ["year", "tournament_id", "match_id", "set_n", "player_id", "hand", "shot_type"]),
+    "atp_rally_analysis": ("unique_stat_row", ["year", "tournament_id", "match_id", "point_id"]),
+    "atp_court_vision": ("unique_stat_row", ["year", "tournament_id", "match_id", "point_id", "stroke_idx"]),
+}
+
+# Non-unique indexes (name, columns) of the tables read in point order, i.e. on their point_key (see get_point_key())
+table_indexes = {
+    "atp_rally_analysis": ("point_order", ["year", "tournament_id", "match_id", "point_key"]),
+    "atp_court_vision": ("point_order", ["year", "tournament_id", "match_id", "point_key", "stroke_idx"]),
+}
+
+# Bit offset of each field of a point in its point_key, (set, game, point, serve) from the most to least significant
+point_key_shifts = {"set_n": 40, "game": 24, "point": 8, "serve": 0}
+
+def get_table_dtypes(table: str):
+    """
+    Returns the column definitions in table_dtypes_all of a database table (e.g. "atp_key_stats" -> table_dtypes_all["key_stats"]).
+
+    Args:
+        table (str): Table name, see get_table_columns().
+
+    Returns:
+        str: The table's column definitions (e.g. "year INT, tournament_id VARCHAR(32), ...").
+    """
+    table = table.replace("-", "_")
+    if table not in table_dtypes_all:
+        table = "_".join(table.split("_")[1:])
+    return table_dtypes_all[table]
+
+# Pandas dtypes used for each SQL column type when typing processed dataframes
+sql_pandas_dtypes = {"INT": "Int64", "TINYINT": "Int64", "BIGINT": "Int64", "FLOAT": "float64", "VARCHAR": "object"}
+
+def get_table_columns(table: str):
+    """
+    Returns the columns and their SQL types for a table in table_dtypes_all.
+
+    Args:
+        table (str): Table name, either the key in table_dtypes_all (e.g. "key_stats") or the database table
+        name (e.g. "atp_key_stats"). Data types (e.g. "key-stats") are also accepted.
+
+    Returns:
+        dict: Column names mapped to their SQL type without length (e.g. {"year": "INT", "match_id": "VARCHAR", ...}).
+    """
+    return {col: sql_type for col, sql_type in re.findall(r"(\w+)\s+([A-Z]+)", get_table_dtypes(table))}
+
+def apply_table_dtypes(df: pd.DataFrame, table: str):
+    """
+    Casts the columns of a processed dataframe to the pandas dtypes matching their SQL type in table_dtypes_all.
+    INT/TINYINT/BIGINT columns become nullable Int64 (non-numeric values such as "" become <NA>), FLOAT columns float64 and
+    VARCHAR columns str (missing values are kept as None). Columns not in the table schema are left unchanged.
+
+    Args:
+        df (pandas.DataFrame): Processed dataframe (e.g. returned by process_key_stats()).
+        table (str): Table name or data type, see get_table_columns().
+
+    Returns:
+        df (pandas.DataFrame): The dataframe with typed columns.
+    """
+    columns = get_table_columns(table)
+    df_typed = {}
+    for col in df.columns:
+        sql_type = columns.get(col)
+        values = df[col]
+        if sql_type in ["INT", "TINYINT", "BIGINT"]:
+            if values.dtype != bool:
+                values = pd.to_numeric(values, errors="coerce").round()
+            values = values.astype(sql_pandas_dtypes[sql_type])
+        elif sql_type == "FLOAT":
+            values = pd.to_numeric(values, errors="coerce").astype(sql_pandas_dtypes[sql_type])
+        elif sql_type == "VARCHAR":
+            values = pd.Series([None if pd.isna(v) else str(v) for v in values], index=df.index, dtype=object)
+        df_typed[col] = values
+    return pd.DataFrame(df_typed, index=df.index)
+
+def get_point_key(set_n, game, point, serve):
+    """
+    Returns the point_key of points, i.e. their set, game, point and serve numbers packed into 1 int64 (see
+    point_key_shifts), which sorts the points of a match in the order they were played (e.g. game 10 after game 2,
+    unlike the string game numbers of the point IDs). The points of e.g. a set are the keys in the range
+    [set_n << 40, (set_n + 1) << 40). Missing or non-numeric numbers give a missing key.
+
+    Args:
+        set_n (pandas.Series): Set numbers of the points.
+        game (pandas.Series): Game numbers of the points (in the set, < 65536).
+        point (pandas.Series): Point numbers of the points (in the game, < 65536).
+        serve (pandas.Series): Serve numbers of the points (< 256).
+
+    Returns:
+        pandas.Series: The points' keys (nullable Int64).
+    """
+    fields = {"set_n": set_n, "game": game, "point": point, "serve": serve}
+    point_key = 0
+    for field, values in fields.items():
+        point_key = point_key + pd.to_numeric(values, errors="coerce").astype("Int64") * (1 << point_key_shifts[field])
+    return point_key
+
+def split_point_key(point_key):
+    """
+    Returns the (set_n, game, point, serve) numbers of point keys, see get_point_key().
+
+    Args:
+        point_key (pandas.Series or int): Point keys.
+
+    Returns:
+        tuple: The set, game, point and serve numbers (of the same type as point_key).
+    """
+    numbers, upper_shift = [], None
+    for shift in point_key_shifts.values():
+        values = point_key // (1 << shift)
+        numbers.append(values if upper_shift is None else values % (1 << (upper_shift - shift)))
+        upper_shift = shift
+    return tuple(numbers)
@@ -0,0 +1,113 @@
+"""
+Decryption of the encrypted ATP (infosys) match statistics payloads, i.e. {"lastModified": <ms timestamp>, "response":
+<base64 AES-CBC ciphertext>} where the key and IV are derived from lastModified (see formatDate()).
+
+Credit for the algorithm: Github/Stackoverflow user Gabjauf, see
+https://stackoverflow.com/questions/73735401/scraping-an-api-returns-what-looks-like-encrypted-data
+
+The cipher of each lastModified is derived once and cached (the payloads of a tournament share few lastModified values),
+the PKCS7 padding is stripped from the plaintext bytes which are parsed directly (with orjson if it is installed, see
+infotennis.scrapers.responses), and decode_batch() decrypts many payloads in a pool of worker processes.
+"""
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+from functools import lru_cache
+
+import cryptography.hazmat.backends
+import cryptography.hazmat.primitives.ciphers
+import cryptography.hazmat.primitives.ciphers.algorithms
+import cryptography.hazmat.primitives.ciphers.modes
+
+from infotennis.scrapers.responses import json_loads
+
+
+def base_repr(number, base):
+    """
+    Returns the representation of a non-negative integer in the given base (2-36) in lower case, like
+    numpy.base_repr(number, base).lower() (without importing numpy).
+    """
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    if number == 0:
+        return "0"
+    res = []
+    while number:
+        number, rem = divmod(number, base)
+        res.append(digits[rem])
+    return "".join(reversed(res))
+
+
+def formatDate(t):
+    """
+    Returns a formatted form of the 'lastModified' key from the encrypted data object.
+    """
+    t_tstamp = datetime.datetime.utcfromtimestamp(t/1000)
+    n = t_tstamp.day
+    r = int(str(n if n >= 10 else "0" + str(n))[::-1])
+    i = t_tstamp.year
+    a = int(str(i)[::-1])
+    o = base_repr(int(str(t), base=16), 36) + base_repr((i + a) * (n + r), 24)
+    s = len(o)
+    if s < 14:
+        o += "0" * (14 - s)
+    elif s > 14:
+        o = o[:14]
+    return "#" + o + "$"
+
+
+@lru_cache(maxsize=1024)
+def get_cipher(last_modified):
+    """
+    Returns the AES-CBC cipher of a payload's lastModified (cached), whose key is formatDate(lastModified) and IV its
+    upper case.
+    """
+    e = formatDate(last_modified)
+    return cryptography.hazmat.primitives.ciphers.Cipher(
+        cryptography.hazmat.primitives.ciphers.algorithms.AES(e.encode()),
+        cryptography.hazmat.primitives.ciphers.modes.CBC(e.upper().encode()),
+        backend=cryptography.hazmat.backends.default_backend()
+    )
+
+
+def unpad(plaintext):
+    """
+    Strips the PKCS7 padding of a decrypted plaintext (bytes). If the padding isn't valid PKCS7, every occurrence of
+    the last byte is removed instead (the previous behaviour of decode()).
+    """
+    n_pad = plaintext[-1] if len(plaintext) > 0 else 0
+    if 0 < n_pad <= 16 and plaintext.endswith(bytes([n_pad])*n_pad):
+        return plaintext[:-n_pad]
+    return plaintext.replace(plaintext[-1:], b"")
+
+
+def decode(data):
+    """
+    Decrypting algorithm for encrypted ATP match statistics data.
+
+    Args:
+        data (dict): The encrypted payload with the keys "lastModified" and "response".
+
+    Returns:
+        dict: The decrypted (raw) data.
+    """
+    decryptor = get_cipher(data['lastModified']).decryptor()
+    plaintext = decryptor.update(base64.b64decode(data['response'])) + decryptor.finalize()
+    return json_loads(unpad(plaintext))
+
+
+def decode_batch(payloads, n_workers=1, chunk_size=8):
+    """
+    Decrypts many payloads, in a pool of worker processes if n_workers > 1.
+
+    Args:
+        payloads (list): List of encrypted payloads (see decode()).
+        n_workers (int, optional): Number of worker processes. Defaults to 1 (decode serially in this process).
+        chunk_size (int, optional): Number of payloads sent to a worker at a time. Defaults to 8.
+
+    Returns:
+        list: The decrypted data of each payload, in order.
+    """
+    if n_workers is None or n_workers <= 1 or len(payloads) <= 1:
+        return [decode(data) for data in payloads]
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(payloads))) as executor:
+        return list(executor.map(decode, payloads, chunksize=chunk_size))
@@ -0,0 +1,342 @@
+"""
+HTTP client shared by the scrapers: pooled keep-alive connections (1 aiohttp session), a token bucket rate limit and a
+concurrency limit per host, and retries with exponential backoff. The settings are read from the "http" section of
+config.yaml (see http_settings_default for the defaults).
+
+Async scrapers use an HttpClient as an async context manager, e.g.
+
+    async with HttpClient() as client:
+        text = await client.get_text(url)
+
+and blocking scrapers use fetch_text(), which runs the requests on a shared client in a background event loop.
+Polled URLs can be requested conditionally with the validators of an HttpCache.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from infotennis.config import get_config
+from infotennis.scrapers.responses import json_loads
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
+
+http_settings_default = {
+    "connections": 30,              # Max. open connections in total
+    "connections_per_host": 15,     # Max. open connections per host
+    "keepalive_timeout": 30,        # Seconds an idle connection is kept open
+    "timeout": 30,                  # Seconds per request
+    "attempts": 3,                  # Max. attempts per request (at least 1)
+    "backoff_min": 2,               # Min./max. seconds waited between attempts (doubled per attempt)
+    "backoff_max": 10,
+    "retry_statuses": [429, 500, 502, 503, 504],
+    # Limits per host ("default" for hosts not listed): token bucket of rate requests/second with burst tokens, and
+    # max. concurrent requests
+    "hosts": {"default": {"rate": 5, "burst": 5, "concurrency": 15}},
+}
+
+def get_http_settings(settings=None):
+    """
+    Returns the HTTP client settings, i.e. http_settings_default updated with the "http" section of config.yaml
+    and the given settings.
+
+    Args:
+        settings (dict, optional): Settings overriding the config. Defaults to None.
+
+    Returns:
+        dict: The settings.
+    """
+    http_config = get_config().get("http") or {}
+    http_settings = {**http_settings_default, **http_config, **(settings or {})}
+    http_settings["hosts"] = {**http_settings_default["hosts"], **(http_config.get("hosts") or {}),
+                              **(settings or {}).get("hosts", {})}
+    return http_settings
+
+
+class HttpStatusError(Exception):
+    """
+    Raised for an HTTP error response (status >= 400) once all attempts have failed.
+    """
+    def __init__(self, url, status):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: acquire() waits until a token is available, tokens are refilled at rate per second
+    up to burst tokens.
+
+    Args:
+        rate (float): Tokens (requests) per second.
+        burst (int): Max. tokens, i.e. requests that can be made at once after being idle.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.time_last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                time_now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (time_now - self.time_last)*self.rate)
+                self.time_last = time_now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens)/self.rate)
+
+
+class HttpClient:
+    """
+    Async HTTP client with connection pooling, per-host rate/concurrency limits and retries (see the module docstring).
+
+    Args:
+        settings (dict, optional): Settings overriding the "http" section of config.yaml. Defaults to None.
+    """
+    def __init__(self, settings=None):
+        self.settings = get_http_settings(settings)
+        self.session = None
+        self.buckets = {}
+        self.semaphores = {}
+        # No. of requests sent (incl. retries) and retried
+        self.n_requests = 0
+        self.n_retries = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def open(self):
+        # aiohttp is imported when the first client is opened (not by the modules only using e.g. HttpCache)
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.settings["connections"], limit_per_host=self.settings["connections_per_host"],
+                                         keepalive_timeout=self.settings["keepalive_timeout"], ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=HEADERS,
+                                             timeout=aiohttp.ClientTimeout(total=self.settings["timeout"]))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def get_host_limits(self, host):
+        """
+        Returns the (token bucket, semaphore) of a host, created from its settings the first time.
+        """
+        if host not in self.buckets:
+            limits = self.settings["hosts"].get(host, self.settings["hosts"]["default"])
+            self.buckets[host] = TokenBucket(limits["rate"], limits["burst"])
+            self.semaphores[host] = asyncio.Semaphore(limits["concurrency"])
+        return self.buckets[host], self.semaphores[host]
+
+    def get_backoff(self, attempt, retry_after=None):
+        """
+        Returns the seconds to wait before the next attempt (the server's Retry-After if given).
+        """
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.settings["backoff_max"])
+        backoff = min(self.settings["backoff_min"]*2**(attempt - 1), self.settings["backoff_max"])
+        return backoff*random.uniform(0.5, 1)
+
+    async def request(self, method, url, headers=None, **kwargs):
+        """
+        Sends a request (retrying connection errors, timeouts and the retry_statuses) and returns the response.
+
+        Args:
+            method (str): HTTP method, e.g. "GET".
+            url (str): URL of the request.
+            headers (dict, optional): Headers added to the default headers. Defaults to None.
+            kwargs: Other arguments of aiohttp.ClientSession.request().
+
+        Returns:
+            tuple: (status, headers, body (bytes)) of the response, e.g. status 304 with an empty body for a conditional
+            request (see HttpCache) of unmodified content.
+        """
+        import aiohttp
+        bucket, semaphore = self.get_host_limits(urlsplit(url).netloc)
+        n_attempts = max(1, int(self.settings["attempts"]))
+        for attempt in range(1, n_attempts + 1):
+            retry_after = None
+            try:
+                async with semaphore:
+                    await bucket.acquire()
+                    self.n_requests += 1
+                    async with self.session.request(method, url, headers=headers, **kwargs) as resp:
+                        body = await resp.read()
+                        if resp.status < 400:
+                            return resp.status, resp.headers, body
+                        if resp.status not in self.settings["retry_statuses"] or attempt == n_attempts:
+                            raise HttpStatusError(url, resp.status)
+                        retry_after = resp.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == n_attempts:
+                    raise
+                logging.info(f"Request {url} failed (attempt {attempt}/{n_attempts}). Error: {e!r}")
+            self.n_retries += 1
+            await asyncio.sleep(self.get_backoff(attempt, retry_after))
+
+    async def get_bytes(self, url, headers=None):
+        return (await self.request("GET", url, headers=headers))[2]
+
+    async def get_text(self, url, headers=None, encoding="utf-8"):
+        return (await self.get_bytes(url, headers=headers)).decode(encoding)
+
+    async def get_json(self, url, headers=None):
+        """
+        Returns the JSON response of a URL, parsed from the response bytes (see infotennis.scrapers.responses).
+        """
+        return json_loads(await self.get_bytes(url, headers=headers))
+
+
+class HttpCache:
+    """
+    Cache of the validators of fetched URLs, for conditional requests: the ETag and Last-Modified headers of the last 
+    response of every URL, and the version of its content (e.g. the "lastModified" field of the infosys payloads). Only
+    validators are kept, the data itself is saved by the scrapers.
+
+    Args:
+        path (str, optional): File to persist the cache in (1 JSON line per update, the last line of a URL is valid). 
+        Defaults to None (not persisted).
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as fp:
+                line = ""
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Incomplete last line of an interrupted update
+                        continue
+                    self.entries[entry.pop("url")] = entry
+            # End an incomplete last line so that the next update is appended on a new line
+            if line != "" and not line.endswith("\n"):
+                with open(path, "a") as fp:
+                    fp.write("\n")
+
+    def get(self, url):
+        """
+        Returns the validators {"etag", "last_modified", "version"} of a URL, or None if it isn't cached.
+        """
+        return self.entries.get(url)
+
+    def get_conditional_headers(self, url):
+        """
+        Returns the headers of a conditional request of a URL (If-None-Match/If-Modified-Since), empty if it isn't cached.
+        """
+        entry = self.entries.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, version):
+        """
+        Returns whether the content version of a URL is the same as the cached one.
+        """
+        entry = self.entries.get(url)
+        return entry is not None and version is not None and entry.get("version") == version
+
+    def update(self, url, etag=None, last_modified=None, version=None):
+        """
+        Sets the validators of a URL (after its content has been saved).
+        """
+        entry = {"etag": etag, "last_modified": last_modified, "version": version}
+        if self.entries.get(url) == entry:
+            return
+        self.entries[url] = entry
+        if self.path is not None:
+            if os.path.dirname(self.path) != "":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as fp:
+                fp.write(json.dumps({"url": url, **entry}) + "\n")
+
+
+# Shared client (and its event loop thread) of fetch_text()
+shared_client = {"loop": None, "client": None}
+shared_client_lock = threading.Lock()
+
+def get_shared_client():
+    """
+    Returns the shared HttpClient and the background event loop it runs on (started the first time).
+    """
+    with shared_client_lock:
+        if shared_client["client"] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True, name="infotennis-http").start()
+            client = HttpClient()
+            asyncio.run_coroutine_threadsafe(client.open(), loop).result()
+            shared_client["loop"], shared_client["client"] = loop, client
+            atexit.register(close_shared_client)
+    return shared_client["client"], shared_client["loop"]
+
+def close_shared_client():
+    """
+    Closes the shared HttpClient (registered to run at exit).
+    """
+    with shared_client_lock:
+        if shared_client["client"] is not None:
+            asyncio.run_coroutine_threadsafe(shared_client["client"].close(), shared_client["loop"]).result(timeout=5)
+            shared_client["loop"].call_soon_threadsafe(shared_client["loop"].stop)
+            shared_client["loop"], shared_client["client"] = None, None
+
+def wait_result(future, timeout=None):
+    """
+    Waits for the result of a request sent to the shared client's event loop, cancelling it if it isn't done within
+    timeout seconds (concurrent.futures.TimeoutError is raised).
+    """
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+def fetch_json(url, headers=None, timeout=None):
+    """
+    Blocking GET request of a JSON URL with the shared HttpClient.
+
+    Args:
+        url (str): URL of the request.
+        headers (dict, optional): Headers added to the default headers. Defaults to None.
+        timeout (float, optional): Max. seconds to wait for the response (including retries). Defaults to None (no limit
+        other than the client's timeout and retries).
+
+    Returns:
+        dict or list: The parsed response.
+    """
+    client, loop = get_shared_client()
+    return wait_result(asyncio.run_coroutine_threadsafe(client.get_json(url, headers=headers), loop), timeout)
+
+def fetch_text(url, headers=None, timeout=None):
+    """
+    Blocking GET request of a URL with the shared HttpClient.
+
+    Args:
+        url (str): URL of the request.
+        headers (dict, optional): Headers added to the default headers. Defaults to None.
+        timeout (float, optional): Max. seconds to wait for the response (including retries). Defaults to None (no limit
+        other than the client's timeout and retries).
+
+    Returns:
+        str: The response body.
+    """
+    client, loop = get_shared_client()
+    return wait_result(asyncio.run_coroutine_threadsafe(client.get_text(url, headers=headers), loop), timeout)
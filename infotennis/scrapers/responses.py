@@ -0,0 +1,58 @@
+"""
+Parsing of the scrapers' HTTP responses. JSON responses (the infosys payloads, the ATP tournaments calendar) are parsed
+from the response bytes directly, with orjson if it is installed (pip install orjson) and the json module otherwise,
+instead of passing their text through an HTML parser.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """
+    Parses a JSON document (bytes or str) with orjson if it is installed, falling back to the json module for documents
+    orjson rejects (e.g. NaN values).
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def is_json(body, content_type=None):
+    """
+    Returns whether a response body is JSON, from its Content-Type header or else its first character.
+
+    Args:
+        body (bytes): The response body.
+        content_type (str, optional): The Content-Type header of the response. Defaults to None.
+
+    Returns:
+        bool: Whether the body is JSON.
+    """
+    if content_type is not None and "json" in content_type.lower():
+        return True
+    start = body[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+    return start[:1] in (b"{", b"[")
+
+
+def parse_response(body, content_type=None, encoding="utf-8"):
+    """
+    Parses a response body: JSON bodies (see is_json()) into Python objects, any other body into text.
+
+    Args:
+        body (bytes): The response body.
+        content_type (str, optional): The Content-Type header of the response. Defaults to None.
+        encoding (str, optional): Encoding of non-JSON bodies. Defaults to "utf-8".
+
+    Returns:
+        dict, list or str: The parsed JSON or the text of the body.
+    """
+    if is_json(body, content_type):
+        return json_loads(body)
+    return body.decode(encoding)
@@ -0,0 +1,181 @@
+"""
+Parser of the ATP tournament results pages (e.g. https://www.atptour.com/en/scores/archive/australian-open/580/2024/results).
+
+The page is parsed once with lxml, and each match block (div.match inside the div.atp_accordion-item of each day) is read
+in a single walk over its elements, collecting its round, stats link, scores, players and flags, into 1 dict per match with
+the same fields (and values) as the previous BeautifulSoup-based parsing of scrape_ATP_tournament().
+"""
+from lxml import etree
+
+URL_ATP = "https://www.atptour.com"
+
+# Columns of the dicts returned by parse_match_element()
+results_columns = ["round", "player1_name", "player1_id", "player1_seed", "player1_nation", "player2_name", "player2_id",
+                   "player2_seed", "player2_nation", "score", "url", "court_vision"]
+
+html_parser = etree.HTMLParser()
+
+
+def has_class(elem, class_name):
+    """
+    Returns whether an element has the given class (like BeautifulSoup's class_ argument).
+    """
+    classes = elem.get("class")
+    return classes is not None and class_name in classes.split()
+
+
+def get_text(elem):
+    """
+    Returns the text of an element and its descendants, like BeautifulSoup's Tag.text.
+    """
+    return "".join(elem.itertext())
+
+
+def get_string(elem):
+    """
+    Returns the text of an element if it has a single (text or element) child, like BeautifulSoup's Tag.string.
+    """
+    n_children = (1 if elem.text else 0) + sum(1 + (1 if child.tail else 0) for child in elem)
+    if n_children != 1:
+        return None
+    return elem.text if elem.text else get_string(elem[0])
+
+
+def move_bracketed_parts(lst):
+    """
+    Moves the bracketed tiebreak score of every set score to its end, e.g. "7(5)6" -> "76(5)".
+    """
+    new_lst = []
+    for item in lst:
+        bracketed_part = ""
+        remaining_part = item
+        if '(' in item and ')' in item:
+            bracket_start = item.index('(')
+            bracket_end = item.index(')')
+            bracketed_part = item[bracket_start:bracket_end+1]
+            remaining_part = item[:bracket_start] + item[bracket_end+1:]
+        new_item = remaining_part + bracketed_part
+        new_lst.append(new_item)
+    return new_lst
+
+
+def parse_player_scores(elem_scores):
+    """
+    Returns the set scores of a player (e.g. ["6", "7(5)"]) from their div.scores element.
+    """
+    player_scores = []
+    score = None
+    for elem_set in elem_scores.iter("div"):
+        if not has_class(elem_set, "score-item"):
+            continue
+        spans = [get_text(elem_span) for elem_span in elem_set.iter("span")]
+        if len(spans) == 0:
+            continue
+        if len(spans) == 1:
+            score = spans[0]
+        elif len(spans) == 2:
+            score = f"{spans[0]}({spans[1]})"
+        player_scores.append(score)
+    return player_scores
+
+
+def get_flag(elem_svg):
+    """
+    Returns the nation code of a flag icon, i.e. <svg><use href=".../flags.svg#flag-XXX"></svg>.
+    """
+    return elem_svg.find(".//use").get("href").split('/')[-1].split('#')[1].replace('flag-', '')
+
+
+def parse_match_element(elem_match):
+    """
+    Parses a match block (div.match) of a results page.
+
+    Args:
+        elem_match (lxml.etree._Element): The match element.
+
+    Returns:
+        dict: The match's round, players (names, IDs, seeds, nations), score and match stats URL (see results_columns).
+    """
+    # Single walk over the match's elements
+    elem_round, elem_cta = None, None
+    elems_scores, elems_names, elems_svgs = [], [], []
+    for elem in elem_match.iter("div", "strong", "svg"):
+        if elem.tag == "div":
+            classes = elem.get("class")
+            if classes is None:
+                continue
+            classes = classes.split()
+            if "scores" in classes:
+                elems_scores.append(elem)
+            if "name" in classes:
+                elems_names.append(elem)
+            if elem_cta is None and "match-cta" in classes:
+                elem_cta = elem
+        elif elem.tag == "strong":
+            if elem_round is None:
+                elem_round = elem
+        else:
+            elems_svgs.append(elem)
+
+    round_ = get_text(elem_round).split(" - ")[0].replace("-", "")
+    round_ = " ".join([word.capitalize() for word in round_.split()])
+
+    url = ""
+    if elem_cta is not None:
+        for elem_a in elem_cta.iter("a"):
+            text = get_string(elem_a)
+            if text and ("Match Stats" in text or "Stats" in text):
+                url = URL_ATP + elem_a.get("href")
+                break
+
+    score_list = [f"{i}{j}" for i, j in zip(parse_player_scores(elems_scores[0]), parse_player_scores(elems_scores[1]))]
+    score = " ".join(move_bracketed_parts(score_list))
+
+    names, seeds, ids = [], [], []
+    for elem_name in elems_names:
+        elem_pinfo = next(elem_name.iter("a", "p"))
+        # Text before the first child element if any, else the first child's
+        name = elem_pinfo.text if elem_pinfo.text is not None else get_text(elem_pinfo[0])
+        names.append(" ".join(name.split()))
+        seeds.append(get_text(next(elem_name.iter("span"))).strip("()"))
+        ids.append(elem_pinfo.get("href").split("/")[-2] if elem_pinfo.get("href") is not None else None)
+
+    if len(names) == 2:
+        player_1, player_2 = names
+        player_1_seed, player_2_seed = seeds
+        player_1_id, player_2_id = [player_id if player_id is not None else "" for player_id in ids]
+        try:
+            player_1_flag, player_2_flag = [get_flag(elem_svg) for elem_svg in elems_svgs]
+        except (AttributeError, IndexError, ValueError): # A player's flag can be missing (e.g. 2024/540/qs006)
+            player_1_flag = player_2_flag = "-"
+    elif len(names) == 4:
+        player_1, player_2 = names[0] + ", " + names[1], names[2] + ", " + names[3]
+        player_1_seed, player_2_seed = seeds[::2]
+        ids = [player_id if player_id is not None else "-" for player_id in ids]
+        player_1_id, player_2_id = ids[0] + ", " + ids[1], ids[2] + ", " + ids[3]
+        player_1a_flag, player_1b_flag, player_2a_flag, player_2b_flag = [get_flag(elem_svg) for elem_svg in elems_svgs]
+        player_1_flag, player_2_flag = player_1a_flag + ", " + player_1b_flag, player_2a_flag + ", " + player_2b_flag
+    else:
+        raise ValueError(f"Expected 2 or 4 players in a match, found {len(names)}.")
+
+    return {"round": round_, "player1_name": player_1, "player1_id": player_1_id, "player1_seed": player_1_seed, "player1_nation": player_1_flag,
+            "player2_name": player_2, "player2_id": player_2_id, "player2_seed": player_2_seed, "player2_nation": player_2_flag, "score": score,
+            "url": url, "court_vision": 0}
+
+
+def parse_results_page(html):
+    """
+    Parses all matches of a tournament results page.
+
+    Args:
+        html (str or bytes): The page's HTML.
+
+    Returns:
+        list: 1 dict per match (see parse_match_element()), in the order of the page.
+    """
+    root = etree.fromstring(html, html_parser)
+    if root is None:
+        return []
+    elems_days = [elem for elem in root.iter("div") if has_class(elem, "atp_accordion-item")]
+    return [parse_match_element(elem_match) for elem_day in elems_days for elem_match in elem_day.iter("div")
+            if has_class(elem_match, "match")]
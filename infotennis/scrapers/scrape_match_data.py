@@ -1,4 +1,3 @@
-HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
 """
 Scraping Functions/Methods for ATP Match Level Data (valid for Antwerp 2021 matches onwards)
 - Match Stats
@@ -12,107 +11,54 @@ last tested on ATP sites on 7/11/2023
 Heavy lifting here is all thanks to Github/Stackoverflow user Gabjauf who provided the solution at:
 https://stackoverflow.com/questions/73735401/scraping-an-api-returns-what-looks-like-encrypted-data
 
-If the cypher method changes, then the above method will no longer work.
+If the cypher method changes, then the above method will no longer work (see infotennis.scrapers.decoding).
 """
-import base64
 import datetime
+import inspect
 import json
 import logging
 import os
-import sys
-import warnings
 import asyncio
-import aiohttp
-from aiohttp import ClientSession
-from time import sleep
-from functools import partial
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import numpy as np
-import pandas as pd
-import yaml
-from bs4 import BeautifulSoup
-import cryptography.hazmat.backends
-import cryptography.hazmat.primitives.ciphers
-import cryptography.hazmat.primitives.ciphers.algorithms
-import cryptography.hazmat.primitives.ciphers.modes
-import cryptography.hazmat.primitives.padding
-
-
-# # Suppress "WDM INFO ====== WebDriver manager ======" messages
-# os.environ['WDM_LOG_LEVEL'] = '0'
-# logging.getLogger('WDM').setLevel(logging.NOTSET)
-
-# Load config file into dict 'configs'
-script_dir = os.path.dirname(__file__)
-config_path = os.path.join(script_dir, "../../config.yaml")
-#with open("./config.yaml", "r") as yamlfile:
-with open(config_path, "r") as yamlfile:
-    configs = yaml.safe_load(yamlfile)
+from typing import TYPE_CHECKING
 
-##############################################
-# Decrypting Utilities
-def formatDate(t):
-    """
-    Returns a formatted form of the 'lastModified' key from the encrypted data object.
-    """
-    #e = datetime.datetime.now().utcoffset().total_seconds() / 60       # ChatGPT suggestion but not needed
-    #t = t + datetime.timedelta(minutes=e)                              # ChatGPT suggestion but not needed
-    
-    t_tstamp = datetime.datetime.utcfromtimestamp(t/1000)
-    n = t_tstamp.day
-    r = int(str(n if n >= 10 else "0" + str(n))[::-1])
-    i = t_tstamp.year
-    a = int(str(i)[::-1])
-    o = np.base_repr(int(str(t), base=16), 36).lower() + np.base_repr((i + a) * (n + r), 24).lower()
-    s = len(o)
-    if s < 14:
-        o += "0" * (14 - s)
-    elif s > 14:
-        o = o[:14]
-    return "#" + o + "$"
-
-
-def decode(data):
-    """
-    Decrypting algorithm for encrypted ATP match statistics data.
+from infotennis.config import get_config
+from infotennis.scrapers.decoding import decode
+# Re-exported for backward compatibility (formatDate was defined in this module before it moved to decoding)
+from infotennis.scrapers.decoding import formatDate  # noqa: F401
+from infotennis.scrapers.http_client import HttpCache, HttpClient
+from infotennis.scrapers.responses import parse_response
 
-    Credit: Github/Stackoverflow user Gabjauf
-    """
-    e = formatDate(data['lastModified'])
-    n = e.encode()
-    r = e.upper().encode()
-    cipher = cryptography.hazmat.primitives.ciphers.Cipher(
-        cryptography.hazmat.primitives.ciphers.algorithms.AES(n),
-        cryptography.hazmat.primitives.ciphers.modes.CBC(r),
-        backend=cryptography.hazmat.backends.default_backend()
-    )
-    decryptor = cipher.decryptor()
-    i = decryptor.update(base64.b64decode(data['response'])) + decryptor.finalize()
-    unpadder = cryptography.hazmat.primitives.padding.PKCS7(128).unpadder()
-    #return json.loads(unpadder.update(i) + unpadder.finalize().decode('utf-8'))
-    return json.loads(i.decode("utf-8").replace(i.decode("utf-8")[-1],""))
 
+# pandas is only needed for the type hints (the results DataFrames are passed in)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Settings of config.yaml (read when first accessed)
+config = get_config()
 
 ##############################################
 # Functions Start Here
 
-# Async version of scrape_ATP_match_data with retry/backoff and logging
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type(Exception)
-)
+# Async version of scrape_ATP_match_data with logging (retry/backoff and rate limits are handled by the HttpClient)
 async def scrape_ATP_match_data_async(
-    session: ClientSession,
+    client: HttpClient,
     year: int,
     tourn_id: str,
     match_id: str,
     data_type: str,
-    log_list: list
+    log_list: list,
+    cache: HttpCache = None
 ) -> None:
+    """
+    Scrapes and decodes the match data of the given type, returns (raw_data, log_entry). The validators of the response 
+    (ETag, Last-Modified and the payload's lastModified) are returned in log_entry["validators"], to be cached with
+    HttpCache.update() once the data is saved. If cache is given, the request is conditional on the URL's cached 
+    validators: if the server answers 304 Not Modified or the payload has the same lastModified as cached, the data 
+    isn't decoded and raw_data is None.
+    """
     match_id = match_id.upper()
     try:
-        link = configs['atp'][data_type] % {'year': year, 'tourn_id': tourn_id, 'match_id': match_id}
+        link = config['atp'][data_type] % {'year': year, 'tourn_id': tourn_id, 'match_id': match_id}
     except Exception as e:
         raise ValueError(f"Invalid data_type argument provided. Error {e}")
 
@@ -120,14 +66,23 @@ async def scrape_ATP_match_data_async(
     time_utc = datetime.datetime.utcnow().isoformat()
     log_entry = {"url": link, "params": params, "time_utc": time_utc, "success": False}
     try:
-        async with session.get(link, headers=HEADERS, timeout=30) as resp:
-            resp.raise_for_status()
-            text = await resp.text()
-            pageSoup = BeautifulSoup(text, 'html.parser')
-            results_json = json.loads(str(pageSoup))
-            raw_data = decode(results_json)
-            log_entry["success"] = True
-            return raw_data, log_entry
+        headers = cache.get_conditional_headers(link) if cache is not None else None
+        status, resp_headers, body = await client.request("GET", link, headers=headers)
+        log_entry["success"] = True
+        if status == 304:
+            log_entry["not_modified"] = True
+            return None, log_entry
+        # The payload is parsed from the response bytes (not through an HTML parser)
+        results_json = parse_response(body, resp_headers.get("Content-Type"))
+        if not isinstance(results_json, dict):
+            raise ValueError(f"Response isn't an encrypted JSON payload: {str(results_json)[:100]!r}")
+        if cache is not None and cache.is_unchanged(link, results_json.get("lastModified")):
+            log_entry["not_modified"] = True
+            return None, log_entry
+        raw_data = decode(results_json)
+        log_entry["validators"] = {"etag": resp_headers.get("ETag"), "last_modified": resp_headers.get("Last-Modified"),
+                                   "version": results_json.get("lastModified")}
+        return raw_data, log_entry
     except Exception as e:
         log_entry["success"] = False
         log_entry["error"] = str(e)
@@ -136,92 +91,176 @@ async def scrape_ATP_match_data_async(
         log_list.append(log_entry)
 
 
-def scrape_ATP_results_data(
+def get_round_short(round_n):
+    """
+    Returns the short form of a round name used in the raw data file names, e.g. "Round Of 16" -> "R16",
+    "Quarterfinals" -> "QF".
+    """
+    if "Round Of" in round_n:
+        return round_n.split(" ")[0][0] + round_n.split(" ")[-1]
+    elif "Round Qualifying" in round_n:
+        return "Q" + round_n.split(" ")[0][0]
+    elif "Round" in round_n:
+        return "".join([s[0] for s in round_n.split(" ")])
+    elif round_n == "Quarterfinals" or round_n == "Quarter-Finals":
+        return "QF"
+    elif round_n == "Semifinals" or round_n == "Semi-Finals":
+        return "SF"
+    elif round_n == "Final" or round_n == "Finals":
+        return "F"
+    return round_n
+
+
+def scrape_ATP_results_data_all(
     data_dir: str,
     data_path: str,
-    df_results: pd.DataFrame,
-    data_type: str,
+    df_results: "pd.DataFrame",
+    data_types: list,
     create_output_path=False,
-    overwrite=False
+    overwrite=False,
+    raw_store=None,
+    file_index=None,
+    loaded_indexes=None,
+    on_match_scraped=None,
+    max_matches=None,
+    http_cache=None
 ):
     """
-    Asynchronous scraping of ATP match statistics data of the specified type and save as JSON files.
-    Uses asyncio, aiohttp, semaphore (max 15), tenacity for retry/backoff, and logs each API call.
+    Asynchronous scraping of ATP match statistics data of several types, saved as JSON files (or added to raw_store).
+    All (match, data_type) requests are scheduled in 1 event loop on 1 shared HttpClient, i.e. the data types of a match
+    are fetched concurrently while the per-host rate/concurrency limits of the client (the "http" section of config.yaml)
+    apply to all of them. Matches are scheduled in the order of df_results, and every data type is requested for every
+    match (the court_vision column of the results isn't a reliable indicator of court-vision data). Each API call is logged.
+
+    Args:
+        data_dir (str): The directory where the JSON files are saved.
+        data_path (str): The file path pattern of the JSON files (with <data_type> and <year> placeholders).
+        df_results (pandas.DataFrame): Results (with year, tournament_id, match_id, round and player names) 
+        of the matches to scrape.
+        data_types (list): Types of data to scrape ({"key-stats", "rally-analysis", "stroke-analysis", "court-vision"}).
+        create_output_path (bool, optional): Create the output directories if they don't exist. Defaults to False.
+        overwrite (bool, optional): Scrape matches whose data already exists. Defaults to False.
+        raw_store (infotennis.raw_store.RawDataStore, optional): Store the data is added to instead of JSON files. Defaults to None.
+        file_index (infotennis.raw_store.RawFileIndex, optional): Index the saved JSON files are added to. Defaults to None.
+        loaded_indexes (dict, optional): {data_type: infotennis.routines.storage.LoadedMatchIndex} of the matches already
+        loaded into each data type's table, which aren't scraped again (without overwrite). Matches whose data is scraped
+        again are removed from them. Defaults to None.
+        on_match_scraped (callable, optional): Called as on_match_scraped(row, raw_data) once all requests of a match have 
+        finished, where row is the match's result (dict) and raw_data is {data_type: raw data} of the data types scraped 
+        successfully, e.g. to start processing the match while the others are still being scraped. If it returns an
+        awaitable (e.g. a coroutine function), it is awaited before the match is done. Defaults to None.
+        max_matches (int, optional): Max. matches being scraped (incl. their on_match_scraped call) at a time, e.g. to apply
+        backpressure from a slow consumer of on_match_scraped. Defaults to None (no limit besides the HttpClient's).
+        http_cache (infotennis.scrapers.http_client.HttpCache, optional): Cache of the validators of the scraped URLs. With 
+        overwrite, data already saved is requested conditionally, and isn't saved or passed to on_match_scraped again 
+        (i.e. re-processed) if it is unchanged. Defaults to None.
+
+    Returns:
+        dict: {data_type: bool}, whether any data of each type was scraped.
     """
     import nest_asyncio
     nest_asyncio.apply()
 
-    if not os.path.exists(data_dir):
+    if raw_store is None and not os.path.exists(data_dir):
         print("Output Data Directory does not exist")
-        logging.error(f"Output Data Directory does not exist for saving ATP {data_type} data files.")
-        return False
+        logging.error(f"Output Data Directory does not exist for saving ATP {', '.join(data_types)} data files.")
+        return {data_type: False for data_type in data_types}
 
-    # Prepare tasks
     rows = df_results.to_dict(orient="records")
-    semaphore = asyncio.Semaphore(15)
+    loaded_indexes = loaded_indexes or {}
     log_list = []
-    success_N = 0
-
-    async def process_row(row, session):
-        nonlocal success_N
-        year = row["year"]
-        tourn_id = row["tournament_id"]
-        match_id = row["match_id"]
-        round_n = row["round"]
-        player1 = row["player1_name"]
-        player2 = row["player2_name"]
-        court_vision = row.get("court_vision", None)
-        local_data_path = data_path.replace("<data_type>", data_type).replace("<year>", str(year))
-        full_path = data_dir + local_data_path
-
-        if match_id is None:
-            logging.info(f"{year} {tourn_id} {player1}-{player2} has no data found for {data_type}!")
-            return
+    success_N = {data_type: 0 for data_type in data_types}
+
+    def get_output_dir(year, data_type):
+        """
+        Returns the output directory of a data type and year, or None if it doesn't exist (and isn't created).
+        """
+        full_path = data_dir + data_path.replace("<data_type>", data_type).replace("<year>", str(year))
         if not os.path.exists(full_path):
-            if create_output_path:
-                logging.info(f"Output Data Path was created for saving ATP {data_type} data files.")
-                os.makedirs(full_path, exist_ok=True)
-            else:
+            if not create_output_path:
                 logging.error(f"Output Data Path does not exist for saving ATP {data_type} data files.")
-                return
-        if data_type == "court_vision" and court_vision != 1:
-            return
-        player1_fn = player1.replace(" ", "-")
-        player2_fn = player2.replace(" ", "-")
-        if "Round Of" in round_n:
-            round_short = round_n.split(" ")[0][0] + round_n.split(" ")[-1]
-        elif "Round Qualifying" in round_n:
-            round_short = "Q" + round_n.split(" ")[0][0]
-        elif "Round" in round_n:
-            round_short = "".join([s[0] for s in round_n.split(" ")])
-        elif round_n == "Quarterfinals" or round_n == "Quarter-Finals":
-            round_short = "QF"
-        elif round_n == "Semifinals" or round_n == "Semi-Finals":
-            round_short = "SF"
-        elif round_n == "Final" or round_n == "Finals":
-            round_short = "F"
+                return None
+            logging.info(f"Output Data Path was created for saving ATP {data_type} data files.")
+            os.makedirs(full_path, exist_ok=True)
+        return full_path
+
+    async def process_job(client, row, data_type):
+        """
+        Scrapes and saves 1 data type of a match, returns the raw data (None if it wasn't scraped).
+        """
+        year, tourn_id, match_id = row["year"], row["tournament_id"], row["match_id"]
+        player1, player2 = row["player1_name"], row["player2_name"]
+        loaded_index = loaded_indexes.get(data_type)
+        if not overwrite and loaded_index is not None and loaded_index.contains(year, tourn_id, match_id):
+            logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} {data_type} data is already loaded into {loaded_index.table}!")
+            return None
+        # The data is only requested conditionally (see scrape_ATP_match_data_async()) if it is saved already, i.e. 
+        # when polling matches again with overwrite
+        data_exists = False
+        out_file = f"{tourn_id}_{get_round_short(row['round'])}_{player1.replace(' ', '-')}-vs-{player2.replace(' ', '-')}"\
+                   f"_{year}_{str(match_id).upper()}_{data_type}.json"
+        if raw_store is not None:
+            data_exists = raw_store.exists(year, tourn_id, match_id, data_type)
+            if not overwrite and data_exists:
+                logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} {data_type} data already exists in {raw_store.root}!")
+                return None
+        else:
+            full_path = get_output_dir(year, data_type)
+            if full_path is None:
+                return None
+            out_file_path = os.path.join(full_path, out_file)
+            data_exists = os.path.exists(out_file_path)
+            if not overwrite and data_exists:
+                logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} {data_type} file already exists in {full_path}!")
+                return None
+        try:
+            raw_data, log_entry = await scrape_ATP_match_data_async(client, year, tourn_id, match_id, data_type, log_list,
+                                                                    cache=http_cache if data_exists else None)
+        except Exception as e:
+            logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} Failed or no Data found for {data_type}! Error: {e}")
+            return None
+        if raw_data is None:
+            logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} {data_type} data is unchanged.")
+            return None
+        if raw_store is not None:
+            raw_store.put(year, tourn_id, match_id, data_type, raw_data, name=out_file)
         else:
-            round_short = round_n
-        out_file = f"{tourn_id}_{round_short}_{player1_fn}-vs-{player2_fn}_{year}_{str(match_id).upper()}_{data_type}.json"
-        out_file_path = os.path.join(full_path, out_file)
-        if not overwrite and os.path.exists(out_file_path):
-            logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} {data_type} file already exists in {full_path}!")
+            with open(out_file_path, 'w') as fp:
+                json.dump(raw_data, fp)
+            if file_index is not None:
+                file_index.add(out_file_path)
+        if http_cache is not None:
+            http_cache.update(log_entry["url"], **log_entry["validators"])
+        # Changed data of a match that is already loaded has to be loaded again
+        if loaded_index is not None:
+            loaded_index.discard(year, tourn_id, match_id)
+        success_N[data_type] += 1
+        return raw_data
+
+    async def process_match(client, row):
+        """
+        Scrapes all data types of a match concurrently.
+        """
+        if row["match_id"] is None:
+            logging.info(f"{row['year']} {row['tournament_id']} {row['player1_name']}-{row['player2_name']} has no data found for {', '.join(data_types)}!")
             return
-        # Async scrape with semaphore
-        async with semaphore:
-            try:
-                raw_data, log_entry = await scrape_ATP_match_data_async(session, year, tourn_id, match_id, data_type, log_list)
-                with open(out_file_path, 'w') as fp:
-                    json.dump(raw_data, fp)
-                success_N += 1
-                await asyncio.sleep(np.random.uniform(1, 3))
-            except Exception as e:
-                logging.info(f"{year} {tourn_id} {match_id} {player1}-{player2} Failed or no Data found for {data_type}! Error: {e}")
+        results = await asyncio.gather(*[process_job(client, row, data_type) for data_type in data_types])
+        raw_data = {data_type: result for data_type, result in zip(data_types, results) if result is not None}
+        if on_match_scraped is not None and len(raw_data) > 0:
+            callback_result = on_match_scraped(row, raw_data)
+            if inspect.isawaitable(callback_result):
+                await callback_result
 
     async def main():
-        async with aiohttp.ClientSession() as session:
-            tasks = [process_row(row, session) for row in rows]
-            await asyncio.gather(*tasks)
+        async with HttpClient() as client:
+            if max_matches is None:
+                await asyncio.gather(*[process_match(client, row) for row in rows])
+                return
+            semaphore = asyncio.Semaphore(max_matches)
+            async def process_match_limited(row):
+                async with semaphore:
+                    await process_match(client, row)
+            await asyncio.gather(*[process_match_limited(row) for row in rows])
 
     asyncio.run(main())
 
@@ -229,9 +268,37 @@ def scrape_ATP_results_data(
     for entry in log_list:
         logging.info(f"API_CALL_LOG: {json.dumps(entry)}")
 
-    print(f"Successfully scraped and added {success_N} files to {data_path.replace('<data_type>', data_type)}.")
-    logging.info(f"Successfully scraped and added {success_N} files to {data_path.replace('data_type>', data_type)}/.")
-    if success_N > 0:
-        return True
-    else:
-        return False
+    for data_type in data_types:
+        print(f"Successfully scraped and added {success_N[data_type]} files to {data_path.replace('<data_type>', data_type)}.")
+        logging.info(f"Successfully scraped and added {success_N[data_type]} files to {data_path.replace('<data_type>', data_type)}/.")
+    return {data_type: success_N[data_type] > 0 for data_type in data_types}
+
+
+def scrape_ATP_results_data(
+    data_dir: str,
+    data_path: str,
+    df_results: "pd.DataFrame",
+    data_type: str,
+    create_output_path=False,
+    overwrite=False,
+    raw_store=None,
+    file_index=None,
+    loaded_index=None,
+    http_cache=None
+):
+    """
+    Asynchronous scraping of ATP match statistics data of the specified type and save as JSON files.
+    Uses asyncio and the shared HttpClient (connection pooling, per-host rate limits and retry/backoff as set in the "http"
+    section of config.yaml), and logs each API call.
+    If raw_store (infotennis.raw_store.RawDataStore) is given, the data is added to the store instead of saved as JSON files.
+    Saved JSON files are added to file_index (infotennis.raw_store.RawFileIndex) if given. Matches in loaded_index
+    (infotennis.routines.storage.LoadedMatchIndex), i.e. already loaded into the data type's table, aren't scraped again.
+    To scrape several data types, use scrape_ATP_results_data_all() which fetches them in a single pass over the matches.
+    With http_cache (infotennis.scrapers.http_client.HttpCache), data that is saved already is only downloaded and decoded
+    again if it has changed (e.g. when polling ongoing matches with overwrite).
+    """
+    files_scraped = scrape_ATP_results_data_all(data_dir, data_path, df_results, [data_type], create_output_path=create_output_path,
+                                                overwrite=overwrite, raw_store=raw_store, file_index=file_index,
+                                                loaded_indexes={data_type: loaded_index} if loaded_index is not None else None,
+                                                http_cache=http_cache)
+    return files_scraped[data_type]
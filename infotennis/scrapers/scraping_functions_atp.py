@@ -2,50 +2,53 @@
 # Created 29/3/2023 by Gerald Lim
 # Web-Scraping Functions for the ATP Website (a.o. Feb 2024)
 import datetime
-import json
 import calendar
+import concurrent.futures
 import logging
-import os
-import requests
-import urllib
 
-from bs4 import BeautifulSoup
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.edge.options import Options
-from selenium.common.exceptions import NoSuchElementException
-from webdriver_manager.microsoft  import EdgeChromiumDriverManager
-import yaml
 
+from infotennis.config import get_config
+from infotennis.scrapers.http_client import fetch_json, fetch_text
+from infotennis.scrapers.results_page import parse_results_page, results_columns
 
 # Web-scraping utitilies
 headers = {'User-Agent': 
         'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'} 
+# Browser-like headers to retry with if a page request fails (e.g. 403)
+headers_fallback = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5'}
 
-# Setting selenium options
-options = Options()
-options.headless = False
-options.add_experimental_option('excludeSwitches', ['enable-logging'])
-
-# Suppress "WDM INFO ====== WebDriver manager ======" messages
-os.environ['WDM_LOG_LEVEL'] = '0'
-logging.getLogger('WDM').setLevel(logging.NOTSET)
-
-# Load config file into dict 'configs'
-script_dir = os.path.dirname(__file__)
-config_path = os.path.join(script_dir, "../../config.yaml")
-#with open("./config.yaml", "r") as yamlfile:
-with open(config_path, "r") as yamlfile:
-    configs = yaml.safe_load(yamlfile)
+# Settings of config.yaml (read when first accessed)
+config = get_config()
 
 ##############################################
 # Functions Start Here
 month_dict = dict((v, k) for k, v in enumerate(calendar.month_abbr))
 
+def get_page(url, timeout=None):
+    """
+    Returns the text of a page, requested with the shared HTTP client (see infotennis.scrapers.http_client). If the
+    request fails (other than by timing out after timeout seconds), it is retried once with browser-like headers.
+    """
+    try:
+        return fetch_text(url, headers=headers, timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise
+    except Exception:
+        return fetch_text(url, headers=headers_fallback, timeout=timeout)
+
+def get_json(url):
+    """
+    Returns the parsed response of a JSON URL (parsed from the response bytes, without an HTML parser), requested like
+    get_page().
+    """
+    try:
+        return fetch_json(url, headers=headers)
+    except Exception:
+        return fetch_json(url, headers=headers_fallback)
+
 def parse_dates(dates_string):
     date_st, date_end = dates_string.split(" - ")
     # Parse the tournament end date first
@@ -94,95 +97,6 @@ def parse_winners(elems_winners):
 
     return ", ".join(winner_list)    
 
-def parse_player_scores(elem_player_match_score):
-    player_scores = []
-    for set_score in elem_player_match_score.find_all("div", class_="score-item"):
-        score_list = set_score.find_all("span")
-        if len(score_list) == 0:
-            continue
-        else:
-            if len(score_list) == 1:
-                score = score_list[0].text
-            elif len(score_list) == 2:
-                score = score_list[0].text
-                score_tb = score_list[1].text
-                score = f"{score}({score_tb})"
-        player_scores.append(score)
-    return player_scores
-
-def move_bracketed_parts(lst):
-    new_lst = []
-    for item in lst:
-        bracketed_part = ""
-        remaining_part = item
-        if '(' in item and ')' in item:
-            bracket_start = item.index('(')
-            bracket_end = item.index(')')
-            bracketed_part = item[bracket_start:bracket_end+1]
-            remaining_part = item[:bracket_start] + item[bracket_end+1:]
-        new_item = remaining_part + bracketed_part
-        new_lst.append(new_item)
-    return new_lst
-
-def parse_match_score(elems_match_score):
-    
-    player_1_score = parse_player_scores(elems_match_score[0])
-    player_2_score = parse_player_scores(elems_match_score[1])
-
-    score_list = [f"{i}{j}" for i,j in zip(player_1_score,player_2_score)]
-    # Convert score into string format
-    score_str = " ".join(move_bracketed_parts(score_list))
-
-    return score_str   
-
-def parse_match_content(elem_match):
-    
-    round_ = elem_match.find("strong").text.split(" - ")[0].replace("-","")
-    round_ = " ".join([word.capitalize() for word in round_.split()])
-    url_atp = "https://www.atptour.com"
-    if elem_match.find("div", class_="match-cta") is None:
-        url = ""
-    else:
-        if elem_match.find("div", class_="match-cta").find("a", string=lambda text: text and ("Match Stats" in text or "Stats" in text)) is not None:
-            url = url_atp + elem_match.find("div", class_="match-cta").find("a", string=lambda text: text and ("Match Stats" in text or "Stats" in text))["href"]
-        else:
-            url = ""
-    match_id = url.split("/")[-1]
-
-    score = parse_match_score(elem_match.find_all("div", class_="scores"))
-
-    elem_players = elem_match.find_all("div", class_="name")
-    elem_pinfos = [e.find({"a", "p"}) for e in elem_players]
-    if len(elem_players) == 2:
-        #elem_pinfos = [e.find({"a", "p"}) for e in elem_players]
-        player_1, player_2 = [" ".join(e.contents[0].text.split()) for e in elem_pinfos]
-        player_1_seed, player_2_seed = [e.find("span").text.strip("()") for e in elem_players]
-        player_1_id, player_2_id = [e["href"].split("/")[-2] if e.has_attr("href") else "" for e in elem_pinfos]
-        # player_1_flag, player_2_flag = [e['src'].split("/")[-1].split(".svg")[0] for e in elem_match.find_all("img", alt={"Player Flag"})]
-        try:
-            player_1_flag, player_2_flag =  [e.find("use")["href"].split('/')[-1].split('#')[1].replace('flag-','') for e in elem_match.find_all("svg")]
-        except: # This can (and has) happen(ed) [2024/540/qs006] if a player's flag is missing for some reason (?) - Lazy Fix (Just Ignore)
-            player_1_flag = player_2_flag = "-"
-    if len(elem_players) == 4:
-        player_1a, player_1b, player_2a, player_2b = [" ".join(e.contents[0].text.split()) for e in elem_pinfos]
-        player_1 = player_1a + ", " + player_1b
-        player_2 = player_2a + ", " + player_2b
-        player_1_seed, player_2_seed = [e.find("span").text.strip("()") for e in elem_players][::2]
-        player_1a_id, player_1b_id, player_2a_id, player_2b_id = [e["href"].split("/")[-2] if e.has_attr("href") else "-" for e in elem_pinfos]
-        player_1_id = player_1a_id + ", " + player_1b_id
-        player_2_id = player_2a_id + ", " + player_2b_id
-
-        # player_1a_flag, player_1b_flag, player_2a_flag, player_2b_flag = [e['src'].split("/")[-1].split(".svg")[0] for e in elem_match.find_all("img", alt={"Player Flag", "Partner Flag"})]
-        player_1a_flag, player_1b_flag, player_2a_flag, player_2b_flag =  [e.find("use")["href"].split('/')[-1].split('#')[1].replace('flag-','') for e in elem_match.find_all("svg")]
-        player_1_flag = player_1a_flag + ", " + player_1b_flag
-        player_2_flag = player_2a_flag + ", " + player_2b_flag
-
-    dict_match = {"round": round_, "player1_name": player_1, "player1_id": player_1_id, "player1_seed": player_1_seed, "player1_nation": player_1_flag, 
-                                    "player2_name": player_2, "player2_id": player_2_id, "player2_seed": player_2_seed, "player2_nation": player_2_flag, "score": score,
-                                    "url": url, "court_vision": 0}
-    
-    return dict_match 
-
 def scrape_ATP_calendar(year: int):
     """
     Scrapes ATP Tournament Info for a given Calendar Year/Season.
@@ -203,23 +117,15 @@ def scrape_ATP_calendar(year: int):
             - winner	
             - url
     """
+    # bs4 is only needed for the calendar page
+    from bs4 import BeautifulSoup
+
     # ATP Tournament Archive Page URL
-    url = configs['atp']['calendar'] % {'year': year}
+    url = config['atp']['calendar'] % {'year': year}
 
     page = url
     #print (page)
-    try:
-        pageTree = requests.get(page, headers=headers)
-        pageSoup = BeautifulSoup(pageTree.content, 'html.parser') 
-        assert str(pageTree ) != "<Response [403]>"
-    except:
-        req = urllib.request.Request(page)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0')
-        req.add_header('Accept', 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8')
-        req.add_header('Accept-Language', 'en-US,en;q=0.5')
-
-        r = urllib.request.urlopen(req).read().decode('utf-8')     
-        pageSoup = BeautifulSoup(r, 'html.parser') 
+    pageSoup = BeautifulSoup(get_page(page), 'html.parser')
 
     elems_events = pageSoup.find_all("ul", class_="events")
 
@@ -279,23 +185,11 @@ def scrape_ATP_calendar(year: int):
     # note: This will not work if the scraped year is not the current year because this page only exists for the current year
     if year == datetime.datetime.now().year:
         url_tournaments = "https://www.atptour.com/en/-/tournaments/calendar/tour"
-        page = url_tournaments
         try:
-            pageTree = requests.get(page, headers=headers)
-            pageSoup = BeautifulSoup(pageTree.content, 'html.parser') 
-            assert str(pageTree) != "<Response [403]>"
-        except:
-            req = urllib.request.Request(url_tournaments)
-            req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0')
-            req.add_header('Accept', 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8')
-            req.add_header('Accept-Language', 'en-US,en;q=0.5')
-
-            r = urllib.request.urlopen(req).read().decode('utf-8')     
-            pageSoup = BeautifulSoup(r, 'html.parser') 
-        try:
-            results_json = json.loads(str(pageSoup))
-        except:
-            return pageSoup
+            results_json = get_json(url_tournaments)
+        except Exception as e:
+            logging.error(f"Failed to get the tournaments calendar JSON from {url_tournaments}. Error: {e}")
+            return df_tourns
         # The tournament data is segregated by months, so we need to concat them together
         df_tournaments_live = pd.concat([ pd.DataFrame(month_data['Tournaments'])  for month_data in results_json['TournamentDates'] ]).reset_index(drop=True)
         # Data formatting to conform to existing schema
@@ -312,7 +206,7 @@ def scrape_ATP_calendar(year: int):
 
     return df_tourns
 
-def scrape_ATP_tournament(url: str, tournament: str, tournament_id: str, year: int, format="S"):
+def scrape_ATP_tournament(url: str, tournament: str, tournament_id: str, year: int, format="S", timeout=None):
     """
     Scrapes ATP Tournament Results/Info for a given tournament.
     
@@ -326,6 +220,8 @@ def scrape_ATP_tournament(url: str, tournament: str, tournament_id: str, year: i
         year (int): Calendar year for which to scrape information of the tournament from.
         format (str, optional): Indicates tournament format to scrape results for, "S" (singles)
         or "D" (doubles). Also defaults back to "S" if an invalid arg is provided.
+        timeout (float, optional): Max. seconds to wait for the results page, concurrent.futures.TimeoutError is raised
+        if it is exceeded. Defaults to None (no limit other than the HTTP client's timeout and retries).
 
     Returns:
         df_tourn_matches (pd.DataFrame) : Contains results data of the scraped tournament, with the following columns: 
@@ -350,30 +246,8 @@ def scrape_ATP_tournament(url: str, tournament: str, tournament_id: str, year: i
         print("An invalid 'format' arg was provided! Defaulting to 'S'...")
         url = url + "?matchType=singles"
 
-    page = url
-    try:
-        pageTree = requests.get(page, headers=headers)
-        pageSoup = BeautifulSoup(pageTree.content, 'html.parser') 
-        assert str(pageTree ) != "<Response [403]>"
-    except:
-        req = urllib.request.Request(page)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0')
-        req.add_header('Accept', 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8')
-        req.add_header('Accept-Language', 'en-US,en;q=0.5')
-
-        r = urllib.request.urlopen(req).read().decode('utf-8')     
-        pageSoup = BeautifulSoup(r, 'html.parser') 
-
-    elem_days = pageSoup.find_all("div", class_="atp_accordion-item")
-    elem_matches = [e.find_all("div", class_="match") for e in elem_days]
-
-    list_df_matches = []
-    for elem_round in elem_matches:
-        for elem_match in elem_round:
-            df_match = pd.DataFrame([parse_match_content(elem_match)])
-            list_df_matches.append(df_match)
-
-    df_tourn_matches = pd.concat(list_df_matches).reset_index(drop=True)
+    # Parse all matches of the page in a single pass (with lxml), into 1 dict per match
+    df_tourn_matches = pd.DataFrame(parse_results_page(get_page(url, timeout=timeout)), columns=results_columns)
 
     # Add a column for Year
     df_tourn_matches.insert(0, "year", [year]*len(df_tourn_matches))
@@ -8,6 +8,6 @@ setup(
     author='Gerald Lim',
     author_email='lgjg1994@gmail.com',
     packages=['infotennis'],
-    install_requires=['pandas','matplotlib','numpy','requests','beautifulsoup4','cryptography','selenium',\
-                        'webdriver-manager','pyyaml','pymysql','func-timeout',]
+    install_requires=['pandas','matplotlib','numpy','requests','beautifulsoup4','lxml','cryptography',\
+                        'pyyaml','pymysql','func-timeout','zstandard','aiohttp','nest-asyncio',]
 )
\ No newline at end of file